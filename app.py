@@ -24,6 +24,7 @@ from components.statistics import render_statistics
 from components.settings import render_settings
 from components.footer import render_footer
 from components.map_search import MapSearch
+from components.diagnostics import diagnostics_enabled, render_diagnostics
 
 def main():
     # 加载CSS样式
@@ -60,6 +61,9 @@ def main():
             render_statistics()
         with tabs[5]:
             render_settings()
+    # 隐藏的诊断面板（?diagnostics=1）
+    if diagnostics_enabled():
+        render_diagnostics()
     # 渲染页脚
     render_footer()
 
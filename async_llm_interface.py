@@ -0,0 +1,384 @@
+import asyncio
+import copy
+import os
+import threading
+import weakref
+from llm_interface import _completion_kwargs, _StreamState, LLMInterface, RECIPE_TEMPERATURE, RateLimiter, recipe_events, make_cache_key
+from instrumentation import start_call
+from llm_client_pool import get_registry, DEEPSEEK_BASE_URL
+from llm_resilience import async_call_with_retry
+from recipe_prompt import MAX_OUTPUT_TOKENS
+from structured_output import IncrementalRecipeParser
+# 单进程内同时进行的生成请求上限
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 200))
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+class AsyncSingleFlight:
+    """SingleFlight 的 asyncio 版本
+
+    相同键的并发协程共享同一个任务，各自得到结果的副本；单个等待者被取消不会影响其他等待者，
+    只有所有等待者都取消时才取消底层任务。
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        self.calls += 1
+        entry = self._inflight.get(key)
+        leader = entry is None
+        if leader:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            entry = {"task": task, "waiters": 0}
+            self._inflight[key] = entry
+            self.executions += 1
+            task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is entry else None)
+        else:
+            self.coalesced += 1
+
+        entry["waiters"] += 1
+        try:
+            result = await asyncio.shield(entry["task"])
+        except asyncio.CancelledError:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not entry["task"].done():
+                entry["task"].cancel()
+            raise
+        except BaseException:
+            entry["waiters"] -= 1
+            raise
+        entry["waiters"] -= 1
+        # 每个调用方（包括发起者）都拿到独立副本，避免修改共享结果
+        return copy.deepcopy(result)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "saved_ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+        }
+
+
+# 与后台事件循环一样是进程级的；只应在同一个事件循环中使用
+_async_recipe_flight = AsyncSingleFlight()
+
+
+def get_async_coalescing_stats():
+    """获取异步食谱生成的请求合并统计"""
+    return _async_recipe_flight.stats()
+
+
+def get_async_client(api_key, base_url=DEEPSEEK_BASE_URL):
+    """按 (api_key, base_url) 获取进程共享的 AsyncOpenAI 客户端
+
+    客户端内部的 HTTP 连接池绑定在首次使用它的事件循环上，
+    因此同步代码应通过 run_async / iterate_async 在后台循环中使用它。
+    """
+    return get_registry().get_async_client(api_key, base_url)
+
+
+def _get_semaphore(max_concurrency):
+    """获取当前事件循环上的并发信号量（同一循环内所有实例共享）"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+class AsyncLLMInterface(LLMInterface):
+    """基于 AsyncOpenAI 的异步食谱生成接口
+
+    与 LLMInterface 的 generate_recipe_and_nutrition / stream_recipe_and_nutrition
+    参数和返回值一致，但均为协程 / 异步生成器。
+    """
+
+    def __init__(self, api_key, cache=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, single_flight=None, retry_policy=None, fallback=True, hedge=None, providers=None,
+                 semantic_cache=None):
+        # single_flight=None 使用进程共享的异步请求合并器，single_flight=False 禁用合并
+        if single_flight is None:
+            single_flight = _async_recipe_flight
+        super().__init__(api_key, cache=cache, single_flight=single_flight, retry_policy=retry_policy, fallback=fallback, hedge=hedge,
+                         providers=providers, semantic_cache=semantic_cache)
+        self.client = self.router.primary.async_client
+        self.max_concurrency = max_concurrency
+
+    async def generate_recipe_and_nutrition(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2, regenerate=False, is_disconnected=None):
+        """异步生成食谱
+
+        is_disconnected 为可选的回调（普通函数或协程函数），返回 True 时取消正在进行的生成。
+        """
+        cache_key = make_cache_key(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        if not regenerate:
+            cached = await asyncio.to_thread(self._cached_recipe, cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+            if cached is not None:
+                return cached
+
+        args = (cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        if self.single_flight is not None:
+            coro = self.single_flight.do(cache_key, self._generate_and_store, *args)
+        else:
+            coro = self._generate_and_store(*args)
+
+        try:
+            if is_disconnected is None:
+                return await coro
+            return await _cancel_on_disconnect(coro, is_disconnected)
+        except Exception as e:
+            if not self.fallback:
+                raise
+            return await asyncio.to_thread(self._fallback_recipe, cache_key, ingredients, language, servings, e)
+
+    async def generate_batch(self, specs, max_parallel=4, rate_limit=None):
+        """异步批量生成食谱，按完成顺序产出 (index, recipe, error)
+
+        参数含义与 LLMInterface.generate_batch 相同；同时仍受进程级并发信号量约束。
+        """
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+        batch_slots = asyncio.Semaphore(max(1, max_parallel))
+
+        async def run(index, spec):
+            async with batch_slots:
+                if limiter is not None:
+                    wait = limiter.reserve()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                try:
+                    return index, await self.generate_recipe_and_nutrition(**spec), None
+                except Exception as e:
+                    print(f"Batch item {index} failed: {str(e)}")
+                    return index, None, e
+
+        tasks = [asyncio.ensure_future(run(index, spec)) for index, spec in enumerate(specs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_and_store(self, cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings):
+        """异步生成食谱并写入缓存"""
+        recipe = await self._generate_recipe(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        await asyncio.to_thread(self._store_recipe, cache_key, recipe, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        return recipe
+
+    async def stream_recipe_and_nutrition(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2, regenerate=False):
+        """异步流式生成食谱，事件格式与 LLMInterface.stream_recipe_and_nutrition 相同"""
+        cache_key = make_cache_key(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        if not regenerate:
+            cached = await asyncio.to_thread(self._cached_recipe, cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+            if cached is not None:
+                for event in recipe_events(cached):
+                    yield event
+                return
+
+        tokens = self.stream_recipe_tokens(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        try:
+            first_token = await tokens.__anext__()
+        except StopAsyncIteration:
+            first_token = ''
+        except Exception as e:
+            # 尚未产出任何内容时失败，可以无缝切换到降级食谱
+            if not self.fallback:
+                raise
+            for event in recipe_events(await asyncio.to_thread(self._fallback_recipe, cache_key, ingredients, language, servings, e)):
+                yield event
+            return
+
+        parser = IncrementalRecipeParser()
+        chunks = [first_token]
+        for event in parser.feed(first_token):
+            yield event
+        async for token in tokens:
+            chunks.append(token)
+            for event in parser.feed(token):
+                yield event
+
+        recipe = self._parse_streamed_recipe(chunks)
+        await asyncio.to_thread(self._store_recipe, cache_key, recipe, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        yield ('recipe', recipe)
+
+    async def stream_recipe_tokens(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2):
+        """以 stream=True 异步调用路由选中的服务商，逐段产出模型输出的文本"""
+        messages, max_tokens = self._recipe_request(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        call = start_call("llm", "recipe_stream")
+        async with _get_semaphore(self.max_concurrency):
+            try:
+                provider, stream = await self._create_completion(messages, stream=True, max_tokens=max_tokens, call=call)
+            except Exception as e:
+                raise self._call_failed(call, e)
+
+            state = _StreamState()
+            try:
+                async for chunk in stream:
+                    delta = state.feed(chunk, call)
+                    if delta:
+                        yield delta
+                self._finish_stream(call, provider, language, messages, max_tokens, state)
+            except Exception as e:
+                raise self._stream_failed(call, provider, e)
+            finally:
+                # 消费方停止迭代（例如客户端断开）时关闭上游连接
+                call.finish(status="cancelled")
+                await stream.close()
+
+    async def complete(self, messages, temperature=RECIPE_TEMPERATURE, max_tokens=MAX_OUTPUT_TOKENS, call=None):
+        """LLMInterface.complete 的异步版本"""
+        provider, response = await self._create_completion(messages, stream=False, max_tokens=max_tokens, call=call, temperature=temperature)
+        if call is not None:
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                call.add_tokens(usage.prompt_tokens, usage.completion_tokens)
+        return response
+
+    async def _create_completion(self, messages, stream=False, max_tokens=MAX_OUTPUT_TOKENS, call=None, temperature=RECIPE_TEMPERATURE):
+        """按重试策略异步调用 chat.completions.create，返回 (provider, response)，路由规则同 LLMInterface"""
+        tried = []
+        loop = asyncio.get_running_loop()
+
+        async def attempt(timeout):
+            provider = self.router.select(avoid=tried)
+            tried.append(provider.name)
+            if call is not None:
+                call.attempt(provider.name)
+            started = loop.time()
+            try:
+                response = await provider.async_client.chat.completions.create(
+                    **_completion_kwargs(provider, messages, stream, max_tokens, timeout, temperature))
+            except asyncio.CancelledError:
+                # 对冲落败或调用方断开导致的取消不计入错误率，只释放在途计数
+                self.router.release(provider)
+                raise
+            except Exception as e:
+                self.router.record_failure(provider, e)
+                raise
+            self.router.record_success(provider, loop.time() - started)
+            return provider, response
+
+        if self.hedger is not None:
+            hedger = self.hedger
+            return await async_call_with_retry(lambda timeout: hedger.async_run(attempt, timeout), self.retry_policy)
+        return await async_call_with_retry(attempt, self.retry_policy)
+
+    async def _generate_recipe(self, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings):
+        """异步调用路由选中的服务商生成食谱（不经过缓存）"""
+        messages, max_tokens = self._recipe_request(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        with start_call("llm", "recipe") as call:
+            while True:
+                async with _get_semaphore(self.max_concurrency):
+                    try:
+                        provider, response = await self._create_completion(messages, stream=False, max_tokens=max_tokens, call=call)
+                    except asyncio.CancelledError:
+                        call.finish(status="cancelled")
+                        raise
+                    except Exception as e:
+                        raise self._call_failed(call, e)
+                recipe, retry_max_tokens = self._completion_recipe(call, provider, response, language, messages, max_tokens)
+                if retry_max_tokens is None:
+                    return recipe
+                max_tokens = retry_max_tokens
+
+
+async def _cancel_on_disconnect(coro, is_disconnected, poll_interval=0.5):
+    """运行 coro，期间定期检查客户端是否断开，断开时取消任务"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            disconnected = is_disconnected()
+            if asyncio.iscoroutine(disconnected):
+                disconnected = await disconnected
+            if disconnected:
+                task.cancel()
+                raise asyncio.CancelledError("client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def _aclose_quietly(agen):
+    """关闭异步生成器；生成器已因取消而结束时忽略错误"""
+    try:
+        await agen.aclose()
+    except RuntimeError:
+        pass
+
+
+class BackgroundLoop:
+    """运行在守护线程中的进程级事件循环
+
+    同步代码（如 Flask 视图）通过它提交协程，使所有请求共享同一个
+    AsyncOpenAI 连接池和并发信号量。
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="llm-event-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """提交协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """阻塞等待协程结果；超时或调用线程被中断时取消协程"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen):
+        """把异步生成器转换为同步迭代器；迭代器被关闭时取消上游生成"""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.submit(_aclose_quietly(agen))
+
+    def shutdown(self):
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop = None
+                self._thread = None
+
+
+_background_loop = BackgroundLoop()
+# 异步客户端的连接池属于后台循环，关闭时也要在该循环中执行
+get_registry().set_async_closer(lambda coro: _background_loop.run(coro, timeout=5))
+
+
+def run_async(coro, timeout=None):
+    """在进程级后台事件循环中运行协程并返回结果"""
+    return _background_loop.run(coro, timeout)
+
+
+def iterate_async(agen):
+    """在进程级后台事件循环中消费异步生成器，返回同步迭代器"""
+    return _background_loop.iterate(agen)
@@ -0,0 +1,94 @@
+"""用本地 stub 服务器离线压测 LLMInterface 的吞吐量和尾延迟
+
+在进程内启动 stub_llm_server（或用 --base-url 指向已运行的 stub），关闭缓存和请求合并，
+以给定并发发送请求，最后输出吞吐量以及 instrumentation 统计的耗时 / 首 token 分位数：
+
+    python bench_llm_stub.py --requests 200 --concurrency 16 --stream --error-rate 0.02
+"""
+import argparse
+import concurrent.futures
+import threading
+import time
+
+from instrumentation import get_metrics
+from llm_interface import LLMInterface
+from llm_router import Provider
+from stub_llm_server import StubConfig, serve
+
+INGREDIENTS = [
+    "chicken breast, broccoli, garlic",
+    "tofu, shiitake, bok choy",
+    "salmon, asparagus, lemon",
+    "beef, potato, onion",
+    "shrimp, cucumber, tomato",
+    "egg, spinach, cheese",
+]
+
+
+def _run_one(llm, index, stream):
+    ingredients = INGREDIENTS[index % len(INGREDIENTS)]
+    if stream:
+        for event, value in llm.stream_recipe_and_nutrition(ingredients, "", "", language="en"):
+            if event == 'recipe':
+                return value
+        return None
+    return llm.generate_recipe_and_nutrition(ingredients, "", "", language="en")
+
+
+def run(args):
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        config = StubConfig(args.latency_median, args.latency_sigma, args.ttft_median, args.ttft_sigma,
+                            args.error_rate, args.truncate_rate, seed=args.seed)
+        server, _ = serve("127.0.0.1", 0, config)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    llm = LLMInterface("stub", cache=False, single_flight=False, fallback=args.fallback,
+                       providers=[Provider("stub", base_url, model="stub")])
+    get_metrics().reset()
+
+    failures = 0
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(_run_one, llm, index, args.stream) for index in range(args.requests)]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                if not future.result():
+                    failures += 1
+            except Exception:
+                failures += 1
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    print(f"base_url: {base_url}, requests: {args.requests}, concurrency: {args.concurrency}, stream: {args.stream}")
+    print(f"elapsed: {elapsed:.2f}s, throughput: {args.requests / elapsed:.1f} req/s, failures: {failures}\n")
+    snapshot = get_metrics().snapshot()
+    for section in ("latency", "ttft"):
+        for row in snapshot[section]:
+            print(f"{section:<8}{row['operation']:<15}count={row['count']:<6}p50={row['p50']}  p90={row['p90']}  "
+                  f"p99={row['p99']}  p99.9={row['p99.9']}  max={row['max']}")
+    for section in ("calls", "errors", "retries", "tokens"):
+        for row in snapshot[section]:
+            print(f"{section:<8}{row}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--base-url", help="已运行的 stub 地址，例如 http://127.0.0.1:8001/v1；不指定时在进程内启动")
+    arg_parser.add_argument("--requests", type=int, default=100)
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--stream", action="store_true")
+    arg_parser.add_argument("--fallback", action="store_true", help="失败时返回降级食谱而不是计为失败")
+    arg_parser.add_argument("--latency-median", type=float, default=1.0)
+    arg_parser.add_argument("--latency-sigma", type=float, default=0.4)
+    arg_parser.add_argument("--ttft-median", type=float, default=0.3)
+    arg_parser.add_argument("--ttft-sigma", type=float, default=0.3)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--truncate-rate", type=float, default=0.0)
+    arg_parser.add_argument("--seed", type=int, default=None)
+    run(arg_parser.parse_args())
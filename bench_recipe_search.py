@@ -0,0 +1,141 @@
+"""对比旧的正则搜索和词元索引搜索在大量食谱下的耗时
+
+在独立的基准数据库中为一个用户生成 N 条中英日混合的食谱（带搜索词元），
+分别用旧的 $regex 扫描和 search_pipeline 执行同一组查询，输出耗时分位数、
+结果数以及 explain 中检查的索引键 / 文档数：
+
+    python bench_recipe_search.py --recipes 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from lucky_pool import LUCKY_INGREDIENT_SETS
+from mongodb_manager import get_mongo_client, run_migrations
+from recipe_search import build_search_fields, query_tokens, search_pipeline
+
+BENCH_DATABASE = "recipe_search_bench"
+BENCH_USER = "bench_user"
+DEFAULT_QUERIES = ["chicken", "tomato basil", "西兰花", "牛肉", "豆腐 香菇", "サーモン", "quick", "不存在的菜"]
+
+TITLE_WORDS = {
+    "zh": ["清炒", "红烧", "凉拌", "香煎", "炖", "快手"],
+    "en": ["Quick", "Roasted", "Braised", "Grilled", "Creamy", "Spicy"],
+    "ja": ["簡単", "焼き", "煮込み", "炒め", "蒸し", "和風"],
+}
+TAGS = ["quick", "healthy", "family", "spicy", "dinner", "lunch", "家常", "快手菜", "低脂", "作り置き"]
+NOTE_WORDS = ["less salt", "kids loved it", "add chili", "少放油", "下次多放蒜", "冷蔵で3日"]
+
+
+def _make_recipe(rng, created):
+    language = rng.choice(["zh", "en", "ja"])
+    names = [names[language] for _, names in rng.sample(LUCKY_INGREDIENT_SETS, 2)]
+    ingredients = [item.strip() for name in names for item in name.split(",")]
+    recipe = {
+        "username": BENCH_USER,
+        "title": f"{rng.choice(TITLE_WORDS[language])} {ingredients[0]}",
+        "ingredients": ingredients,
+        "tags": rng.sample(TAGS, 2),
+        "notes": rng.choice(NOTE_WORDS),
+        "recipe_text": " ".join(ingredients) * 20,
+        "rating": rng.randint(0, 5),
+        "created": created,
+    }
+    recipe.update(build_search_fields(recipe))
+    return recipe
+
+
+def populate(collection, count, seed, batch_size=5000):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(minutes=count)
+    batch = []
+    for index in range(count):
+        batch.append(_make_recipe(rng, start + timedelta(minutes=index)))
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def legacy_search(collection, query):
+    """迁移前 search_recipes 的实现"""
+    search_filter = {
+        "username": BENCH_USER,
+        "$or": [
+            {"ingredients": {"$regex": query, "$options": "i"}},
+            {"recipe_text": {"$regex": query, "$options": "i"}},
+            {"tags": {"$regex": query, "$options": "i"}}
+        ]
+    }
+    return list(collection.find(search_filter).sort("created", -1))
+
+
+def indexed_search(collection, query, limit):
+    pipeline = search_pipeline(BENCH_USER, query, limit=limit)
+    return list(collection.aggregate(pipeline)) if pipeline else []
+
+
+def _examined(collection, query_filter):
+    stats = collection.find(query_filter).explain().get("executionStats", {})
+    return stats.get("totalKeysExamined"), stats.get("totalDocsExamined")
+
+
+def _timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples), p95, len(result)
+
+
+def run(args):
+    db = get_mongo_client(args.uri)[BENCH_DATABASE]
+    collection = db["recipes"]
+    if args.reuse and collection.estimated_document_count() >= args.recipes:
+        print(f"Reusing {collection.estimated_document_count()} recipes in {BENCH_DATABASE}")
+    else:
+        collection.drop()
+        run_migrations(db, force=True)
+        started = time.perf_counter()
+        populate(collection, args.recipes, args.seed)
+        print(f"Inserted {args.recipes} recipes in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'query':<14}{'legacy p50/p95 ms':>20}{'hits':>8}{'indexed p50/p95 ms':>22}{'hits':>6}"
+          f"{'legacy keys/docs':>20}{'indexed keys/docs':>20}")
+    for query in args.queries:
+        legacy = _timed(lambda: legacy_search(collection, query), args.repeat)
+        indexed = _timed(lambda: indexed_search(collection, query, args.limit), args.repeat)
+        legacy_examined = _examined(collection, {"username": BENCH_USER, "$or": [
+            {field: {"$regex": query, "$options": "i"}} for field in ("ingredients", "recipe_text", "tags")]})
+        indexed_examined = _examined(collection, {"username": BENCH_USER, "search_tokens": {"$all": query_tokens(query)}})
+        print(f"{query:<14}{legacy[0]:>11.1f} /{legacy[1]:>7.1f}{legacy[2]:>8}{indexed[0]:>13.1f} /{indexed[1]:>7.1f}"
+              f"{indexed[2]:>6}{str(legacy_examined):>20}{str(indexed_examined):>20}")
+
+    if not args.keep:
+        db.client.drop_database(BENCH_DATABASE)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--uri", default=os.getenv("MONGODB_URI"), help="MongoDB 连接串，默认读取 MONGODB_URI")
+    arg_parser.add_argument("--recipes", type=int, default=100_000)
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    arg_parser.add_argument("--limit", type=int, default=20, help="索引搜索每页条数")
+    arg_parser.add_argument("--seed", type=int, default=7)
+    arg_parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES)
+    arg_parser.add_argument("--reuse", action="store_true", help="基准数据库中已有足够食谱时直接复用")
+    arg_parser.add_argument("--keep", action="store_true", help="结束后保留基准数据库")
+    parsed = arg_parser.parse_args()
+    if not parsed.uri:
+        print("MONGODB_URI is not set")
+        sys.exit(1)
+    run(parsed)
@@ -0,0 +1,158 @@
+"""structured_output 与原有解析方式的对比基准
+
+语料为线上日志中常见的几类异常输出（围栏变体、前后说明文字、截断、多余/缺少逗号等）。
+对每种解析方式统计成功解析的条数和平均耗时：
+
+    python bench_structured_output.py [--repeat 2000]
+"""
+import argparse
+import json
+import re
+import time
+
+import structured_output
+
+RECIPE = {
+    "title": "番茄炒蛋",
+    "description": "经典家常菜，酸甜可口",
+    "ingredients": ["番茄 2个", "鸡蛋 3个", "盐 适量", "葱花 少许"],
+    "instructions": ["番茄切块，鸡蛋打散。", "热锅炒蛋至凝固盛出。", "炒番茄出汁后倒回鸡蛋翻匀。"],
+    "nutrition": {"Calories": "210 kcal", "Protein": "13 g", "Fat": "14 g"},
+    "serves": 2,
+    "prep_time": "5 min",
+    "cook_time": "10 min",
+    "difficulty": "简单",
+}
+RECIPE_JSON = json.dumps(RECIPE, ensure_ascii=False, indent=2)
+
+
+def _truncated(marker, extra=0):
+    """模拟在 marker 处（再往后 extra 个字符）被截断的输出"""
+    return "```json\n" + RECIPE_JSON[:RECIPE_JSON.index(marker) + extra].rstrip()
+
+
+# (名称, 模型输出)
+CORPUS = [
+    ("fenced", f"```json\n{RECIPE_JSON}\n```"),
+    ("fenced_crlf", f"```json\r\n{RECIPE_JSON}\r\n```"),
+    ("fence_no_newline", f"```json{RECIPE_JSON}```"),
+    ("fence_uppercase", f"```JSON\n{RECIPE_JSON}\n```"),
+    ("bare", RECIPE_JSON),
+    ("prose_before", f"Here is your recipe:\n```json\n{RECIPE_JSON}\n```"),
+    ("prose_after", f"```json\n{RECIPE_JSON}\n```\nEnjoy your meal!"),
+    ("bare_prose_after", f"{RECIPE_JSON}\n\nLet me know if you need changes."),
+    ("truncated_in_string", _truncated('热锅', 4)),
+    ("truncated_after_comma", _truncated('"serves"')),
+    ("truncated_after_key", _truncated('"cook_time"', 11)),
+    ("truncated_in_nutrition", _truncated('13 g', 2)),
+    ("trailing_commas", RECIPE_JSON.replace('"葱花 少许"', '"葱花 少许",').replace('"简单"', '"简单",')),
+    ("missing_comma", RECIPE_JSON.replace('"prep_time": "5 min",', '"prep_time": "5 min"')),
+    ("ingredients_fenced", '```json\n{"ingredients": ["番茄", "鸡蛋", "葱"]}\n```'),
+    ("ingredients_truncated", '```json\n{"ingredients": ["tomato", "egg", "green on'),
+    ("ingredients_duplicates", '{"ingredients": ["tomato", "tomato ", "egg\n"]}'),
+    ("cuisine_fenced", '```json\n{"cuisine_type": "川菜", "restaurant_types": ["川菜馆"], "search_keywords": ["麻婆豆腐"], '
+                       '"dish_characteristics": {"spicy_level": "4", "price_range": "中", "cooking_method": "烧"}, '
+                       '"similar_dishes": ["水煮肉片"], "recommended_restaurant_names": ["川味"]}\n```'),
+    ("cuisine_prose", 'Sure! {"cuisine_type": "Japanese", "restaurant_types": ["Ramen shop"], "search_keywords": ["ramen"], '
+                      '"dish_characteristics": {"spicy_level": "1", "price_range": "Medium", "cooking_method": "boil"}, '
+                      '"similar_dishes": ["udon"], "recommended_restaurant_names": ["Ichiran"]}'),
+]
+
+
+def legacy_recipe(raw_content):
+    """原 LLMInterface._parse_recipe_json"""
+    json_match = re.search(r'```json\n(.*?)\n```', raw_content, re.DOTALL)
+    json_content = json_match.group(1) if json_match else raw_content.strip()
+    return json.loads(json_content)
+
+
+def legacy_ingredients(raw_content):
+    """原 ImageInputModal._parse_ingredients_from_response 的 JSON 部分（不含最后的引号提取）"""
+    raw_content = raw_content.strip()
+    json_match = re.search(r'```json\n(.*?)\n```', raw_content, re.DOTALL)
+    json_content = json_match.group(1) if json_match else raw_content.strip()
+    try:
+        return json.loads(json_content)
+    except json.JSONDecodeError:
+        json_start = json_content.find('{')
+        json_end = json_content.rfind('}')
+        if json_start == -1 or json_end == -1 or json_end <= json_start:
+            raise
+        possible_json = json_content[json_start:json_end + 1]
+        if '"ingredients":' in possible_json:
+            array_start = possible_json.find('[', possible_json.find('"ingredients":'))
+            if array_start != -1:
+                bracket_count = 0
+                array_end = -1
+                for i in range(array_start, len(possible_json)):
+                    if possible_json[i] == '[':
+                        bracket_count += 1
+                    elif possible_json[i] == ']':
+                        bracket_count -= 1
+                        if bracket_count == 0:
+                            array_end = i
+                            break
+                if array_end == -1:
+                    if possible_json.endswith('"') or possible_json.endswith('",'):
+                        possible_json = possible_json.rstrip('",') + '"]}'
+                    elif not possible_json.endswith(']'):
+                        possible_json = possible_json.rstrip() + ']}'
+                    else:
+                        possible_json = possible_json + '}'
+        return json.loads(possible_json)
+
+
+def legacy_cuisine(raw_content):
+    """原 MapSearch._ai_analyze_dish"""
+    result = raw_content.strip()
+    if result.startswith("```json"):
+        result = result[7:]
+    if result.endswith("```"):
+        result = result[:-3]
+    return json.loads(result.strip())
+
+
+PARSERS = [
+    ("legacy_recipe", legacy_recipe),
+    ("legacy_ingredients", legacy_ingredients),
+    ("legacy_cuisine", legacy_cuisine),
+    ("structured_output.loads", structured_output.loads),
+]
+
+
+def _time_per_call(parser, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            try:
+                parser(text)
+            except Exception:
+                pass
+    return (time.perf_counter() - started) / (repeat * len(texts)) * 1e6
+
+
+def run(repeat):
+    print(f"orjson available: {structured_output.ORJSON_AVAILABLE}, corpus: {len(CORPUS)} responses, repeat: {repeat}\n")
+    # us/valid 为格式正确的 ```json 输出的耗时，us/corpus 为整个语料的平均耗时
+    print(f"{'parser':<26}{'parsed':>8}{'us/valid':>10}{'us/corpus':>11}")
+    valid = [text for case, text in CORPUS if case == "fenced"]
+    for name, parser in PARSERS:
+        failures = []
+        for case, text in CORPUS:
+            try:
+                parser(text)
+            except Exception:
+                failures.append(case)
+
+        parsed = len(CORPUS) - len(failures)
+        print(f"{name:<26}{parsed:>5}/{len(CORPUS):<2}"
+              f"{_time_per_call(parser, valid, repeat):>10.1f}"
+              f"{_time_per_call(parser, [text for _, text in CORPUS], repeat):>11.1f}")
+        if failures:
+            print(f"    failed: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=2000)
+    run(arg_parser.parse_args().repeat)
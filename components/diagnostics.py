@@ -0,0 +1,41 @@
+import streamlit as st # type: ignore
+import os
+from utils.translations import get_translation
+from instrumentation import get_metrics, render_prometheus
+from semantic_cache import get_semantic_cache_stats
+from mongodb_manager import get_pool_stats
+
+
+def diagnostics_enabled():
+    """诊断面板默认隐藏：设置 RECIPE_DIAGNOSTICS=1 或在地址后加 ?diagnostics=1 时显示"""
+    if os.getenv("RECIPE_DIAGNOSTICS") == "1":
+        return True
+    try:
+        return st.query_params.get("diagnostics") == "1"
+    except AttributeError:
+        # streamlit < 1.30
+        return st.experimental_get_query_params().get("diagnostics") == ["1"]
+
+
+def render_diagnostics():
+    t = lambda key: get_translation(key, st.session_state.language)
+    snapshot = get_metrics().snapshot()
+
+    with st.expander(f"🩺 {t('diagnostics')}", expanded=False):
+        for section in ("latency", "ttft", "calls", "errors", "retries", "tokens", "cost_usd"):
+            if snapshot[section]:
+                st.markdown(f"**{section}**")
+                st.dataframe(snapshot[section], use_container_width=True, hide_index=True)
+
+        semantic_cache = get_semantic_cache_stats()
+        if semantic_cache:
+            st.markdown("**semantic_cache**")
+            st.json(semantic_cache)
+
+        st.markdown("**mongodb_pool**")
+        st.json(get_pool_stats())
+
+        if not any(snapshot.values()):
+            st.caption(t('diagnostics_empty'))
+        else:
+            st.download_button("metrics.txt", render_prometheus(), file_name="metrics.txt", mime="text/plain")
@@ -1,15 +1,30 @@
 import streamlit as st # type: ignore
 import os
 import random
-from llm_interface import LLMInterface
+from llm_interface import get_llm_interface
+from lucky_pool import get_lucky_pool, lucky_ingredient_choices
+from utils.config_manager import ConfigManager
 from utils.translations import get_translation
 from components.image_input_modal import ImageInputModal
 from components.recipe_display import RecipeDisplay
+from components.meal_plan import render_meal_plan
 import json
 
 def render_generate_recipe():
     t = lambda key: get_translation(key, st.session_state.language)
 
+    # 单个食谱 / 规划一周 两种模式
+    mode = st.radio(
+        "",
+        [t('single_recipe'), t('plan_my_week')],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="generate_mode"
+    )
+    if mode == t('plan_my_week'):
+        render_meal_plan()
+        return
+
     # 初始化图像输入模态窗口
     image_modal = ImageInputModal()
 
@@ -104,6 +119,12 @@ def render_generate_recipe():
                         value=2
                     )
 
+                regenerate = st.checkbox(
+                    t('regenerate_recipe'),
+                    value=False,
+                    help=t('regenerate_help')
+                )
+
             col_btn1, col_btn2 = st.columns(2)
             with col_btn1:
                 generate_btn = st.form_submit_button(
@@ -117,17 +138,29 @@ def render_generate_recipe():
                     use_container_width=True
                 )
 
+    # 当前选项对应的“手气不错”预生成池在后台预热，点击时无需等待生成
+    api_key = st.secrets.get("DEEPSEEK_API_KEY", os.getenv("DEEPSEEK_API_KEY"))
+    lucky_pool = None
+    if api_key:
+        lucky_pool = get_lucky_pool(get_llm_interface(api_key, ConfigManager.get_llm_providers(api_key)))
+        lucky_pool.ensure(st.session_state.language, diet_options[diet], goal_options[goal])
+
     with col2:
+        # 上一次“手气不错”的结果：(食材, 是否已有预生成的食谱)
+        lucky_result = st.session_state.pop('lucky_result', None)
+        if lucky_result:
+            st.info(f"{t('lucky_ingredients')}: {lucky_result[0]}")
+            if not lucky_result[1]:
+                st.info(t('click_generate_with_these'))
 
         if generate_btn and ingredients:
             with st.spinner(t('generating_recipe')):
                 try:
-                    api_key = st.secrets.get("DEEPSEEK_API_KEY", os.getenv("DEEPSEEK_API_KEY"))
                     if not api_key:
                         st.error(t('api_key_missing'))
                         st.stop()
 
-                    llm = LLMInterface(api_key=api_key)
+                    llm = get_llm_interface(api_key, ConfigManager.get_llm_providers(api_key))
 
                     actual_diet = diet_options[diet]
                     actual_goal = goal_options[goal]
@@ -135,9 +168,10 @@ def render_generate_recipe():
                     use_simulated_output=False # 改为 True 可以使用模拟输出,方便测试
 
                     llm_output = None
+                    recipe_stream = None
 
                     if not use_simulated_output:
-                        llm_output = llm.generate_recipe_and_nutrition(
+                        recipe_stream = llm.stream_recipe_and_nutrition(
                             ingredients,
                             actual_diet,
                             actual_goal,
@@ -145,7 +179,8 @@ def render_generate_recipe():
                             cuisine=cuisine if 'cuisine' in locals() else None,
                             cooking_time=cooking_time if 'cooking_time' in locals() else None,
                             difficulty=difficulty if 'difficulty' in locals() else None,
-                            servings=servings if 'servings' in locals() else 2
+                            servings=servings if 'servings' in locals() else 2,
+                            regenerate=regenerate
                         )
 
                     #simulate LLM output for testing
@@ -192,11 +227,23 @@ def render_generate_recipe():
 
                         llm_output= json.loads(llm_output_str.strip())
 
-                    st.session_state.recipe_data= llm_output
+                    if recipe_stream is not None:
+                        # 流式显示：内容随生成进度逐条出现
+                        llm_output = recipe_display.display_full_recipe(None, show_save_options=True, stream=recipe_stream)
+                        st.session_state.recipe_data = llm_output
+                        if llm_output and llm_output.get('fallback'):
+                            st.warning(t('fallback_recipe_notice'))
+                        else:
+                            st.success(t('recipe_generated'))
+                    else:
+                        st.session_state.recipe_data= llm_output
 
-                    st.success(t('recipe_generated'))
+                        if llm_output and llm_output.get('fallback'):
+                            st.warning(t('fallback_recipe_notice'))
+                        else:
+                            st.success(t('recipe_generated'))
 
-                    recipe_display.display_full_recipe(llm_output, show_save_options=True)
+                        recipe_display.display_full_recipe(llm_output, show_save_options=True)
 
                 except Exception as e:
                     st.error(f"{t('generation_error')}: {str(e)}")
@@ -206,16 +253,17 @@ def render_generate_recipe():
             recipe_display.display_full_recipe(st.session_state.recipe_data, show_save_options=True)
 
         if lucky_btn:
-            random_ingredients = random.choice([
-                "鸡胸肉, 西兰花, 胡萝卜",
-                "豆腐, 香菇, 青菜",
-                "三文鱼, 芦笋, 柠檬",
-                "牛肉, 土豆, 洋葱",
-                "虾, 黄瓜, 番茄"
-            ])
-
-            st.info(f"{t('lucky_ingredients')}: {random_ingredients}")
-            st.info(t('click_generate_with_these'))
+            lucky = None
+            if lucky_pool is not None:
+                lucky = lucky_pool.take(st.session_state.language, diet_options[diet], goal_options[goal])
+
+            if lucky is not None:
+                # 池中已有预生成的食谱，直接展示
+                random_ingredients, st.session_state.recipe_data = lucky
+            else:
+                # 池尚未预热好：只填入随机食材，由用户点击生成
+                random_ingredients = random.choice(lucky_ingredient_choices(st.session_state.language, diet_options[diet]))
+            st.session_state.lucky_result = (random_ingredients, lucky is not None)
             st.session_state.ingredient_input = random_ingredients
             st.rerun()
             
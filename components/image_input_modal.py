@@ -7,6 +7,10 @@ import random
 from PIL import Image # type: ignore
 import io
 from utils.translations import get_translation
+from utils.config_manager import ConfigManager
+from llm_client_pool import get_registry
+from instrumentation import start_call
+from structured_output import parse_ingredients
 import re
 import concurrent.futures
 import threading
@@ -15,7 +19,8 @@ from typing import List, Dict, Tuple
 class ImageInputModal:
     def __init__(self):
         self.api_key = st.secrets.get("SILICONFLOW_API_KEY", os.getenv("SILICONFLOW_API_KEY"))
-        self.api_url = "https://api.siliconflow.cn/v1/chat/completions"
+        # 可指向本地 stub 服务器（stub_llm_server.py）做离线压测
+        self.api_url = ConfigManager.get_config("SILICONFLOW_API_URL", "https://api.siliconflow.cn/v1/chat/completions")
         self.model = "Qwen/Qwen2.5-VL-32B-Instruct"
         self.max_workers = 20  # 最大并发线程数
     
@@ -77,143 +82,52 @@ class ImageInputModal:
         
         max_retries = 1  # 最大重试次数
         retry_count = 0
+        call = start_call("siliconflow", "vision_ingredients")
         
         while retry_count <= max_retries:
             try:
-                response = requests.post(self.api_url, json=payload, headers=headers, timeout=10)  #  设置超时时间为10秒
+                call.attempt()
+                response = get_registry().get_http_session().post(self.api_url, json=payload, headers=headers, timeout=10)  #  设置超时时间为10秒
                 
                 print(f"图片 {image_name} API调用状态: {response.status_code}")  # 调试输出
 
                 if response.status_code == 200:
                     try:
-                        raw_content = response.json()['choices'][0]['message']['content']
+                        result = response.json()
+                        usage = result.get('usage') or {}
+                        call.add_tokens(usage.get('prompt_tokens'), usage.get('completion_tokens'))
+                        raw_content = result['choices'][0]['message']['content']
                         ingredients = self._parse_ingredients_from_response(raw_content)
                         print(f"图片 {image_name} 识别到的食材: {ingredients}")
+                        call.finish()
                         return image_name, ingredients
                         
                     except Exception as e:
+                        call.finish(e)
                         print(f"图片 {image_name} API响应解析错误: {str(e)}")
                         return image_name, []
                 else:
+                    call.finish(f"HTTP {response.status_code}")
                     print(f"图片 {image_name} API调用失败: {response.status_code} - {response.text}")
                     return image_name, []
                     
-            except requests.exceptions.Timeout:
+            except requests.exceptions.Timeout as e:
                 retry_count += 1
                 if retry_count > max_retries:
+                    call.finish(e)
                     print(f"图片 {image_name} API调用超时，已达到最大重试次数")
                     return image_name, []
                 print(f"图片 {image_name} API调用超时，正在重试 ({retry_count}/{max_retries})")
                 
             except Exception as e:
+                call.finish(e)
                 print(f"图片 {image_name} API调用异常: {str(e)}")
                 return image_name, []
     
     def _parse_ingredients_from_response(self, raw_content: str) -> List[str]:
-        """从API响应中解析食材列表"""
+        """从API响应中解析食材列表（围栏剥离、截断修复和去重由 structured_output 处理）"""
         try:
-            # 预处理：清理可能的截断问题
-            raw_content = raw_content.strip()
-            
-            # 尝试从 ```json ... ``` 块中提取JSON内容
-            json_match = re.search(r'```json\n(.*?)\n```', raw_content, re.DOTALL)
-            if json_match:
-                json_content = json_match.group(1)
-            else:
-                # 如果没有找到 ```json``` 块，假设 raw_content 本身是 JSON
-                json_content = raw_content.strip()
-            
-            # 尝试解析JSON
-            try:
-                ingredients_data = json.loads(json_content)
-                ingredients = ingredients_data.get('ingredients', [])
-                
-                # 清理食材列表中的重复项和空值
-                cleaned_ingredients = []
-                seen = set()
-                for ingredient in ingredients:
-                    if isinstance(ingredient, str):
-                        # 清理换行符、制表符和多余空格
-                        cleaned = re.sub(r'\s+', ' ', ingredient.strip())
-                        if cleaned and cleaned not in seen:
-                            cleaned_ingredients.append(cleaned)
-                            seen.add(cleaned)
-                
-                return cleaned_ingredients
-                
-            except json.JSONDecodeError as e:
-                # 如果JSON解析失败，尝试修复可能的截断问题
-                print(f"JSON解析错误，尝试修复: {e}")
-                print(f"原始内容: {repr(json_content)}")
-                
-                # 尝试提取可能的JSON部分
-                json_start = json_content.find('{')
-                json_end = json_content.rfind('}')
-                
-                if json_start != -1 and json_end != -1 and json_end > json_start:
-                    # 提取看起来像JSON的部分
-                    possible_json = json_content[json_start:json_end+1]
-                    
-                    # 尝试修复常见的截断问题
-                    if '"ingredients":' in possible_json:
-                        # 检查数组是否完整
-                        array_start = possible_json.find('[', possible_json.find('"ingredients":'))
-                        if array_start != -1:
-                            # 查找数组结束位置
-                            bracket_count = 0
-                            array_end = -1
-                            for i in range(array_start, len(possible_json)):
-                                if possible_json[i] == '[':
-                                    bracket_count += 1
-                                elif possible_json[i] == ']':
-                                    bracket_count -= 1
-                                    if bracket_count == 0:
-                                        array_end = i
-                                        break
-                            
-                            if array_end == -1:
-                                # 数组没有正确结束，尝试修复
-                                if possible_json.endswith('"') or possible_json.endswith('",'):
-                                    possible_json = possible_json.rstrip('",') + '"]}'
-                                elif not possible_json.endswith(']'):
-                                    possible_json = possible_json.rstrip() + ']}'
-                                else:
-                                    possible_json = possible_json + '}'
-                    
-                    try:
-                        ingredients_data = json.loads(possible_json)
-                        ingredients = ingredients_data.get('ingredients', [])
-                        
-                        # 清理结果
-                        cleaned_ingredients = []
-                        seen = set()
-                        for ingredient in ingredients:
-                            if isinstance(ingredient, str):
-                                cleaned = re.sub(r'\s+', ' ', ingredient.strip())
-                                if cleaned and cleaned not in seen:
-                                    cleaned_ingredients.append(cleaned)
-                                    seen.add(cleaned)
-                        
-                        return cleaned_ingredients
-                        
-                    except json.JSONDecodeError:
-                        print("修复后的JSON仍然无法解析")
-                
-                # 如果修复失败，尝试正则表达式提取
-                ingredients_list = []
-                # 查找引号包围的文本，但排除 "ingredients" 字段名
-                ingredient_pattern = r'"([^"]+)"'
-                matches = re.findall(ingredient_pattern, json_content)
-                
-                for match in matches:
-                    # 过滤掉字段名和非食材内容
-                    if match.lower() not in ['ingredients', 'ingredient'] and len(match) > 1:
-                        cleaned = re.sub(r'\s+', ' ', match.strip())
-                        if cleaned and cleaned not in ingredients_list:
-                            ingredients_list.append(cleaned)
-                
-                return ingredients_list
-                
+            return parse_ingredients(raw_content)
         except Exception as e:
             print(f"解析响应内容时发生错误: {str(e)}")
             print(f"原始内容: {repr(raw_content)}")
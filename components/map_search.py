@@ -2,9 +2,13 @@
 import streamlit as st
 import folium
 from utils.translations import get_translation
+from utils.config_manager import ConfigManager
 from streamlit_folium import st_folium
 import requests
 import json
+from llm_client_pool import get_registry
+from instrumentation import start_call
+from structured_output import parse_cuisine_info
 from datetime import datetime
 import random
 
@@ -16,13 +20,16 @@ class MapSearch:
             self.amap_key = st.secrets.get("AMAP_API_KEY", "")
         except:
             self.amap_key = ""
+        # 高德 Web 服务地址，可指向本地 stub 服务器（stub_llm_server.py）做离线压测
+        self.amap_url = ConfigManager.get_config("AMAP_API_URL", "https://restapi.amap.com").rstrip("/")
 
         # 初始化 DeepSeek
         try:
-            from llm_interface import LLMInterface
+            from llm_interface import get_llm_interface
             deepseek_key = st.secrets.get("DEEPSEEK_API_KEY", "")
             if deepseek_key:
-                self.llm = LLMInterface(deepseek_key)
+                # 复用进程级实例，Streamlit 每次重跑不再新建客户端
+                self.llm = get_llm_interface(deepseek_key, ConfigManager.get_llm_providers(deepseek_key))
             else:
                 self.llm = None
         except:
@@ -200,23 +207,18 @@ class MapSearch:
             Return only JSON, no other explanations.
             """
 
-        response = self.llm.client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": get_translation('ai_food_expert_prompt', lang)},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=500
-        )
-
-        result = response.choices[0].message.content.strip()
-        if result.startswith("```json"):
-            result = result[7:]
-        if result.endswith("```"):
-            result = result[:-3]
-
-        cuisine_info = json.loads(result.strip())
+        # 经过 LLMInterface 的路由调用，享有服务商切换、重试和调用统计；模型由选中的服务商决定
+        with start_call("llm", "cuisine_info") as call:
+            response = self.llm.complete(
+                [
+                    {"role": "system", "content": get_translation('ai_food_expert_prompt', lang)},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=500,
+                call=call
+            )
+            cuisine_info = parse_cuisine_info(response.choices[0].message.content).to_dict()
         cuisine_info['confidence'] = 0.95
         cuisine_info['analysis_method'] = 'deepseek_ai'
         
@@ -287,9 +289,11 @@ class MapSearch:
         if not self.amap_key:
             return self._get_mock_restaurants(keyword)
 
+        call = start_call("amap", "place_around")
         try:
+            call.attempt()
             radius = float(radius) if radius else 3
-            url = "https://restapi.amap.com/v3/place/around"
+            url = f"{self.amap_url}/v3/place/around"
             
             lat, lng = self.user_location
             
@@ -305,7 +309,7 @@ class MapSearch:
                 'extensions': 'all'
             }
 
-            response = requests.get(url, params=params, timeout=5)
+            response = get_registry().get_http_session().get(url, params=params, timeout=5)
             data = response.json()
 
             if data['status'] == '1':
@@ -329,11 +333,15 @@ class MapSearch:
                     
                     results.append(restaurant)
                 
+                call.finish()
                 return results
             else:
+                # 高德返回的错误码，例如 10003（访问量超限）
+                call.finish(f"AMap {data.get('infocode', data['status'])}")
                 return self._get_mock_restaurants(keyword)
 
         except Exception as e:
+            call.finish(e)
             return self._get_mock_restaurants(keyword)
 
     def _get_mock_restaurants(self, keyword):
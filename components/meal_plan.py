@@ -0,0 +1,162 @@
+import streamlit as st # type: ignore
+import os
+import random
+from llm_interface import get_llm_interface
+from utils.config_manager import ConfigManager
+from utils.translations import get_translation
+
+# 同时进行的生成请求数和每秒最多发起的请求数
+MEAL_PLAN_PARALLELISM = 7
+MEAL_PLAN_RATE_LIMIT = 5
+
+
+def render_meal_plan():
+    """渲染“规划一周”模式：批量并发生成多天多餐的食谱"""
+    t = lambda key: get_translation(key, st.session_state.language)
+
+    col1, col2 = st.columns([2, 3])
+
+    with col1:
+        st.markdown(f"### 🗓️ {t('plan_my_week')}")
+
+        with st.form("meal_plan_form", clear_on_submit=False):
+            ingredient_pool = st.text_area(
+                t('meal_plan_ingredients'),
+                placeholder=t('ingredients_placeholder'),
+                height=100,
+                help=t('meal_plan_ingredients_help')
+            )
+
+            diet_options = {
+                t('no_preference'): "",
+                t('vegetarian'): "vegetarian",
+                t('vegan'): "vegan",
+                t('keto'): "keto",
+                t('low_carb'): "low-carb",
+                t('high_protein'): "high-protein",
+                t('mediterranean'): "mediterranean",
+                t('gluten_free'): "gluten-free"
+            }
+            diet = st.selectbox(t('diet_preference'), options=list(diet_options.keys()))
+
+            goal_options = {
+                t('no_goal'): "",
+                t('weight_loss'): "weight-loss",
+                t('muscle_gain'): "muscle-gain",
+                t('energy_boost'): "energy",
+                t('better_digestion'): "digestion",
+                t('immune_boost'): "immunity",
+                t('heart_health'): "heart-health"
+            }
+            goal = st.selectbox(t('health_goal'), options=list(goal_options.keys()))
+
+            col_days, col_meals = st.columns(2)
+            with col_days:
+                days = st.number_input(t('meal_plan_days'), min_value=1, max_value=7, value=7)
+            with col_meals:
+                meals_per_day = st.number_input(t('meals_per_day'), min_value=1, max_value=3, value=3)
+
+            servings = st.number_input(t('servings'), min_value=1, max_value=10, value=2)
+
+            plan_btn = st.form_submit_button(t('generate_meal_plan'), type="primary", use_container_width=True)
+
+    with col2:
+        if plan_btn:
+            if not ingredient_pool.strip():
+                st.warning(t('please_enter_ingredients'))
+                return
+
+            api_key = st.secrets.get("DEEPSEEK_API_KEY", os.getenv("DEEPSEEK_API_KEY"))
+            if not api_key:
+                st.error(t('api_key_missing'))
+                st.stop()
+
+            slots = _build_meal_slots(ingredient_pool, int(days), int(meals_per_day), t)
+            specs = [
+                {
+                    "ingredients": slot["ingredients"],
+                    "diet": diet_options[diet],
+                    "goal": goal_options[goal],
+                    "language": st.session_state.language,
+                    "servings": servings
+                }
+                for slot in slots
+            ]
+
+            st.session_state.meal_plan = [dict(slot, recipe=None, error=None) for slot in slots]
+            _generate_plan(get_llm_interface(api_key, ConfigManager.get_llm_providers(api_key)), specs, t)
+        elif st.session_state.get('meal_plan'):
+            _render_plan(st.session_state.meal_plan, t)
+
+
+def _build_meal_slots(ingredient_pool, days, meals_per_day, t):
+    """为每一餐分配食材组合，保证各餐参数不同（否则会命中同一缓存）"""
+    pool = [item.strip() for item in ingredient_pool.replace('，', ',').split(',') if item.strip()]
+    meal_names = [t('breakfast'), t('lunch'), t('dinner')][:meals_per_day]
+
+    slots = []
+    for day in range(1, days + 1):
+        for meal in meal_names:
+            picks = random.sample(pool, min(len(pool), random.randint(2, 4)))
+            slots.append({
+                "day": day,
+                "meal": meal,
+                "ingredients": f"{meal}: {', '.join(picks)}"
+            })
+    return slots
+
+
+def _generate_plan(llm, specs, t):
+    """并发生成并在每个食谱完成时立即刷新显示"""
+    plan = st.session_state.meal_plan
+    progress = st.progress(0.0, text=t('meal_plan_progress'))
+    placeholders = [st.empty() for _ in plan]
+
+    for i, slot in enumerate(plan):
+        placeholders[i].caption(f"{t('day_label').format(day=slot['day'])} · {slot['meal']} ⏳")
+
+    completed = 0
+    for index, recipe, error in llm.generate_batch(specs, max_parallel=MEAL_PLAN_PARALLELISM, rate_limit=MEAL_PLAN_RATE_LIMIT):
+        plan[index]['recipe'] = recipe
+        plan[index]['error'] = str(error) if error else None
+        completed += 1
+        progress.progress(completed / len(plan), text=f"{t('meal_plan_progress')} {completed}/{len(plan)}")
+        with placeholders[index].container():
+            _render_meal(plan[index], index, t)
+
+    progress.empty()
+
+
+def _render_plan(plan, t):
+    for index, slot in enumerate(plan):
+        _render_meal(slot, index, t)
+
+
+def _render_meal(slot, index, t):
+    """显示单餐的食谱摘要和保存按钮"""
+    header = f"{t('day_label').format(day=slot['day'])} · {slot['meal']}"
+    recipe = slot.get('recipe')
+
+    if not recipe:
+        st.error(f"{header}: {t('generation_error')} {slot.get('error') or ''}")
+        return
+
+    with st.expander(f"{header} — {recipe.get('title', t('generated_recipe'))}"):
+        if recipe.get('description'):
+            st.markdown(recipe['description'])
+
+        ingredients = recipe.get('ingredients', [])
+        if isinstance(ingredients, list):
+            st.markdown(f"**{t('ingredients')}**\n" + "\n".join(f"- {item}" for item in ingredients))
+
+        instructions = recipe.get('instructions', [])
+        if isinstance(instructions, list):
+            st.markdown(f"**{t('instructions')}**\n" + "\n".join(f"{i}. {step}" for i, step in enumerate(instructions, 1)))
+
+        if st.button(t('save_recipe'), key=f"save_meal_{index}"):
+            try:
+                st.session_state.db.save_recipe(st.session_state.username, recipe)
+                st.session_state.pop('my_recipes_pages', None)  # 我的食谱从第一页重新加载
+                st.success(t('recipe_saved'))
+            except Exception as e:
+                st.error(f"{t('save_error')}: {str(e)}")
@@ -2,6 +2,10 @@ import streamlit as st
 from datetime import datetime
 from utils.translations import get_translation
 from components.recipe_display import RecipeDisplay
+from mongodb_manager import RecipeSummary, SUMMARY_PROJECTION
+
+# “加载更多”每次追加的食谱数
+MY_RECIPES_PAGE_SIZE = 20
 
 def render_my_recipes():
     t = lambda key: get_translation(key, st.session_state.language)
@@ -46,27 +50,28 @@ def render_my_recipes():
             label_visibility="collapsed"
         )
 
-    if search_query:
-        recipes = st.session_state.db.search_recipes(st.session_state.username, search_query)
-    else:
-        recipes = st.session_state.db.get_user_recipes(st.session_state.username)
+    # 列表只查询摘要字段，完整食谱在点击查看时再读取
+    diet = diet_options.get(filter_diet, '') if filter_diet != t('all_diets') else None
+    sort = {t('oldest_first'): "oldest", t('highest_rated'): "rating"}.get(sort_by, "newest")
+    recipes, next_cursor = _load_recipe_pages(diet, sort, search_query.strip())
+    if search_query and sort == "oldest":
+        # 搜索结果默认按相关度排列，其他排序方式只作用于已加载的结果
+        recipes = sorted(recipes, key=lambda x: str(x.created))
+    elif search_query and sort == "rating":
+        recipes = sorted(recipes, key=lambda x: x.rating, reverse=True)
 
     if recipes:
-        if sort_by == t('oldest_first'):
-            recipes.reverse()
-        elif sort_by == t('highest_rated'):
-            recipes.sort(key=lambda x: x.get('rating', 0), reverse=True)
-
-        if filter_diet != t('all_diets'):
-            recipes = [r for r in recipes if r.get('diet') == diet_options.get(filter_diet, '')]
-
-        st.info(f"{t('found_recipes')}: {len(recipes)}")
+        st.info(f"{t('found_recipes')}: {len(recipes)}{'+' if next_cursor else ''}")
 
         st.markdown("<hr style='margin-top: 10px;'/>", unsafe_allow_html=True)
 
         # Display recipe thumbnails in a more compact way
         for idx, recipe in enumerate(recipes):
             _display_recipe_thumbnail(recipe, idx)
+
+        if next_cursor and st.button(t('load_more'), use_container_width=True):
+            _load_next_page(next_cursor)
+            st.rerun()
             
     else:
         st.info(t('no_recipes_yet'))
@@ -74,14 +79,55 @@ def render_my_recipes():
             st.session_state.active_tab = "generate"
             st.rerun()
 
+def _fetch_page(diet, sort, query, cursor=None):
+    """获取一页摘要；搜索按相关度分页，令牌为已加载的条数"""
+    if not query:
+        return st.session_state.db.list_recipe_page(
+            st.session_state.username, MY_RECIPES_PAGE_SIZE, cursor, diet=diet, sort=sort)
+    skip = cursor or 0
+    docs = st.session_state.db.search_recipes(st.session_state.username, query, projection=SUMMARY_PROJECTION,
+                                              limit=MY_RECIPES_PAGE_SIZE + 1, skip=skip, diet=diet)
+    next_cursor = skip + MY_RECIPES_PAGE_SIZE if len(docs) > MY_RECIPES_PAGE_SIZE else None
+    return [RecipeSummary.from_document(doc) for doc in docs[:MY_RECIPES_PAGE_SIZE]], next_cursor
+
+
+def _load_recipe_pages(diet, sort, query):
+    """返回已加载的摘要和下一页令牌；筛选、排序或搜索词变化时从第一页重新加载"""
+    state = st.session_state.get('my_recipes_pages')
+    # 搜索结果按相关度分页，排序方式不影响查询
+    key = (diet, None if query else sort, query)
+    if not state or state['filter'] != key:
+        recipes, next_cursor = _fetch_page(diet, sort, query)
+        state = st.session_state.my_recipes_pages = {
+            'filter': key, 'sort': sort, 'recipes': recipes, 'next_cursor': next_cursor}
+    return state['recipes'], state['next_cursor']
+
+
+def _load_next_page(cursor):
+    """从上一页的令牌继续加载，追加到已加载的列表"""
+    state = st.session_state.my_recipes_pages
+    diet, _, query = state['filter']
+    try:
+        recipes, next_cursor = _fetch_page(diet, state['sort'], query, cursor)
+    except ValueError:
+        del st.session_state.my_recipes_pages
+        return
+    state['recipes'] = state['recipes'] + recipes
+    state['next_cursor'] = next_cursor
+
+
+def _reset_recipe_pages():
+    st.session_state.pop('my_recipes_pages', None)
+
+
 def _display_recipe_thumbnail(recipe, idx):
-    """Display a recipe as a compact clickable thumbnail card"""
+    """Display a recipe summary (RecipeSummary) as a compact clickable thumbnail card"""
     t = lambda key: get_translation(key, st.session_state.language)
     
     # Create a card-like container with reduced padding
     with st.container():
         # Handle creation date
-        created = recipe.get('created')
+        created = recipe.created
         if isinstance(created, str):
             try:
                 created = datetime.fromisoformat(created)
@@ -91,18 +137,13 @@ def _display_recipe_thumbnail(recipe, idx):
             created = datetime.now()
         
         # Build title - use ingredients if no title
-        title = recipe.get('title', '')
-        if not title:
-            ingredients = recipe.get('ingredients', [])
-            if isinstance(ingredients, list):
-                title = ', '.join(ingredients[:3]) + ('...' if len(ingredients) > 3 else '')
-            else:
-                title = str(ingredients)[:50] + ('...' if len(str(ingredients)) > 50 else '')
+        ingredients_text = recipe.ingredients_text
+        title = recipe.title or ingredients_text
         
         # Display rating stars if available
         rating_stars = ''
-        if recipe.get('rating', 0) > 0:
-            rating_stars = f"{'⭐' * recipe.get('rating', 0)}"
+        if recipe.rating > 0:
+            rating_stars = f"{'⭐' * recipe.rating}"
         
         # Create columns for layout - main content and actions
         col1, col2, col3 = st.columns([10, 1,1])
@@ -118,30 +159,26 @@ def _display_recipe_thumbnail(recipe, idx):
                 st.caption(f"{created.strftime('%Y-%m-%d')} {rating_stars}")
             
             # Second row: Ingredients preview
-            ingredients = recipe.get('ingredients', [])
-            if isinstance(ingredients, list):
-                ingredients_text = ', '.join(ingredients[:3]) + ('...' if len(ingredients) > 3 else '')
-            else:
-                ingredients_text = str(ingredients)[:100] + ('...' if len(str(ingredients)) > 100 else '')
-            
             st.markdown(f"<div style='margin-top:-10px;'><small><i>{ingredients_text}</i></small></div>", unsafe_allow_html=True)
             
             # Third row: Tags
-            if recipe.get('tags'):
-                tags_html = ''.join([f'<span style="background-color: #e1f5fe; padding: 2px 8px; border-radius: 10px; margin-right: 4px; display: inline-block; font-size: 0.7em; margin-top: 4px;">{tag}</span>' for tag in recipe['tags']])
+            if recipe.tags:
+                tags_html = ''.join([f'<span style="background-color: #e1f5fe; padding: 2px 8px; border-radius: 10px; margin-right: 4px; display: inline-block; font-size: 0.7em; margin-top: 4px;">{tag}</span>' for tag in recipe.tags])
                 st.markdown(f"<div style='margin-top:-8px;'>{tags_html}</div>", unsafe_allow_html=True)
         
         with col2:
             # Action buttons stacked vertically
             if st.button(t('view'), key=f"view_{idx}"):
-                st.session_state.viewing_recipe = recipe
+                st.session_state.viewing_recipe = st.session_state.db.get_recipe(recipe.id, st.session_state.username,
+                                                                             st.session_state.language)
                 st.rerun()
             
             
         with col3:
             # Delete button
             if st.button("🗑️", key=f"delete_{idx}"):
-                if st.session_state.db.delete_recipe(str(recipe['_id'])):
+                if st.session_state.db.delete_recipe(recipe.id):
+                    _reset_recipe_pages()
                     st.success(t('recipe_deleted'))
                     st.rerun() 
          
@@ -166,6 +203,7 @@ def _display_single_recipe(recipe):
     with col2:
         if st.button("🗑️ " + t('delete'),use_container_width=True):
             if st.session_state.db.delete_recipe(str(recipe['_id'])):
+                _reset_recipe_pages()
                 st.success(t('recipe_deleted'))
                 del st.session_state.viewing_recipe
                 st.rerun()
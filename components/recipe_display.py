@@ -8,8 +8,34 @@ class RecipeDisplay:
     def __init__(self):
         self.t = lambda key: get_translation(key, st.session_state.language)
     
-    def display_full_recipe(self, recipe_data, show_save_options=True, enable_tts=True):
-        """显示完整食谱 - 用于生成食谱页面"""
+    def display_full_recipe(self, recipe_data, show_save_options=True, enable_tts=True, stream=None):
+        """显示完整食谱 - 用于生成食谱页面
+
+        传入 stream（LLMInterface.stream_recipe_and_nutrition 的事件流）时，
+        标题、描述、食材和步骤会随生成进度逐条显示，返回最终的食谱数据。
+        """
+        if stream is not None:
+            recipe_data = self._display_streaming_sections(stream)
+        else:
+            self._display_main_sections(recipe_data)
+        
+        # 显示营养信息
+        self._display_nutrition_info(recipe_data)
+        
+        # 显示其他信息
+        self._display_recipe_details(recipe_data)
+        
+        # 添加语音功能 - 在保存选项之前显示
+        if enable_tts:
+            self._display_tts_section(recipe_data)
+        
+        if show_save_options:
+            self._display_save_options(recipe_data)
+
+        return recipe_data
+    
+    def _display_main_sections(self, recipe_data):
+        """显示标题、描述、食材和制作步骤"""
         t = self.t
         
         # 显示食谱标题
@@ -40,19 +66,48 @@ class RecipeDisplay:
                     st.markdown(f"{i}. {step}")
             else:
                 st.markdown(instructions)
+    
+    def _display_streaming_sections(self, stream):
+        """边生成边显示标题、描述、食材和制作步骤"""
+        t = self.t
         
-        # 显示营养信息
-        self._display_nutrition_info(recipe_data)
+        title_slot = st.empty()
+        description_slot = st.empty()
+        ingredients_slot = st.empty()
+        instructions_slot = st.empty()
+        
+        title_slot.markdown(f"<h2 style='font-size: 1.8em;'>{t('generating_recipe')}</h2>", unsafe_allow_html=True)
+        
+        ingredients = []
+        instructions = []
+        recipe_data = None
+        
+        for event, value in stream:
+            if event == 'title':
+                title_slot.markdown(f"<h2 style='font-size: 1.8em;'>{value}</h2>", unsafe_allow_html=True)
+            elif event == 'description':
+                description_slot.markdown(f"### ℹ️ {t('recipe_description')}\n\n{value}")
+            elif event == 'ingredient':
+                ingredients.append(value)
+                ingredients_slot.markdown(
+                    f"### 🥕 {t('ingredients')}\n" + "\n".join(f"- {item}" for item in ingredients)
+                )
+            elif event == 'instruction':
+                instructions.append(value)
+                instructions_slot.markdown(
+                    f"### 🍳 {t('instructions')}\n" + "\n".join(f"{i}. {step}" for i, step in enumerate(instructions, 1))
+                )
+            elif event == 'recipe':
+                recipe_data = value
         
-        # 显示其他信息
-        self._display_recipe_details(recipe_data)
+        if recipe_data is None:
+            raise Exception("Recipe stream ended without a complete recipe")
         
-        # 添加语音功能 - 在保存选项之前显示
-        if enable_tts:
-            self._display_tts_section(recipe_data)
+        # 流式片段可能与最终解析结果有出入（例如标题缺失），以最终结果为准
+        if not recipe_data.get('title'):
+            title_slot.markdown(f"<h2 style='font-size: 1.8em;'>{t('generated_recipe')}</h2>", unsafe_allow_html=True)
         
-        if show_save_options:
-            self._display_save_options(recipe_data)
+        return recipe_data
     
     def _display_tts_section(self, recipe_data):
         """显示语音播报功能"""
@@ -128,7 +183,7 @@ class RecipeDisplay:
         if recipe_data.get('cook_time'):
             detail_parts.append(f"{t('cook_time')}: {recipe_data['cook_time']}")
         if recipe_data.get('difficulty'):
-            detail_parts.append(f"{t('difficulty')}: {recipe_data['difficulty']}")
+            detail_parts.append(f"{t('difficulty')}: {self._difficulty_label(recipe_data['difficulty'])}")
         
         if detail_parts:
             tts_parts.extend(detail_parts)
@@ -194,11 +249,16 @@ class RecipeDisplay:
         if recipe_data.get('cook_time'):
             details_info.append(f"**{t('cook_time')}**: {recipe_data['cook_time']}")
         if recipe_data.get('difficulty'):
-            details_info.append(f"**{t('difficulty')}**: {recipe_data['difficulty']}")
+            details_info.append(f"**{t('difficulty')}**: {self._difficulty_label(recipe_data['difficulty'])}")
         
         if details_info:
             st.markdown(" | ".join(details_info))
     
+    def _difficulty_label(self, difficulty):
+        """Easy/Medium/Hard（已保存食谱的难度以编码存储，读取时为英文）显示为当前语言"""
+        key = str(difficulty).strip().casefold()
+        return self.t(key) if key in ('easy', 'medium', 'hard') else difficulty
+
     def _display_save_options(self, recipe_data):
         """显示保存选项（表单形式）"""
         t = self.t
@@ -244,6 +304,7 @@ class RecipeDisplay:
                 
                 try:
                     recipe_id = st.session_state.db.save_recipe(st.session_state.username, save_data)
+                    st.session_state.pop('my_recipes_pages', None)  # 我的食谱从第一页重新加载
                     st.success(t('recipe_saved'))
                     st.balloons()    
                 except Exception as e:
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import datetime
-import json
+from mongodb_manager import TRASH_RETENTION_DAYS
+from recipe_transfer import export_recipes, import_recipes
 from utils.translations import get_translation
 
 def render_settings():
@@ -116,21 +117,41 @@ def render_settings():
 
     with col_danger1:
         if st.button(t('export_data'), use_container_width=True):
-            user_data = {
-                'user_info': st.session_state.user_data,
-                'recipes': st.session_state.db.get_user_recipes(st.session_state.username, limit=1000)
-            }
+            # download_button 会把数据整体读入内存并保存在会话中，这里无法流式下载：
+            # 逐批读取并 gzip 压缩，只在内存中保留压缩后的结果。
+            # 大量数据请使用 Flask 版本的 /api/recipes/export?format=gz（真正的流式响应）
+            data = b"".join(export_recipes(st.session_state.db.db, st.session_state.username, compress=True))
 
             st.download_button(
                 label=t('download_data'),
-                data=json.dumps(user_data, ensure_ascii=False, indent=2, default=str),
-                file_name=f"recipe_data_{st.session_state.username}_{datetime.now().strftime('%Y%m%d')}.json",
-                mime="application/json"
+                data=data,
+                file_name=f"recipes_{st.session_state.username}_{datetime.now().strftime('%Y%m%d')}.jsonl.gz",
+                mime="application/gzip"
             )
 
+        uploaded = st.file_uploader(t('import_data'), type=["jsonl", "gz"], help=t('import_data_help'))
+        if uploaded is not None and st.button(t('import_recipes'), use_container_width=True):
+            with st.spinner(t('importing')):
+                result = import_recipes(st.session_state.db.db, st.session_state.username, uploaded)
+            st.session_state.pop('my_recipes_pages', None)
+            st.success(t('import_result').format(**result))
+
     with col_danger2:
-        if st.button(t('clear_recipes'), type="secondary", use_container_width=True):
-            st.warning(t('clear_recipes_warning'))
+        username = st.session_state.username
+        confirmed = st.checkbox(t('clear_recipes_confirm'), key='confirm_clear_recipes')
+        st.caption(t('clear_recipes_warning').format(days=TRASH_RETENTION_DAYS))
+        if st.button(t('clear_recipes'), type="secondary", use_container_width=True, disabled=not confirmed):
+            # 移入回收站（分批 delete_many），保留期内可以恢复
+            with st.spinner(t('clearing_recipes')):
+                cleared = st.session_state.db.clear_recipes(username, soft=True)
+            st.session_state.pop('my_recipes_pages', None)
+            st.success(t('recipes_cleared').format(count=cleared, days=TRASH_RETENTION_DAYS))
+
+        trash_count = st.session_state.db.count_trash(username)
+        if trash_count and st.button(t('restore_recipes').format(count=trash_count), use_container_width=True):
+            restored = st.session_state.db.restore_recipes(username)
+            st.session_state.pop('my_recipes_pages', None)
+            st.success(t('recipes_restored').format(count=restored))
 
     with col_danger3:
         if st.button(t('delete_account'), type="secondary", use_container_width=True):
@@ -45,9 +45,9 @@ def render_sidebar():
                     member_since = datetime.fromisoformat(member_since)
                 st.caption(f"{t('member_since')} {member_since.strftime('%Y-%m')}")
 
-            # User statistics
-            stats = st.session_state.db.get_recipe_statistics(st.session_state.username)
-            if stats:
+            # User statistics（user_stats 点查询）
+            stats = st.session_state.db.get_user_stats(st.session_state.username)
+            if stats.get('total_recipes'):
                 col1, col2 = st.columns(2)
                 with col1:
                     st.metric(t('total_recipes'), stats.get('total_recipes', 0))
@@ -1,8 +1,10 @@
 import streamlit as st # type: ignore
 from datetime import datetime
-from collections import Counter
 from utils.translations import get_translation
 
+# 活动图各粒度显示的周期数
+ACTIVITY_PERIODS = {"day": 30, "week": 12, "month": 12}
+
 def render_statistics():
     t = lambda key: get_translation(key, st.session_state.language)
     diet_options = {
@@ -15,9 +17,19 @@ def render_statistics():
         t('mediterranean'): "mediterranean",
         t('gluten_free'): "gluten-free"
     }
+    goal_options = {
+        t('no_goal'): "",
+        t('weight_loss'): "weight-loss",
+        t('muscle_gain'): "muscle-gain",
+        t('energy_boost'): "energy",
+        t('better_digestion'): "digestion",
+        t('immune_boost'): "immunity",
+        t('heart_health'): "heart-health"
+    }
 
     st.markdown(f"### 📊 {t('statistics')}")
 
+    # 一次聚合得到全部统计，各维度的计数都在数据库中完成
     stats = st.session_state.db.get_recipe_statistics(st.session_state.username)
 
     if stats and stats.get('total_recipes', 0) > 0:
@@ -39,12 +51,8 @@ def render_statistics():
             )
 
         with col3:
-            diets = stats.get('most_used_diet', [])
-            if diets:
-                most_common_diet = max(set(diets), key=diets.count)
-                diet_display = next((k for k, v in diet_options.items() if v == most_common_diet), most_common_diet)
-            else:
-                diet_display = "N/A"
+            top_diets = stats.get('top_diets', [])
+            diet_display = _label(diet_options, top_diets[0]['value']) if top_diets else "N/A"
 
             st.metric(
                 t('favorite_diet'),
@@ -53,15 +61,10 @@ def render_statistics():
             )
 
         with col4:
-            current_month_recipes = st.session_state.db.get_user_recipes_by_month(
-                st.session_state.username,
-                datetime.now().year,
-                datetime.now().month
-            ) if hasattr(st.session_state.db, 'get_user_recipes_by_month') else []
-
+            monthly = stats.get('monthly', [])
             st.metric(
                 t('this_month'),
-                len(current_month_recipes) if current_month_recipes else "N/A",
+                monthly[-1]['count'] if monthly else "N/A",
                 help=t('this_month_help')
             )
 
@@ -72,38 +75,65 @@ def render_statistics():
         with col_stat1:
             st.markdown(f"### 📈 {t('recipe_trends')}")
 
-            recent_recipes = st.session_state.db.get_user_recipes(st.session_state.username, limit=7)
+            st.markdown(f"**{t('recipe_activity')}:**")
+            granularity = st.radio(
+                t('recipe_activity'),
+                list(ACTIVITY_PERIODS.keys()),
+                index=2,
+                format_func=lambda unit: t(f'by_{unit}'),
+                horizontal=True,
+                label_visibility="collapsed"
+            )
+            if granularity == "month":
+                activity = [{"period": row['month'], "count": row['count']} for row in monthly]
+            else:
+                # 按日/周为每个周期执行一次只计数的索引查询
+                activity = st.session_state.db.count_recipes_by_period(
+                    st.session_state.username, granularity, ACTIVITY_PERIODS[granularity])
+            st.bar_chart(
+                {"period": [row['period'] for row in activity], "count": [row['count'] for row in activity]},
+                x="period",
+                y="count"
+            )
+
+            recent_recipes = st.session_state.db.list_recipe_summaries(st.session_state.username, limit=5)
             if recent_recipes:
                 st.markdown(f"**{t('recent_recipes')}:**")
-                for recipe in recent_recipes[:5]:
-                    created = recipe['created']
+                for recipe in recent_recipes:
+                    created = recipe.created
                     if isinstance(created, str):
                         created = datetime.fromisoformat(created)
 
                     st.markdown(
                         f"- {created.strftime('%m-%d')} - "
-                        f"{recipe['ingredients'][:30]}... "
-                        f"{'⭐' * recipe.get('rating', 0)}"
+                        f"{recipe.ingredients_text[:30]}... "
+                        f"{'⭐' * recipe.rating}"
                     )
 
         with col_stat2:
             st.markdown(f"### 🏷️ {t('popular_tags')}")
 
-            all_tags = []
-            all_recipes = st.session_state.db.get_user_recipes(st.session_state.username, limit=100)
-            for recipe in all_recipes:
-                all_tags.extend(recipe.get('tags', []))
-
-            if all_tags:
-                tag_counts = Counter(all_tags)
-                st.markdown(f"**{t('most_used_tags')}:**")
-                for tag, count in tag_counts.most_common(10):
-                    st.markdown(f"- {tag} ({count})")
-
-        st.markdown("---")
-        st.info(t('more_analytics_coming_soon'))
+            _render_counts(t('most_used_tags'), stats.get('top_tags', []))
+            _render_counts(t('top_diets'), stats.get('top_diets', []), diet_options)
+            _render_counts(t('top_goals'), stats.get('top_goals', []), goal_options)
+            _render_counts(t('top_cuisines'), stats.get('top_cuisines', []))
     else:
         st.info(t('no_statistics_yet'))
         if st.button(t('start_cooking')):
             st.session_state.active_tab = "generate"
-            st.rerun()
\ No newline at end of file
+            st.rerun()
+
+
+def _label(options, value):
+    """把存储的选项值转换为当前语言的显示名称"""
+    return next((k for k, v in options.items() if v == value), value)
+
+
+def _render_counts(title, rows, options=None):
+    """显示 [{"value", "count"}] 形式的排行"""
+    if not rows:
+        return
+    st.markdown(f"**{title}:**")
+    for row in rows:
+        value = _label(options, row['value']) if options else row['value']
+        st.markdown(f"- {value} ({row['count']})")
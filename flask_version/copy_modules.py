@@ -16,6 +16,17 @@ def copy_modules():
     files_to_copy = [
         'mongodb_manager.py',
         'llm_interface.py', 
+        'async_llm_interface.py',
+        'llm_client_pool.py',
+        'llm_resilience.py',
+        'llm_router.py',
+        'recipe_prompt.py',
+        'structured_output.py',
+        'semantic_cache.py',
+        'recipe_search.py',
+        'recipe_schema.py',
+        'recipe_transfer.py',
+        'instrumentation.py',
         'nutrition_analyzer.py'
     ]
     
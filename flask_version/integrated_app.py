@@ -4,7 +4,7 @@ Recipe App - 完全集成版本
 集成所有原有功能的Flask应用
 """
 
-from flask import Flask, render_template, request, jsonify, session, send_file
+from flask import Flask, render_template, request, jsonify, session, send_file, Response, stream_with_context
 import os
 import sys
 import json
@@ -19,8 +19,16 @@ parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
 try:
-    from mongodb_manager import MongoDBManager
-    from llm_interface import LLMInterface  
+    from mongodb_manager import MAX_PAGE_SIZE, MongoDBManager, RecipeSummary, SUMMARY_PROJECTION, get_pool_stats
+    from llm_interface import LLMInterface, get_coalescing_stats
+    from async_llm_interface import AsyncLLMInterface, run_async, iterate_async, get_async_coalescing_stats
+    from llm_client_pool import get_registry
+    from llm_router import parse_providers
+    from recipe_prompt import get_token_usage_stats
+    from semantic_cache import get_semantic_cache_stats
+    from recipe_transfer import export_recipes, import_recipes
+    from instrumentation import render_prometheus
+    from llm_resilience import get_circuit_breaker_stats, get_hedger_stats
     from nutrition_analyzer import NutritionAnalyzer
     from components.image_input_modal import ImageInputModal
     print("✅ Successfully imported all original modules")
@@ -31,6 +39,8 @@ except ImportError as e:
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'recipe-app-integrated-2025')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# 单次食谱生成的最长等待时间（秒）
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 120))
 
 # 初始化服务
 services = {}
@@ -51,7 +61,10 @@ def initialize_services():
     try:
         # DeepSeek API
         deepseek_key = os.getenv('DEEPSEEK_API_KEY', 'fallback-key')
-        services['llm'] = LLMInterface(deepseek_key)
+        # 异步接口运行在进程级事件循环上，所有请求共享连接池和并发上限
+        # LLM_PROVIDERS 可配置多个 OpenAI 兼容服务商（含本地 stub），按延迟和错误率路由
+        providers = parse_providers(os.getenv('LLM_PROVIDERS'), deepseek_key)
+        services['llm'] = AsyncLLMInterface(deepseek_key, providers=providers)
         print("✅ LLM interface initialized")
     except Exception as e:
         print(f"⚠️  LLM initialization failed: {e}")
@@ -96,6 +109,33 @@ def api_test():
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    """LLM 运行统计：请求合并（coalesced 为未实际调用 API 的请求数）、服务商路由、客户端健康状态、熔断器、对冲请求计数、token 用量和语义缓存命中率"""
+    return jsonify({
+        "success": True,
+        "coalescing": {
+            "sync": get_coalescing_stats(),
+            "async": get_async_coalescing_stats()
+        },
+        "clients": get_registry().health(),
+        "providers": services['llm'].router.stats() if services.get('llm') else {},
+        "circuit_breakers": get_circuit_breaker_stats(),
+        "hedging": get_hedger_stats(),
+        "tokens": get_token_usage_stats(),
+        "semantic_cache": get_semantic_cache_stats()
+    })
+
+@app.route('/api/db/stats', methods=['GET'])
+def db_stats():
+    """MongoDB 连接池统计：当前/在用连接数、借出次数和等待超时次数"""
+    return jsonify({"success": True, "pool": get_pool_stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 文本格式的外部调用指标（DeepSeek、SiliconFlow、高德）：耗时和首 token 分位数、调用/错误/重试计数、token 用量和费用"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/login', methods=['POST'])
 def login():
     """用户登录 - 使用原有数据库验证"""
@@ -199,63 +239,45 @@ def generate_recipe():
     cooking_time = data.get('prepTime', data.get('cooking_time', ''))
     difficulty = data.get('difficulty', '')
     servings = data.get('servings', 4)
+    regenerate = bool(data.get('regenerate', False))
     
     if not ingredients:
         return jsonify({"success": False, "message": "请输入食材或描述"})
     
+    params = {
+        'ingredients': ingredients,
+        'diet': diet,
+        'goal': goal,
+        'language': language,
+        'cuisine': cuisine,
+        'cooking_time': cooking_time,
+        'difficulty': difficulty,
+        'servings': servings
+    }
+    
+    # 客户端请求 SSE 时以流式方式返回
+    wants_stream = data.get('stream') or request.accept_mimetypes.best == 'text/event-stream'
+    if wants_stream and services['llm']:
+        return Response(
+            stream_with_context(_generate_recipe_events(username, params, regenerate)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
     try:
         if services['llm']:
             # 使用原有的LLM接口生成食谱
-            recipe_result = services['llm'].generate_recipe_and_nutrition(
-                ingredients=ingredients,
-                diet=diet,
-                goal=goal,
-                language=language,
-                cuisine=cuisine,
-                cooking_time=cooking_time,
-                difficulty=difficulty,
-                servings=servings
+            recipe_result = run_async(
+                services['llm'].generate_recipe_and_nutrition(regenerate=regenerate, **params),
+                timeout=LLM_REQUEST_TIMEOUT
             )
-            
-            # 处理营养信息
-            nutrition_info = ""
-            if services['nutrition'] and recipe_result:
-                try:
-                    nutrition_info = services['nutrition'].parse_nutrition(recipe_result)
-                except Exception as e:
-                    print(f"Nutrition parsing error: {e}")
-            
-            # 格式化食谱显示
-            if isinstance(recipe_result, dict):
-                recipe_html = format_recipe_html(recipe_result, nutrition_info)
-            else:
-                recipe_html = f"<div class='recipe-card'>{recipe_result}</div>"
-            
-            # 保存到数据库
-            if services['db']:
-                try:
-                    recipe_data = {
-                        'title': ingredients[:50] + ('...' if len(ingredients) > 50 else ''),
-                        'content': recipe_result,
-                        'nutrition': nutrition_info,
-                        'generated_at': datetime.now(),
-                        'parameters': {
-                            'ingredients': ingredients,
-                            'diet': diet,
-                            'goal': goal,
-                            'cuisine': cuisine,
-                            'difficulty': difficulty,
-                            'servings': servings
-                        }
-                    }
-                    services['db'].save_recipe(username, recipe_data)
-                except Exception as e:
-                    print(f"Save recipe error: {e}")
+            recipe_html = _finalize_generated_recipe(username, params, recipe_result)
             
             return jsonify({
                 "success": True,
                 "recipe": recipe_html,
-                "raw_data": recipe_result
+                "raw_data": recipe_result,
+                **_fallback_fields(recipe_result)
             })
             
         else:
@@ -274,6 +296,181 @@ def generate_recipe():
             "message": f"生成食谱时出错: {str(e)}"
         })
 
+def _sse_event(event, payload):
+    """格式化一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+def _generate_recipe_events(username, params, regenerate=False):
+    """流式生成食谱，逐条推送 title/description/ingredient/instruction 事件
+
+    客户端断开时 Werkzeug 关闭本生成器，iterate_async 随即取消上游生成。
+    """
+    try:
+        for event, value in iterate_async(services['llm'].stream_recipe_and_nutrition(regenerate=regenerate, **params)):
+            if event == 'recipe':
+                recipe_html = _finalize_generated_recipe(username, params, value)
+                yield _sse_event('done', {"success": True, "recipe": recipe_html, "raw_data": value, **_fallback_fields(value)})
+            else:
+                yield _sse_event(event, {"value": value})
+    except Exception as e:
+        print(f"Generate recipe stream error: {e}")
+        traceback.print_exc()
+        yield _sse_event('error', {"success": False, "message": f"生成食谱时出错: {str(e)}"})
+
+def _is_fallback(recipe_result):
+    return isinstance(recipe_result, dict) and bool(recipe_result.get('fallback'))
+
+def _fallback_fields(recipe_result):
+    """响应中的降级标记：AI 不可用时返回的模板食谱不会保存，客户端应提示用户"""
+    if not _is_fallback(recipe_result):
+        return {"fallback": False}
+    return {"fallback": True, "message": "AI 服务暂时不可用，这是根据食材生成的基础食谱，未保存到我的食谱"}
+
+def _finalize_generated_recipe(username, params, recipe_result):
+    """解析营养信息、渲染HTML并保存生成的食谱（降级的模板食谱不保存）"""
+    ingredients = params['ingredients']
+    
+    # 处理营养信息
+    nutrition_info = ""
+    if services['nutrition'] and recipe_result:
+        try:
+            nutrition_info = services['nutrition'].parse_nutrition(recipe_result)
+        except Exception as e:
+            print(f"Nutrition parsing error: {e}")
+    
+    # 格式化食谱显示
+    if isinstance(recipe_result, dict):
+        recipe_html = format_recipe_html(recipe_result, nutrition_info)
+    else:
+        recipe_html = f"<div class='recipe-card'>{recipe_result}</div>"
+    
+    # 保存到数据库
+    if services['db'] and not _is_fallback(recipe_result):
+        try:
+            recipe_data = {
+                'title': ingredients[:50] + ('...' if len(ingredients) > 50 else ''),
+                'content': recipe_result,
+                'nutrition': nutrition_info,
+                'generated_at': datetime.now(),
+                'parameters': {
+                    'ingredients': ingredients,
+                    'diet': params['diet'],
+                    'goal': params['goal'],
+                    'cuisine': params['cuisine'],
+                    'difficulty': params['difficulty'],
+                    'servings': params['servings']
+                }
+            }
+            services['db'].save_recipe(username, recipe_data)
+        except Exception as e:
+            print(f"Save recipe error: {e}")
+    
+    return recipe_html
+
+# 批量生成的上限：一周三餐
+MEAL_PLAN_MAX_ITEMS = 21
+# 搜索结果按相关度排序后 skip 分页，限制可翻到的深度
+SEARCH_MAX_SKIP = 10_000
+
+
+def _bounded_int(value, default, low, high):
+    """把请求参数转换为 [low, high] 内的整数，缺省时返回 default；无法转换时抛出 ValueError"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid integer: {value!r}")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid integer: {value!r}")
+    return max(low, min(number, high))
+
+
+def _positive_float(value):
+    """把可选的速率参数转换为正数，缺省时返回 None；无法转换或不为正数时抛出 ValueError"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid number: {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid number: {value!r}")
+    if not 0 < number < float('inf'):
+        raise ValueError(f"Must be a positive number: {value!r}")
+    return number
+
+
+def _json_bool(value, default):
+    """JSON 请求体中的布尔参数，缺省时返回 default；不是 true/false 时抛出 ValueError（"false"、0 不视为布尔值）"""
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise ValueError(f"Invalid boolean: {value!r}")
+    return value
+
+@app.route('/api/generate-meal-plan', methods=['POST'])
+def generate_meal_plan():
+    """批量生成食谱（如一周膳食计划），并发执行，按完成顺序返回"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    
+    data = request.get_json(silent=True) or {}
+    specs = data.get('specs', [])
+    try:
+        max_parallel = _bounded_int(data.get('max_parallel'), 7, 1, MEAL_PLAN_MAX_ITEMS)
+        rate_limit = _positive_float(data.get('rate_limit'))
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"参数无效: {e}"}), 400
+    
+    if not specs:
+        return jsonify({"success": False, "message": "请提供至少一个食谱参数"})
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        return jsonify({"success": False, "message": "specs 必须是对象列表"}), 400
+    if len(specs) > MEAL_PLAN_MAX_ITEMS:
+        return jsonify({"success": False, "message": f"一次最多生成 {MEAL_PLAN_MAX_ITEMS} 个食谱"})
+    if not services['llm']:
+        return jsonify({"success": False, "message": "AI服务不可用"})
+    
+    # 只保留 generate_recipe_and_nutrition 支持的参数
+    allowed = ('ingredients', 'diet', 'goal', 'language', 'cuisine', 'cooking_time', 'difficulty', 'servings')
+    specs = [
+        {'diet': '', 'goal': '', **{key: spec[key] for key in allowed if key in spec}}
+        for spec in specs
+    ]
+    if any(not spec.get('ingredients') for spec in specs):
+        return jsonify({"success": False, "message": "每个食谱都需要食材"})
+    
+    batch = services['llm'].generate_batch(specs, max_parallel=max_parallel, rate_limit=rate_limit)
+    
+    def result_payload(index, recipe, error):
+        if error is not None:
+            return {"index": index, "success": False, "message": str(error)}
+        return {"index": index, "success": True, "recipe": recipe, "fallback": _is_fallback(recipe)}
+    
+    wants_stream = data.get('stream') or request.accept_mimetypes.best == 'text/event-stream'
+    if wants_stream:
+        def events():
+            for index, recipe, error in iterate_async(batch):
+                yield _sse_event('result', result_payload(index, recipe, error))
+            yield _sse_event('done', {"success": True, "count": len(specs)})
+        
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    try:
+        results = [None] * len(specs)
+        for index, recipe, error in iterate_async(batch):
+            results[index] = result_payload(index, recipe, error)
+        return jsonify({"success": True, "results": results})
+    except Exception as e:
+        print(f"Generate meal plan error: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": f"生成膳食计划时出错: {str(e)}"})
+
 @app.route('/api/image-recognition', methods=['POST'])
 def image_recognition():
     """图像识别 - 使用原有功能"""
@@ -311,22 +508,33 @@ def image_recognition():
 
 @app.route('/api/my-recipes', methods=['GET'])
 def get_my_recipes():
-    """获取用户的食谱"""
+    """获取用户的食谱列表（摘要字段，完整内容通过 /api/recipes/<id> 获取）
+
+    使用键集分页：第一页不传 cursor，之后传入上一页返回的 next_cursor，直到 has_more 为 false。
+    """
     if not session.get('logged_in'):
         return jsonify({"success": False, "message": "请先登录"})
     
     username = session.get('username')
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 10))
-    skip = (page - 1) * limit
+    try:
+        limit = _bounded_int(request.args.get('limit'), 10, 1, MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"参数无效: {e}"}), 400
+    cursor = request.args.get('cursor') or None
+    sort = request.args.get('sort', 'newest')
+    diet = request.args.get('diet')
     
     try:
         if services['db']:
-            recipes = services['db'].get_user_recipes(username, limit, skip)
+            try:
+                recipes, next_cursor = services['db'].list_recipe_page(username, limit, cursor, diet=diet, sort=sort)
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
             return jsonify({
                 "success": True,
-                "recipes": recipes,
-                "page": page,
+                "recipes": [recipe.to_dict() for recipe in recipes],
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
                 "limit": limit
             })
         else:
@@ -341,6 +549,160 @@ def get_my_recipes():
         print(f"Get recipes error: {e}")
         return jsonify({"success": False, "message": str(e)})
 
+@app.route('/api/recipes/search', methods=['GET'])
+def search_my_recipes():
+    """按相关度搜索用户的食谱（q 为搜索词，limit/skip 分页）"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+
+    query = request.args.get('q', '').strip()
+    try:
+        limit = _bounded_int(request.args.get('limit'), 20, 1, MAX_PAGE_SIZE)
+        skip = _bounded_int(request.args.get('skip'), 0, 0, SEARCH_MAX_SKIP)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"参数无效: {e}"}), 400
+    try:
+        docs = services['db'].search_recipes(session.get('username'), query, projection=SUMMARY_PROJECTION,
+                                             limit=limit + 1, skip=skip, diet=request.args.get('diet'))
+        recipes = [{**RecipeSummary.from_document(doc).to_dict(), "score": doc.get("score", 0)} for doc in docs[:limit]]
+        return jsonify({
+            "success": True,
+            "recipes": recipes,
+            "has_more": len(docs) > limit,
+            "next_skip": skip + limit if len(docs) > limit else None
+        })
+    except Exception as e:
+        print(f"Search recipes error: {e}")
+        return jsonify({"success": False, "message": str(e)})
+
+@app.route('/api/recipes/export', methods=['GET'])
+def export_my_recipes():
+    """流式导出用户的全部食谱（JSONL，format=gz 时为 gzip 压缩）"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+
+    username = session.get('username')
+    compress = request.args.get('format') == 'gz'
+    file_name = f"recipes_{username}_{datetime.now().strftime('%Y%m%d')}.jsonl" + (".gz" if compress else "")
+    chunks = export_recipes(services['db'].db, username, compress=compress)
+    return Response(
+        stream_with_context(chunks),
+        mimetype="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{secure_filename(file_name) or "recipes.jsonl"}"'}
+    )
+
+@app.route('/api/recipes/import', methods=['POST'])
+def import_my_recipes():
+    """从上传的 JSONL / JSONL.gz 文件批量导入食谱，内容相同的食谱跳过"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({"success": False, "message": "没有上传文件"}), 400
+
+    try:
+        batch_size = _bounded_int(request.form.get('batch_size'), 1000, 1, 10_000)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"参数无效: {e}"}), 400
+    try:
+        result = import_recipes(services['db'].db, session.get('username'), upload.stream, batch_size=batch_size)
+        return jsonify({"success": True, **result})
+    except Exception as e:
+        print(f"Import recipes error: {e}")
+        return jsonify({"success": False, "message": str(e)})
+
+@app.route('/api/recipes/delete', methods=['POST'])
+def delete_my_recipes():
+    """批量删除食谱：ids 为 id 列表，all 为 true 时删除全部；soft 默认为 true（移入回收站）"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+
+    data = request.get_json(silent=True) or {}
+    username = session.get('username')
+    try:
+        soft = _json_bool(data.get('soft'), True)
+        delete_all = _json_bool(data.get('all'), False)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"参数无效: {e}"}), 400
+    try:
+        if delete_all:
+            deleted = services['db'].clear_recipes(username, soft=soft)
+        elif isinstance(data.get('ids'), list):
+            deleted = services['db'].delete_recipes(username, data['ids'], soft=soft)
+        else:
+            return jsonify({"success": False, "message": "缺少 ids 或 all 参数"}), 400
+        return jsonify({"success": True, "deleted": deleted, "soft": soft})
+    except Exception as e:
+        print(f"Delete recipes error: {e}")
+        return jsonify({"success": False, "message": str(e)})
+
+@app.route('/api/recipes/trash', methods=['GET', 'DELETE'])
+def recipe_trash():
+    """GET 列出回收站中的食谱，DELETE 清空回收站"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+
+    username = session.get('username')
+    try:
+        if request.method == 'DELETE':
+            return jsonify({"success": True, "deleted": services['db'].empty_trash(username)})
+        try:
+            limit = _bounded_int(request.args.get('limit'), 20, 1, MAX_PAGE_SIZE)
+        except ValueError as e:
+            return jsonify({"success": False, "message": f"参数无效: {e}"}), 400
+        return jsonify({
+            "success": True,
+            "recipes": [recipe.to_dict() for recipe in services['db'].list_trash(username, limit)],
+            "total": services['db'].count_trash(username)
+        })
+    except Exception as e:
+        print(f"Recipe trash error: {e}")
+        return jsonify({"success": False, "message": str(e)})
+
+@app.route('/api/recipes/trash/restore', methods=['POST'])
+def restore_my_recipes():
+    """从回收站恢复食谱：ids 为 id 列表，不传时恢复全部"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+
+    data = request.get_json(silent=True) or {}
+    try:
+        restored = services['db'].restore_recipes(session.get('username'), data.get('ids'))
+        return jsonify({"success": True, "restored": restored})
+    except Exception as e:
+        print(f"Restore recipes error: {e}")
+        return jsonify({"success": False, "message": str(e)})
+
+@app.route('/api/recipes/<recipe_id>', methods=['GET'])
+def get_recipe_detail(recipe_id):
+    """获取单个食谱的完整内容（language 参数决定难度等字段的语言，默认中文）"""
+    if not session.get('logged_in'):
+        return jsonify({"success": False, "message": "请先登录"})
+    if not services['db']:
+        return jsonify({"success": False, "message": "数据库不可用"})
+
+    try:
+        recipe = services['db'].get_recipe(recipe_id, session.get('username'), request.args.get('language', 'zh'))
+        if recipe is None:
+            return jsonify({"success": False, "message": "食谱不存在"}), 404
+        recipe['_id'] = str(recipe['_id'])
+        return jsonify({"success": True, "recipe": recipe})
+    except Exception as e:
+        print(f"Get recipe error: {e}")
+        return jsonify({"success": False, "message": str(e)})
+
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """获取用户统计数据"""
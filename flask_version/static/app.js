@@ -238,21 +238,34 @@ async function generateRecipe() {
             input: input,
             cuisine: cuisineType,
             difficulty: difficulty,
-            prepTime: prepTime
+            prepTime: prepTime,
+            stream: true
         };
         
         const response = await fetch('/api/generate-recipe', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
             },
             body: JSON.stringify(requestData)
         });
         
-        const result = await response.json();
+        let result;
+        if ((response.headers.get('Content-Type') || '').includes('text/event-stream')) {
+            // 流式生成：边接收边显示
+            showLoading(false);
+            result = await readRecipeStream(response);
+        } else {
+            result = await response.json();
+        }
         
-        if (result.success) {
+        if (result && result.success) {
             displayRecipe(result.recipe);
+            if (result.fallback) {
+                // AI 不可用时返回的模板食谱，服务端没有保存
+                showMessage(result.message || 'AI service is temporarily unavailable. Showing a basic recipe.', 'info');
+            }
             
             // 保存到本地历史记录
             saveRecipeToHistory({
@@ -275,6 +288,61 @@ async function generateRecipe() {
     }
 }
 
+// 读取 Server-Sent Events 食谱流，返回最终的 done 事件数据
+async function readRecipeStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const partial = { title: '', description: '', ingredients: [], instructions: [] };
+    let buffer = '';
+    let finalResult = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventName = 'message';
+            let dataText = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataText += line.slice(5).trim();
+            });
+            const payload = dataText ? JSON.parse(dataText) : {};
+            
+            if (eventName === 'done' || eventName === 'error') {
+                finalResult = payload;
+            } else if (eventName === 'ingredient') {
+                partial.ingredients.push(payload.value);
+            } else if (eventName === 'instruction') {
+                partial.instructions.push(payload.value);
+            } else if (eventName in partial) {
+                partial[eventName] = payload.value;
+            }
+            
+            if (!finalResult) renderPartialRecipe(partial);
+        }
+    }
+    return finalResult;
+}
+
+// 显示生成中的部分食谱
+function renderPartialRecipe(partial) {
+    const resultDiv = document.getElementById('recipe-result');
+    resultDiv.innerHTML = `
+        <div class="recipe-card">
+            <h3>🍳 ${partial.title || 'Generating...'}</h3>
+            ${partial.description ? `<p>${partial.description}</p>` : ''}
+            <div class="ingredients"><ul>${partial.ingredients.map(i => `<li>${i}</li>`).join('')}</ul></div>
+            <div class="instructions"><ol>${partial.instructions.map(s => `<li>${s}</li>`).join('')}</ol></div>
+        </div>
+    `;
+}
+
 // 显示生成的食谱
 function displayRecipe(recipeHTML) {
     const resultDiv = document.getElementById('recipe-result');
@@ -0,0 +1,256 @@
+import json
+import os
+import threading
+import time
+
+# 各服务商每百万 token 的价格（美元），可用 LLM_TOKEN_PRICES 覆盖，例如
+# {"deepseek": {"input": 0.27, "output": 1.10}, "local": {"input": 0, "output": 0}}
+DEFAULT_TOKEN_PRICES = {
+    "deepseek": {"input": 0.27, "output": 1.10},
+}
+# Prometheus 导出的分位点
+EXPORT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+METRIC_PREFIX = "smart_recipe"
+
+# 直方图精度：每个 2 的幂区间分为 HISTOGRAM_SUB_BUCKETS / 2 个线性桶，相对误差约 3%
+_SUB_BUCKET_BITS = 6
+HISTOGRAM_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_HALF_SUB_BUCKETS = HISTOGRAM_SUB_BUCKETS // 2
+
+
+def _load_token_prices():
+    raw = os.getenv("LLM_TOKEN_PRICES")
+    if not raw:
+        return dict(DEFAULT_TOKEN_PRICES)
+    try:
+        return {**DEFAULT_TOKEN_PRICES, **json.loads(raw)}
+    except ValueError as e:
+        print(f"Invalid LLM_TOKEN_PRICES, using defaults: {e}")
+        return dict(DEFAULT_TOKEN_PRICES)
+
+
+class LatencyHistogram:
+    """HDR 风格的对数-线性直方图（单位微秒）
+
+    小于 HISTOGRAM_SUB_BUCKETS 的值精确计数，更大的值在每个 2 的幂区间内等分为
+    _HALF_SUB_BUCKETS 个桶；记录为 O(1)，内存只与值域跨度有关，与样本数无关。
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def _index(value):
+        if value < HISTOGRAM_SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - _SUB_BUCKET_BITS
+        return shift * _HALF_SUB_BUCKETS + (value >> shift)
+
+    @staticmethod
+    def _upper_bound(index):
+        """桶内的最大值"""
+        if index < HISTOGRAM_SUB_BUCKETS:
+            return index
+        shift = index // _HALF_SUB_BUCKETS - 1
+        return ((index - shift * _HALF_SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """分位值（秒），没有样本时返回 None"""
+        if not self.count:
+            return None
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count / 1_000_000, 6) if self.count else None,
+            "min": self.min / 1_000_000 if self.min is not None else None,
+            "max": self.max / 1_000_000 if self.max is not None else None,
+            **{f"p{q * 100:g}": self.percentile(q) for q in EXPORT_QUANTILES},
+        }
+
+
+class CallRecord:
+    """一次外部调用的记录，由 Metrics.start_call 创建，finish 后计入统计"""
+
+    def __init__(self, metrics, service, operation, provider=None):
+        self.metrics = metrics
+        self.service = service
+        self.operation = operation
+        self.provider = provider or service
+        self.started = time.perf_counter()
+        self.ttft = None
+        self.attempts = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.finished = False
+
+    def attempt(self, provider=None):
+        """开始一次尝试（重试或对冲），provider 为本次尝试使用的服务商"""
+        self.attempts += 1
+        if provider:
+            self.provider = provider
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def add_tokens(self, tokens_in=0, tokens_out=0):
+        self.tokens_in += tokens_in or 0
+        self.tokens_out += tokens_out or 0
+
+    def finish(self, error=None, status=None):
+        """结束调用；重复调用无效
+
+        error 为异常（记录其类名）或错误类别字符串（例如 "HTTP 429"）；status 默认为 ok / error。
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if status is None:
+            status = "ok" if error is None else "error"
+        if isinstance(error, BaseException):
+            error = type(error).__name__
+        self.metrics.record(self, time.perf_counter() - self.started, status, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+
+class Metrics:
+    """进程内的调用指标：耗时/首 token 直方图、调用/错误/重试计数、token 用量和费用"""
+
+    def __init__(self, token_prices=None):
+        self.token_prices = token_prices if token_prices is not None else _load_token_prices()
+        self._lock = threading.Lock()
+        self._durations = {}    # (service, operation) -> LatencyHistogram
+        self._ttft = {}         # (service, operation) -> LatencyHistogram
+        self._calls = {}        # (service, operation, status) -> int
+        self._errors = {}       # (service, operation, error) -> int
+        self._retries = {}      # (service, operation) -> int
+        self._tokens = {}       # (service, provider, direction) -> int
+        self._cost = {}         # (service, provider) -> float
+
+    def start_call(self, service, operation, provider=None):
+        return CallRecord(self, service, operation, provider)
+
+    def _cost_of(self, provider, tokens_in, tokens_out):
+        prices = self.token_prices.get(provider)
+        if not prices:
+            return 0.0
+        return (tokens_in * prices.get("input", 0) + tokens_out * prices.get("output", 0)) / 1_000_000
+
+    def record(self, call, duration, status, error=None):
+        key = (call.service, call.operation)
+        with self._lock:
+            self._durations.setdefault(key, LatencyHistogram()).record(duration)
+            if call.ttft is not None:
+                self._ttft.setdefault(key, LatencyHistogram()).record(call.ttft)
+            self._calls[key + (status,)] = self._calls.get(key + (status,), 0) + 1
+            if error:
+                self._errors[key + (error,)] = self._errors.get(key + (error,), 0) + 1
+            if call.attempts > 1:
+                self._retries[key] = self._retries.get(key, 0) + call.attempts - 1
+            for direction, tokens in (("input", call.tokens_in), ("output", call.tokens_out)):
+                if tokens:
+                    token_key = (call.service, call.provider, direction)
+                    self._tokens[token_key] = self._tokens.get(token_key, 0) + tokens
+            cost = self._cost_of(call.provider, call.tokens_in, call.tokens_out)
+            if cost:
+                cost_key = (call.service, call.provider)
+                self._cost[cost_key] = self._cost.get(cost_key, 0.0) + cost
+
+    def snapshot(self):
+        """供诊断面板和 JSON 接口使用的汇总"""
+        with self._lock:
+            return {
+                "calls": [{"service": s, "operation": o, "status": st, "count": n} for (s, o, st), n in sorted(self._calls.items())],
+                "errors": [{"service": s, "operation": o, "error": e, "count": n} for (s, o, e), n in sorted(self._errors.items())],
+                "retries": [{"service": s, "operation": o, "count": n} for (s, o), n in sorted(self._retries.items())],
+                "latency": [{"service": s, "operation": o, **histogram.summary()} for (s, o), histogram in sorted(self._durations.items())],
+                "ttft": [{"service": s, "operation": o, **histogram.summary()} for (s, o), histogram in sorted(self._ttft.items())],
+                "tokens": [{"service": s, "provider": p, "direction": d, "count": n} for (s, p, d), n in sorted(self._tokens.items())],
+                "cost_usd": [{"service": s, "provider": p, "total": round(c, 6)} for (s, p), c in sorted(self._cost.items())],
+            }
+
+    def render_prometheus(self):
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+
+        def labels(**values):
+            pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in values.items())
+            return '{' + pairs + '}'
+
+        def summary(name, help_text, histograms):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} summary")
+            for (service, operation), histogram in sorted(histograms.items()):
+                for q in EXPORT_QUANTILES:
+                    lines.append(f"{METRIC_PREFIX}_{name}{labels(service=service, operation=operation, quantile=q)} {histogram.percentile(q)}")
+                lines.append(f"{METRIC_PREFIX}_{name}_sum{labels(service=service, operation=operation)} {histogram.total / 1_000_000}")
+                lines.append(f"{METRIC_PREFIX}_{name}_count{labels(service=service, operation=operation)} {histogram.count}")
+
+        def counter(name, help_text, values, label_names):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f"{METRIC_PREFIX}_{name}{labels(**dict(zip(label_names, key)))} {value}")
+
+        with self._lock:
+            summary("call_duration_seconds", "Wall time of external API calls", self._durations)
+            summary("call_ttft_seconds", "Time to first streamed token", self._ttft)
+            counter("calls_total", "External API calls by outcome", self._calls, ("service", "operation", "status"))
+            counter("call_errors_total", "Failed external API calls by error class", self._errors, ("service", "operation", "error"))
+            counter("call_retries_total", "Retry and hedge attempts beyond the first", self._retries, ("service", "operation"))
+            counter("tokens_total", "LLM tokens by direction", self._tokens, ("service", "provider", "direction"))
+            counter("cost_usd_total", "Estimated LLM cost in USD", self._cost, ("service", "provider"))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            for values in (self._durations, self._ttft, self._calls, self._errors, self._retries, self._tokens, self._cost):
+                values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """进程级调用指标"""
+    return _metrics
+
+
+def start_call(service, operation, provider=None):
+    """开始记录一次外部调用，可作为上下文管理器使用（异常时记为失败）"""
+    return _metrics.start_call(service, operation, provider)
+
+
+def render_prometheus():
+    return _metrics.render_prometheus()
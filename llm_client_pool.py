@@ -0,0 +1,175 @@
+from openai import OpenAI, AsyncOpenAI # type: ignore
+import atexit
+import hashlib
+import threading
+import time
+import httpx # type: ignore
+import requests # type: ignore
+from requests.adapters import HTTPAdapter # type: ignore
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+# HTTP/2 需要安装 h2（pip install "httpx[http2]"），缺失时退回 HTTP/1.1 keep-alive
+try:
+    import h2  # type: ignore  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 连接池参数：保持长连接，避免每次请求重新握手 TLS
+POOL_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=300)
+POOL_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+# 重试由 llm_resilience 统一控制，SDK 自带的重试关闭（max_retries=0）
+
+# 连续失败多少次后认为客户端不健康
+UNHEALTHY_AFTER_FAILURES = 3
+
+
+def _client_id(api_key, base_url):
+    """生成不暴露密钥的客户端标识"""
+    digest = hashlib.sha256((api_key or "").encode()).hexdigest()[:8]
+    return f"{base_url}#{digest}"
+
+
+class ClientHealth:
+    """单个客户端的健康状态"""
+
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_success_at = None
+        self.last_failure_at = None
+
+    @property
+    def healthy(self):
+        return self.consecutive_failures < UNHEALTHY_AFTER_FAILURES
+
+    def to_dict(self):
+        return {
+            "healthy": self.healthy,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+        }
+
+
+class LLMClientRegistry:
+    """进程级 LLM 客户端注册表
+
+    按 (api_key, base_url) 懒加载并复用 OpenAI / AsyncOpenAI 客户端及其 HTTP 连接池，
+    同时为 SiliconFlow、高德等普通 HTTP 调用提供共享的 requests.Session。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_clients = {}
+        self._async_clients = {}
+        self._health = {}
+        self._http_session = None
+        self._async_closer = None
+
+    def get_client(self, api_key, base_url=DEEPSEEK_BASE_URL):
+        """获取共享的同步 OpenAI 客户端"""
+        key = (api_key, base_url)
+        with self._lock:
+            client = self._sync_clients.get(key)
+            if client is None:
+                http_client = httpx.Client(http2=HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=POOL_TIMEOUT)
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+                self._sync_clients[key] = client
+                self._health.setdefault(key, ClientHealth())
+            return client
+
+    def get_async_client(self, api_key, base_url=DEEPSEEK_BASE_URL):
+        """获取共享的 AsyncOpenAI 客户端
+
+        连接池绑定在首次使用它的事件循环上，应只在进程级后台循环中使用。
+        """
+        key = (api_key, base_url)
+        with self._lock:
+            client = self._async_clients.get(key)
+            if client is None:
+                http_client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=POOL_TIMEOUT)
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+                self._async_clients[key] = client
+                self._health.setdefault(key, ClientHealth())
+            return client
+
+    def get_http_session(self):
+        """获取共享的 requests.Session（带 keep-alive 连接池）"""
+        with self._lock:
+            if self._http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._http_session = session
+            return self._http_session
+
+    def record_success(self, api_key, base_url=DEEPSEEK_BASE_URL):
+        with self._lock:
+            health = self._health.setdefault((api_key, base_url), ClientHealth())
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.last_success_at = time.time()
+
+    def record_failure(self, api_key, base_url=DEEPSEEK_BASE_URL, error=None):
+        with self._lock:
+            health = self._health.setdefault((api_key, base_url), ClientHealth())
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.last_error = type(error).__name__ if error is not None else None
+            health.last_failure_at = time.time()
+
+    def is_healthy(self, api_key, base_url=DEEPSEEK_BASE_URL):
+        with self._lock:
+            health = self._health.get((api_key, base_url))
+            return health is None or health.healthy
+
+    def health(self):
+        """所有客户端的健康状态（以脱敏标识为键）"""
+        with self._lock:
+            return {_client_id(api_key, base_url): health.to_dict() for (api_key, base_url), health in self._health.items()}
+
+    def set_async_closer(self, closer):
+        """注册关闭异步客户端的方式（需在其所属事件循环中执行）"""
+        self._async_closer = closer
+
+    def shutdown(self):
+        """关闭所有客户端和连接池"""
+        with self._lock:
+            sync_clients = list(self._sync_clients.values())
+            async_clients = list(self._async_clients.values())
+            http_session = self._http_session
+            self._sync_clients.clear()
+            self._async_clients.clear()
+            self._http_session = None
+
+        for client in sync_clients:
+            try:
+                client.close()
+            except Exception as e:
+                print(f"Close LLM client error: {e}")
+        if self._async_closer is not None:
+            for client in async_clients:
+                try:
+                    self._async_closer(client.close())
+                except Exception as e:
+                    print(f"Close async LLM client error: {e}")
+        if http_session is not None:
+            http_session.close()
+
+
+_registry = LLMClientRegistry()
+atexit.register(_registry.shutdown)
+
+
+def get_registry():
+    """获取进程级客户端注册表"""
+    return _registry
@@ -1,99 +1,768 @@
-from openai import OpenAI # type: ignore
+from collections import OrderedDict
+import concurrent.futures
+import copy
+import hashlib
 import json
+import os
 import re
+import sqlite3
+import threading
+import time
+from instrumentation import start_call
+from llm_resilience import RetryPolicy, call_with_retry, get_hedger, HEDGE_ENABLED
+from llm_router import LLMRouter, parse_providers
+from recipe_prompt import PromptBuilder, MAX_OUTPUT_TOKENS, estimate_tokens, get_token_usage
+from semantic_cache import get_default_semantic_index
+from structured_output import IncrementalRecipeParser, StructuredOutputError, parse_recipe
+
+# 缓存默认配置，可通过环境变量覆盖
+DEFAULT_CACHE_TTL = int(os.getenv("RECIPE_CACHE_TTL", 24 * 3600))
+DEFAULT_CACHE_PATH = os.getenv(
+    "RECIPE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "recipe_cache.sqlite3")
+)
+# 食谱生成的采样温度（偏高以获得多样的食谱）
+RECIPE_TEMPERATURE = 0.9
+
+
+def _normalize_option(value):
+    """规范化单个生成选项（去空白、忽略大小写）"""
+    if value is None:
+        return ""
+    return str(value).strip().casefold()
+
+
+def make_cache_key(ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2):
+    """根据生成参数计算内容寻址的缓存键
+
+    食材按逗号/顿号/分号/换行拆分后去重、排序并忽略大小写，
+    因此 "Chicken, broccoli" 与 "broccoli,chicken" 命中同一条缓存。
+    """
+    if isinstance(ingredients, str):
+        items = re.split(r'[,，、;；\n]+', ingredients)
+    else:
+        items = list(ingredients or [])
+    ingredient_set = sorted({_normalize_option(item) for item in items if _normalize_option(item)})
+
+    canonical = [
+        ingredient_set,
+        _normalize_option(diet),
+        _normalize_option(goal),
+        _normalize_option(language),
+        _normalize_option(cuisine),
+        _normalize_option(cooking_time),
+        _normalize_option(difficulty),
+        _normalize_option(servings if servings else 2),
+    ]
+    payload = json.dumps(canonical, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """进程内 LRU 缓存，按条目数和 TTL 淘汰"""
+
+    def __init__(self, max_entries=256, ttl=DEFAULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """磁盘 SQLite 缓存，进程重启后仍然有效"""
+
+    # 每写入多少次执行一次过期/超量清理
+    EVICT_EVERY = 50
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=5000, ttl=DEFAULT_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS recipe_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_recipe_cache_accessed ON recipe_cache (accessed_at)"
+            )
+            self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM recipe_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, expires_at = row
+                if expires_at < now:
+                    self._conn.execute("DELETE FROM recipe_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                self._conn.execute("UPDATE recipe_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                return value
+        except sqlite3.Error as e:
+            print(f"Recipe cache read error: {e}")
+            return None
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO recipe_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now)
+                )
+                self._writes += 1
+                if self._writes % self.EVICT_EVERY == 0:
+                    self._evict(now)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Recipe cache write error: {e}")
+
+    def _evict(self, now):
+        """删除过期条目，并按最近访问时间裁剪到 max_entries"""
+        self._conn.execute("DELETE FROM recipe_cache WHERE expires_at < ?", (now,))
+        self._conn.execute(
+            "DELETE FROM recipe_cache WHERE key IN ("
+            "SELECT key FROM recipe_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def delete(self, key):
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM recipe_cache WHERE key = ?", (key,))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Recipe cache delete error: {e}")
+
+    def clear(self):
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM recipe_cache")
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Recipe cache clear error: {e}")
+
+
+class TieredCache:
+    """内存 + 磁盘两级缓存：先查内存，磁盘命中后回填内存"""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                if self.memory is not None:
+                    self.memory.set(key, value)
+                return value
+        return None
+
+    def set(self, key, value, ttl=None):
+        if self.memory is not None:
+            self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def delete(self, key):
+        for tier in (self.memory, self.disk):
+            if tier is not None:
+                tier.delete(key)
+
+    def clear(self):
+        for tier in (self.memory, self.disk):
+            if tier is not None:
+                tier.clear()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """获取进程共享的默认食谱缓存（内存 LRU + SQLite）"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                disk = SQLiteCache(DEFAULT_CACHE_PATH)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Recipe cache disk tier unavailable: {e}")
+                disk = None
+            _default_cache = TieredCache(MemoryCache(), disk)
+        return _default_cache
+
+
+class SingleFlight:
+    """合并并发的相同请求
+
+    同一个键同一时刻只执行一次，期间到达的相同调用等待并共享该结果，
+    用 stats() 查看节省了多少次调用。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # 每个调用方（包括执行者）都拿到独立副本，避免修改共享结果
+            return copy.deepcopy(future.result())
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+                "saved_ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            }
+
+
+# 进程内所有 LLMInterface 实例共享，跨会话合并相同的生成请求
+_recipe_flight = SingleFlight()
+
+
+def get_coalescing_stats():
+    """获取同步食谱生成的请求合并统计"""
+    return _recipe_flight.stats()
+
+
+class RateLimiter:
+    """令牌桶限流器：平均每秒最多 rate 次请求，允许 burst 次突发"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """预定一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """阻塞直到获得令牌"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+def recipe_events(recipe):
+    """把完整的食谱字典转换为与流式解析相同的事件序列"""
+    for field in IncrementalRecipeParser.STRING_FIELDS:
+        if recipe.get(field):
+            yield (field, recipe[field])
+    for field, event in IncrementalRecipeParser.LIST_FIELDS.items():
+        items = recipe.get(field, [])
+        if isinstance(items, list):
+            for item in items:
+                yield (event, item)
+    yield ('recipe', recipe)
+
+
+# 服务不可用时返回的模板食谱文本
+_TEMPLATE_TEXT = {
+    'zh': {
+        'title': '{ingredients} 家常简易做法',
+        'description': 'AI 服务暂时不可用，这是根据你的食材生成的基础食谱，可稍后重新生成。',
+        'seasonings': '盐、胡椒粉、生抽适量',
+        'instructions': ['清洗并切好所有食材。', '热锅加少许油，先放入较难熟的食材翻炒。', '加入其余食材和调味料，翻炒至熟透。', '根据口味调整咸淡后装盘。'],
+        'difficulty': '简单',
+    },
+    'en': {
+        'title': 'Simple {ingredients}',
+        'description': 'The AI service is temporarily unavailable. This is a basic recipe built from your ingredients; try regenerating later.',
+        'seasonings': 'Salt, pepper and soy sauce to taste',
+        'instructions': ['Wash and chop all ingredients.', 'Heat a little oil and cook the firmest ingredients first.', 'Add the remaining ingredients and seasonings and cook through.', 'Adjust seasoning to taste and serve.'],
+        'difficulty': 'Easy',
+    },
+    'ja': {
+        'title': '{ingredients}のかんたん料理',
+        'description': 'AIサービスが一時的に利用できません。食材から作成した基本レシピです。後でもう一度生成してください。',
+        'seasonings': '塩、こしょう、醤油 各適量',
+        'instructions': ['すべての食材を洗って切ります。', '少量の油を熱し、火の通りにくい食材から炒めます。', '残りの食材と調味料を加えて火を通します。', '味を調えて盛り付けます。'],
+        'difficulty': 'かんたん',
+    },
+}
+
+
+def build_template_recipe(ingredients, language="en", servings=2):
+    """AI 不可用时根据食材构造的模板食谱，带 fallback 标记且不写入缓存"""
+    text = _TEMPLATE_TEXT.get(language, _TEMPLATE_TEXT['en'])
+    if isinstance(ingredients, str):
+        items = [item.strip() for item in re.split(r'[,，、;；\n]+', ingredients) if item.strip()]
+    else:
+        items = [str(item).strip() for item in ingredients or [] if str(item).strip()]
+
+    return {
+        "title": text['title'].format(ingredients=', '.join(items[:3])),
+        "description": text['description'],
+        "ingredients": items + [text['seasonings']],
+        "instructions": list(text['instructions']),
+        "nutrition": {},
+        "serves": servings,
+        "prep_time": "10 min",
+        "cook_time": "15 min",
+        "difficulty": text['difficulty'],
+        "fallback": True,
+    }
+
+
+def _stream_options(stream):
+    """流式调用时请求在最后一个数据块中返回 token 用量"""
+    return {"stream_options": {"include_usage": True}} if stream else {}
+
+
+def _completion_kwargs(provider, messages, stream, max_tokens, timeout, temperature=RECIPE_TEMPERATURE):
+    """chat.completions.create 的参数（同步和异步客户端共用）"""
+    return dict(
+        model=provider.model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=stream,
+        timeout=timeout,
+        **_stream_options(stream)
+    )
+
+
+class _StreamState:
+    """流式响应的累积状态：文本片段、结束原因和 token 用量"""
+
+    def __init__(self):
+        self.usage = None
+        self.finish_reason = None
+        self.content = []
+
+    def feed(self, chunk, call):
+        """处理一个数据块，返回其中的文本增量（可能为 None）"""
+        # 开启 include_usage 后最后一个数据块只包含 usage
+        if getattr(chunk, 'usage', None):
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return None
+        self.finish_reason = chunk.choices[0].finish_reason or self.finish_reason
+        delta = chunk.choices[0].delta.content
+        if delta:
+            call.first_token()
+            self.content.append(delta)
+        return delta
+
+
+def _resolve_hedger(hedge, base_url):
+    """hedge 参数：None 按环境变量，True 使用按服务商共享的对冲器，False 关闭，或直接传入 Hedger"""
+    if hedge is None:
+        hedge = HEDGE_ENABLED
+    if hedge is True:
+        return get_hedger(base_url)
+    return hedge or None
+
 
 class LLMInterface:
-    def __init__(self, api_key):
-        self.client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
-
-    def generate_recipe_and_nutrition(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2):
-        prompt = f"""
-        You are a professional chef and certified nutritionist with expertise in creating delicious, healthy recipes. Create a detailed, creative recipe using these ingredients: {ingredients}. All text content (recipe name, description, ingredients, instructions, etc.) must be in the user's preferred language ({language}), but the JSON field names must be in English.
-
-        Requirements:
-        - Dietary preference: {diet} (if empty, ignore this constraint)
-        - Health goal: {goal} (if empty, focus on general nutrition)
-        - Cuisine: {cuisine if cuisine else 'any'}
-        - Cooking time: {cooking_time if cooking_time else 'any'}
-        - Difficulty: {difficulty if difficulty else 'medium'}
-        - Servings: {servings}
-        - Provide accurate nutritional estimates based on USDA data
-        - Output must be in JSON format with English field names
-
-        Format the response EXACTLY as follows, with field names in English and content in {language}:
-        ```json
-        {{
-            "title": "[Creative, appetizing recipe name in {language}]",
-            "description": "[Brief description in {language} highlighting dietary preferences, health goals, and cuisine]",
-            "ingredients": [
-                "[Ingredient 1 with specific quantity in {language}, e.g., '2 large chicken breasts (6 oz each)']",
-                "[Ingredient 2 with specific quantity in {language}]",
-                "..."
-            ],
-            "instructions": [
-                "[Complete sentence for step 1 in {language} with timing and technique tips]",
-                "[Complete sentence for step 2 in {language} with specific actions]",
-                "..."
-            ],
-            "nutrition": {{
-                "Calories": "[Total per serving] kcal",
-                "Protein": "[Amount] g",
-                "Carbohydrates": "[Amount] g",
-                "Fat": "[Amount] g",
-                "Fiber": "[Amount] g",
-                "Sugar": "[Amount] g",
-                "Sodium": "[Amount] mg",
-                "Vitamin A": "[Amount] IU",
-                "Calcium": "[Amount] mg",
-                "Iron": "[Amount] mg"
-            }},
-            "serves": {servings},
-            "prep_time": "[Minutes] min",
-            "cook_time": "[Minutes] min",
-            "difficulty": "[Easy/Medium/Hard in {language}]"
-        }}
-        ```
-
-        Additional considerations:
-        - Strictly adhere to dietary preferences (e.g., vegan, gluten-free)
-        - Optimize for health goals:
-          * Muscle Gain: High protein, moderate carbs, healthy fats
-          * Weight Loss: Lower calories, high fiber, lean proteins
-          * Energy Boost: Complex carbs, B-vitamins
-          * Heart Health: Low sodium, omega-3s, minimal saturated fat
-        - Use precise measurements and cooking techniques
-        - Ensure all content text is in {language}, but JSON field names remain in English
+    def __init__(self, api_key, cache=None, single_flight=None, retry_policy=None, fallback=True, hedge=None, providers=None,
+                 semantic_cache=None):
+        self.api_key = api_key
+        # providers 为 llm_router.Provider 列表（见 parse_providers），None 时只使用 DeepSeek
+        self.router = LLMRouter(providers or parse_providers(default_api_key=api_key))
+        self.base_url = self.router.primary.base_url
+        # 首选服务商的客户端，供直接调用 chat.completions 的组件使用；
+        # 客户端及其连接池由进程级注册表共享，构造实例不再新建 HTTP 连接
+        self.client = self.router.primary.client
+        # 重试/总时限策略；熔断器按服务商共享，由路由器使用
+        self.retry_policy = retry_policy or RetryPolicy()
+        # 紧凑提示词和自适应 max_tokens；token 用量记录在进程级统计中
+        self.prompt_builder = PromptBuilder()
+        self.token_usage = get_token_usage()
+        # 最终失败时是否返回缓存或模板食谱，而不是抛出异常
+        self.fallback = fallback
+        # 对冲请求：hedge=None 时由环境变量 LLM_HEDGE 决定，也可直接传入 Hedger 实例
+        self.hedger = _resolve_hedger(hedge, self.base_url)
+        # cache=None 使用共享默认缓存，cache=False 禁用缓存
+        if cache is None:
+            cache = get_default_cache()
+        self.cache = cache or None
+        # 语义缓存：食材相近（同义词、中英文别名、单复数）且其余选项相同时复用缓存中的食谱；
+        # semantic_cache=None 使用共享索引，semantic_cache=False 禁用，依赖 cache 存放食谱
+        if semantic_cache is None and self.cache is not None:
+            semantic_cache = get_default_semantic_index()
+        self.semantic_cache = semantic_cache or None
+        # single_flight=None 使用进程共享的请求合并器，single_flight=False 禁用合并
+        if single_flight is None:
+            single_flight = _recipe_flight
+        self.single_flight = single_flight or None
+
+    def _cached_recipe(self, cache_key, ingredients, diet, goal, language, *options):
+        """查找缓存的食谱：先按精确键，未命中时按食材相似度查找语义缓存"""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+        if self.semantic_cache is None:
+            return None
+
+        similar_key, _ = self.semantic_cache.lookup(ingredients, diet, goal, language, *options)
+        if similar_key is None:
+            return None
+        cached = self.cache.get(similar_key)
+        if cached is None:
+            # 食谱已过期或被淘汰
+            self.semantic_cache.discard(similar_key)
+            return None
+        # 回填精确键，下次相同请求直接命中
+        self.cache.set(cache_key, cached)
+        return json.loads(cached)
+
+    def _store_recipe(self, cache_key, recipe, ingredients, diet, goal, language, *options):
+        if self.cache is None:
+            return
+        self.cache.set(cache_key, json.dumps(recipe, ensure_ascii=False))
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(cache_key, ingredients, diet, goal, language, *options)
+
+    def generate_recipe_and_nutrition(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2, regenerate=False):
+        """生成食谱；相同或相近参数优先返回缓存结果，regenerate=True 时强制重新生成"""
+        cache_key = make_cache_key(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        if not regenerate:
+            cached = self._cached_recipe(cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+            if cached is not None:
+                return cached
+
+        args = (cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        try:
+            if self.single_flight is not None:
+                return self.single_flight.do(cache_key, self._generate_and_store, *args)
+            return self._generate_and_store(*args)
+        except Exception as e:
+            if not self.fallback:
+                raise
+            return self._fallback_recipe(cache_key, ingredients, language, servings, e)
+
+    def _fallback_recipe(self, cache_key, ingredients, language, servings, error):
+        """生成失败时的降级结果：优先使用缓存中的食谱，否则返回模板食谱"""
+        print(f"Recipe generation failed, using fallback: {str(error)}")
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+        return build_template_recipe(ingredients, language, servings)
+
+    def generate_batch(self, specs, max_parallel=4, rate_limit=None):
+        """并发批量生成食谱（例如一周的膳食计划）
+
+        specs 为参数字典列表，键与 generate_recipe_and_nutrition 的参数相同。
+        按完成顺序逐个产出 (index, recipe, error)，成功时 error 为 None。
+        max_parallel 限制并发数，rate_limit 为每秒最多发起的请求数（None 表示不限）。
         """
+        limiter = RateLimiter(rate_limit) if rate_limit else None
+
+        def run(spec):
+            if limiter is not None:
+                limiter.acquire()
+            return self.generate_recipe_and_nutrition(**spec)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+            future_to_index = {executor.submit(run, spec): index for index, spec in enumerate(specs)}
+            try:
+                for future in concurrent.futures.as_completed(future_to_index):
+                    index = future_to_index[future]
+                    try:
+                        yield index, future.result(), None
+                    except Exception as e:
+                        print(f"Batch item {index} failed: {str(e)}")
+                        yield index, None, e
+            finally:
+                # 调用方提前停止迭代时，丢弃尚未开始的任务
+                for future in future_to_index:
+                    future.cancel()
+
+    def _generate_and_store(self, cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings):
+        """生成食谱并写入缓存"""
+        recipe = self._generate_recipe(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        self._store_recipe(cache_key, recipe, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        return recipe
+
+    def stream_recipe_and_nutrition(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2, regenerate=False):
+        """流式生成食谱
+
+        逐个产出 (event, value) 事件：title、description、每个 ingredient、每个 instruction
+        在 JSON 中闭合时立即产出，最后产出 ('recipe', 完整食谱字典)。
+        """
+        cache_key = make_cache_key(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        if not regenerate:
+            cached = self._cached_recipe(cache_key, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+            if cached is not None:
+                yield from recipe_events(cached)
+                return
+
+        tokens = self.stream_recipe_tokens(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
         try:
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"""You are a world-class chef and nutritionist creating recipes in {language}. 
-                        Your recipes are delicious, nutritionally optimized, and formatted in JSON with English field names. 
-                        Use precise measurements and provide detailed instructions in {language}. Return the response strictly within ```json\n...\n```."""
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.9,
-                max_tokens=2500,
-                stream=False
-            )
-            raw_content = response.choices[0].message.content
-            # 尝试从 ```json ... ``` 块中提取 JSON 内容
-            json_match = re.search(r'```json\n(.*?)\n```', raw_content, re.DOTALL)
-            if json_match:
-                json_content = json_match.group(1)
-            else:
-                # 如果没有找到 ```json``` 块，假设 raw_content 本身是 JSON
-                json_content = raw_content.strip()
-            
+            first_token = next(tokens, '')
+        except Exception as e:
+            # 尚未产出任何内容时失败，可以无缝切换到降级食谱
+            if not self.fallback:
+                raise
+            yield from recipe_events(self._fallback_recipe(cache_key, ingredients, language, servings, e))
+            return
+
+        parser = IncrementalRecipeParser()
+        chunks = [first_token]
+        yield from parser.feed(first_token)
+        for token in tokens:
+            chunks.append(token)
+            yield from parser.feed(token)
+
+        recipe = self._parse_streamed_recipe(chunks)
+        self._store_recipe(cache_key, recipe, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        yield ('recipe', recipe)
+
+    def stream_recipe_tokens(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2):
+        """以 stream=True 调用路由选中的服务商，逐段产出模型输出的文本"""
+        messages, max_tokens = self._recipe_request(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        call = start_call("llm", "recipe_stream")
+        try:
+            provider, stream = self._create_completion(messages, stream=True, max_tokens=max_tokens, call=call)
+        except Exception as e:
+            raise self._call_failed(call, e)
+
+        state = _StreamState()
+        try:
+            for chunk in stream:
+                delta = state.feed(chunk, call)
+                if delta:
+                    yield delta
+            self._finish_stream(call, provider, language, messages, max_tokens, state)
+        except Exception as e:
+            raise self._stream_failed(call, provider, e)
+        finally:
+            # 调用方提前停止迭代（例如客户端断开）时释放上游连接
+            call.finish(status="cancelled")
+            stream.close()
+
+    def complete(self, messages, temperature=RECIPE_TEMPERATURE, max_tokens=MAX_OUTPUT_TOKENS, call=None):
+        """非流式调用 chat.completions，与食谱生成一样经过路由、重试和对冲，返回响应
+
+        供食谱以外的 AI 功能（菜品分析等）使用，模型由路由选中的服务商决定。
+        """
+        provider, response = self._create_completion(messages, stream=False, max_tokens=max_tokens, call=call, temperature=temperature)
+        if call is not None:
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                call.add_tokens(usage.prompt_tokens, usage.completion_tokens)
+        return response
+
+    def _create_completion(self, messages, stream=False, max_tokens=MAX_OUTPUT_TOKENS, call=None, temperature=RECIPE_TEMPERATURE):
+        """按重试策略调用 chat.completions.create，返回 (provider, response)
+
+        每次尝试由路由器选择服务商，重试和对冲优先换到尚未尝试过的服务商；
+        开启对冲时每次尝试都可能对冲。call 为 instrumentation 的调用记录，用于统计尝试次数。
+        """
+        tried = []
+
+        def attempt(timeout):
+            provider = self.router.select(avoid=tried)
+            tried.append(provider.name)
+            if call is not None:
+                call.attempt(provider.name)
+            started = time.monotonic()
             try:
-                return json.loads(json_content)
-            except json.JSONDecodeError:
-                print(f"Invalid JSON format: {raw_content}")
-                raise Exception("API response is not valid JSON")
+                response = provider.client.chat.completions.create(
+                    **_completion_kwargs(provider, messages, stream, max_tokens, timeout, temperature))
+            except Exception as e:
+                self.router.record_failure(provider, e)
+                raise
+            self.router.record_success(provider, time.monotonic() - started)
+            return provider, response
+
+        if self.hedger is not None:
+            hedger = self.hedger
+            return call_with_retry(lambda timeout: hedger.run(attempt, timeout), self.retry_policy)
+        return call_with_retry(attempt, self.retry_policy)
+
+    def _build_messages(self, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings):
+        """构建食谱生成的对话消息（系统提示词按语言缓存，用户消息只包含本次参数）"""
+        return self.prompt_builder.build_messages(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+
+    def _max_tokens(self, ingredients, language, difficulty, servings):
+        """按食材数、难度和语言估算的 max_tokens，参考同语言最近的实际输出长度"""
+        observed = self.token_usage.completion_percentile(language)
+        return self.prompt_builder.max_tokens(ingredients, language, difficulty, servings, observed=observed)
+
+    def _recipe_request(self, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings):
+        """本次生成的 (对话消息, max_tokens)"""
+        messages = self._build_messages(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        return messages, self._max_tokens(ingredients, language, difficulty, servings)
+
+    def _record_usage(self, provider, language, messages, usage, content, max_tokens, finish_reason):
+        """记录本次调用的 token 数；服务商未返回 usage 时按文本长度估算"""
+        if usage is not None:
+            return self.token_usage.record(provider.name, language, usage.prompt_tokens, usage.completion_tokens, max_tokens, finish_reason)
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        return self.token_usage.record(provider.name, language, prompt_tokens, estimate_tokens(content), max_tokens, finish_reason, estimated=True)
+
+    def _parse_recipe_json(self, raw_content):
+        """从模型输出中解析并校验食谱 JSON（容忍围栏、多余文本和截断）"""
+        try:
+            return parse_recipe(raw_content).to_dict()
+        except StructuredOutputError as e:
+            print(f"Invalid JSON format ({e}): {raw_content}")
+            raise Exception("API response is not valid JSON")
+
+    def _parse_streamed_recipe(self, chunks):
+        """流式输出结束后解析完整食谱"""
+        try:
+            return self._parse_recipe_json(''.join(chunks))
         except Exception as e:
-            print(f"API error: {str(e)}")
             raise Exception(f"API call failed: {str(e)}")
+
+    @staticmethod
+    def _call_failed(call, error):
+        """记录调用失败，返回要抛出的异常"""
+        call.finish(error)
+        print(f"API error: {str(error)}")
+        return Exception(f"API call failed: {str(error)}")
+
+    def _stream_failed(self, call, provider, error):
+        """流式读取中途失败：记录调用失败和服务商的流错误，返回要抛出的异常"""
+        call.finish(error)
+        self.router.record_stream_error(provider, error)
+        print(f"API stream error: {str(error)}")
+        return Exception(f"API call failed: {str(error)}")
+
+    def _finish_stream(self, call, provider, language, messages, max_tokens, state):
+        """流式输出正常结束：记录 token 用量并结束调用记录"""
+        entry = self._record_usage(provider, language, messages, state.usage, ''.join(state.content), max_tokens, state.finish_reason)
+        call.add_tokens(entry["prompt_tokens"], entry["completion_tokens"])
+        call.finish()
+
+    def _completion_recipe(self, call, provider, response, language, messages, max_tokens):
+        """处理非流式响应，返回 (食谱, None)
+
+        估算的 max_tokens 偏小导致输出被截断时返回 (None, MAX_OUTPUT_TOKENS)，由调用方用上限重新生成一次。
+        """
+        choice = response.choices[0]
+        raw_content = choice.message.content or ''
+        entry = self._record_usage(provider, language, messages, getattr(response, 'usage', None), raw_content, max_tokens, choice.finish_reason)
+        call.add_tokens(entry["prompt_tokens"], entry["completion_tokens"])
+        if choice.finish_reason == 'length' and max_tokens < MAX_OUTPUT_TOKENS:
+            print(f"Recipe truncated at max_tokens={max_tokens}, retrying with {MAX_OUTPUT_TOKENS}")
+            return None, MAX_OUTPUT_TOKENS
+        try:
+            return self._parse_recipe_json(raw_content), None
+        except Exception as e:
+            raise self._call_failed(call, e)
+
+    def _generate_recipe(self, ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings):
+        """调用路由选中的服务商生成食谱（不经过缓存）"""
+        messages, max_tokens = self._recipe_request(ingredients, diet, goal, language, cuisine, cooking_time, difficulty, servings)
+        with start_call("llm", "recipe") as call:
+            while True:
+                try:
+                    provider, response = self._create_completion(messages, stream=False, max_tokens=max_tokens, call=call)
+                except Exception as e:
+                    raise self._call_failed(call, e)
+                recipe, retry_max_tokens = self._completion_recipe(call, provider, response, language, messages, max_tokens)
+                if retry_max_tokens is None:
+                    return recipe
+                max_tokens = retry_max_tokens
+
+
+_interfaces = {}
+_interfaces_lock = threading.Lock()
+
+
+def get_llm_interface(api_key, providers=None):
+    """获取按 API key 和服务商配置复用的 LLMInterface 实例，供 Streamlit 页面每次重跑时使用"""
+    key = (api_key, tuple(provider.signature() for provider in providers) if providers else None)
+    with _interfaces_lock:
+        llm = _interfaces.get(key)
+        if llm is None:
+            llm = LLMInterface(api_key, providers=providers)
+            _interfaces[key] = llm
+        return llm
@@ -0,0 +1,472 @@
+import asyncio
+import concurrent.futures
+import inspect
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# 可重试的 HTTP 状态码：超时、冲突、限流和服务端错误
+RETRYABLE_STATUS_CODES = {408, 429}
+# 不依赖 openai / httpx 的具体异常类型，按类名识别超时和连接错误
+RETRYABLE_ERROR_NAMES = {
+    'APITimeoutError', 'APIConnectionError', 'RateLimitError', 'InternalServerError',
+    'Timeout', 'TimeoutError', 'ReadTimeout', 'ConnectTimeout', 'ConnectError', 'ConnectionError',
+}
+
+
+
+def _env_float(name, default):
+    """读取非负的浮点数环境变量；值无法解析时打印警告并使用默认值，而不是在导入时失败"""
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value) or value < 0:
+        print(f"Ignoring invalid {name}={raw!r}, using {default}")
+        return default
+    return value
+
+
+# 对冲请求：LLM_HEDGE=1 默认开启；LLM_HEDGE_DELAY 固定延迟（秒），不设置时使用观测到的 p90
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_DELAY = _env_float("LLM_HEDGE_DELAY", 0.0) or None
+# 对冲请求数占总请求数的上限比例
+HEDGE_BUDGET = _env_float("LLM_HEDGE_BUDGET", 0.1)
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被快速拒绝"""
+
+
+class DeadlineExceeded(Exception):
+    """调用超出了总时限"""
+
+
+def is_retryable(error):
+    """判断异常是否属于值得重试的暂时性故障（429 / 5xx / 超时 / 连接错误）"""
+    status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略
+
+    max_attempts 为最多尝试次数（含首次），deadline 为单次调用（含所有重试）的总时限（秒）。
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, deadline=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，recovery_timeout 秒后放行一次探测请求"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self):
+        """是否允许发起调用；半开状态下同一时刻只放行一个探测请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release(self):
+        """已放行的调用被取消、没有结果时调用，使半开状态可以再次放行探测请求"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """按名称（通常为 base_url）获取进程共享的熔断器"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[name] = breaker
+        return breaker
+
+
+def get_circuit_breaker_stats():
+    with _breakers_lock:
+        return {name: breaker.stats() for name, breaker in _breakers.items()}
+
+
+def call_with_retry(fn, policy, breaker=None):
+    """按策略调用 fn(timeout)，timeout 为本次尝试可用的剩余时间（秒）
+
+    仅对暂时性故障重试；只有暂时性故障计入熔断器。
+    """
+    deadline_at = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("LLM provider circuit is open")
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"LLM call exceeded {policy.deadline}s deadline")
+
+        try:
+            result = fn(remaining)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if breaker is not None:
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            attempt += 1
+            if not retryable or attempt >= policy.max_attempts:
+                raise
+            delay = policy.backoff(attempt - 1)
+            if time.monotonic() + delay >= deadline_at:
+                raise DeadlineExceeded(f"LLM call exceeded {policy.deadline}s deadline") from e
+            print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s ({attempt}/{policy.max_attempts - 1})")
+            time.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+
+async def async_call_with_retry(fn, policy, breaker=None):
+    """call_with_retry 的 asyncio 版本，fn(timeout) 为协程函数"""
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + policy.deadline
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("LLM provider circuit is open")
+        remaining = deadline_at - loop.time()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"LLM call exceeded {policy.deadline}s deadline")
+
+        try:
+            result = await fn(remaining)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if breaker is not None:
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            attempt += 1
+            if not retryable or attempt >= policy.max_attempts:
+                raise
+            delay = policy.backoff(attempt - 1)
+            if loop.time() + delay >= deadline_at:
+                raise DeadlineExceeded(f"LLM call exceeded {policy.deadline}s deadline") from e
+            print(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s ({attempt}/{policy.max_attempts - 1})")
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+
+
+class LatencyTracker:
+    """滑动窗口内成功调用的耗时，用于估算分位数"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+def _close_result(result):
+    """关闭落败请求的返回值（流式响应需要释放连接）"""
+    if isinstance(result, tuple):
+        for item in result:
+            _close_result(item)
+        return
+    close = getattr(result, 'close', None)
+    if close is None:
+        return
+    try:
+        closing = close()
+        if inspect.isawaitable(closing):
+            asyncio.ensure_future(closing)
+    except Exception as e:
+        print(f"Close hedged response error: {e}")
+
+
+def _call(fn, timeout):
+    """timeout 为 None 时调用 fn()，否则调用 fn(timeout)"""
+    return fn() if timeout is None else fn(timeout)
+
+
+def _remaining(timeout, elapsed):
+    """对冲请求可用的剩余时间；timeout 为 None 表示不限"""
+    if timeout is None:
+        return None
+    return max(0.0, timeout - elapsed)
+
+
+class Hedger:
+    """对冲请求：主请求超过 delay 秒仍未完成时再发一个相同请求，采用先成功的结果并取消另一个
+
+    delay=None 时使用最近成功调用耗时的 percentile 分位（样本少于 min_samples 时用 default_delay）。
+    budget 限制对冲请求数不超过总请求数的该比例，避免服务整体变慢时请求量翻倍。
+    """
+
+    def __init__(self, delay=None, percentile=0.9, budget=0.1, default_delay=10.0, min_delay=0.2,
+                 min_samples=20, window=200, max_workers=32):
+        self.delay = delay
+        self.percentile = percentile
+        self.budget = budget
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.latency = LatencyTracker(window)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.losers_cancelled = 0
+
+    def hedge_delay(self):
+        """发起对冲请求前等待的秒数"""
+        if self.delay is not None:
+            return self.delay
+        if len(self.latency) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, self.latency.percentile(self.percentile))
+
+    def _try_start_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                self.budget_denied += 1
+                return False
+            self.hedged += 1
+            return True
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _count_outcome(self, hedge_won):
+        with self._lock:
+            self.losers_cancelled += 1
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    def _timed(self, fn, timeout):
+        started = time.monotonic()
+        result = _call(fn, timeout)
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def _run_primary(self, future, fn, timeout):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._timed(fn, timeout))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def run(self, fn, timeout=None):
+        """执行 fn，必要时对冲；timeout 不为 None 时调用 fn(timeout)，对冲请求得到剩余的时间
+
+        主请求在专用线程中立即开始，不经过线程池排队，对冲延迟从主请求开始时计算；
+        线程池只用于对冲请求。同步 HTTP 调用无法中断，落败请求的结果会被丢弃并关闭；
+        尚未开始的对冲请求会直接取消。
+        """
+        self._count_request()
+        started = time.monotonic()
+        primary = concurrent.futures.Future()
+        threading.Thread(target=self._run_primary, args=(primary, fn, timeout), name="llm-primary", daemon=True).start()
+        done, _ = concurrent.futures.wait([primary], timeout=self.hedge_delay())
+        remaining = _remaining(timeout, time.monotonic() - started)
+        if done or remaining == 0 or not self._try_start_hedge():
+            return primary.result()
+
+        hedge = self._get_executor().submit(self._timed, fn, remaining)
+        winner, error = None, None
+        pending = {primary, hedge}
+        while pending and winner is None:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+                error = error or future.exception()
+        if winner is None:
+            raise error
+
+        loser = hedge if winner is primary else primary
+        if not loser.cancel():
+            loser.add_done_callback(lambda f: f.cancelled() or f.exception() or _close_result(f.result()))
+        self._count_outcome(winner is hedge)
+        return winner.result()
+
+    async def _async_timed(self, fn, timeout):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await _call(fn, timeout)
+        self.latency.record(loop.time() - started)
+        return result
+
+    async def async_run(self, fn, timeout=None):
+        """run 的 asyncio 版本，fn 返回协程；落败的请求会被真正取消"""
+        self._count_request()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        primary = asyncio.ensure_future(self._async_timed(fn, timeout))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            remaining = _remaining(timeout, loop.time() - started)
+            if done or remaining == 0 or not self._try_start_hedge():
+                return await primary
+
+            hedge = asyncio.ensure_future(self._async_timed(fn, remaining))
+            tasks.append(hedge)
+            winner, error = None, None
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = error or task.exception()
+            if winner is None:
+                raise error
+
+            loser = hedge if winner is primary else primary
+            if loser.done() and not loser.cancelled() and loser.exception() is None:
+                _close_result(loser.result())
+            self._count_outcome(winner is hedge)
+            return winner.result()
+        finally:
+            # 调用方被取消或已得到结果时，取消仍在进行的请求
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+                "losers_cancelled": self.losers_cancelled,
+            }
+        stats["delay"] = self.hedge_delay()
+        stats["samples"] = len(self.latency)
+        for q in (0.5, 0.9, 0.99):
+            stats[f"p{int(q * 100)}"] = self.latency.percentile(q)
+        return stats
+
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(name):
+    """按名称（通常为 base_url）获取进程共享的对冲器，延迟和预算取自环境变量"""
+    with _hedgers_lock:
+        hedger = _hedgers.get(name)
+        if hedger is None:
+            hedger = Hedger(delay=HEDGE_DELAY, budget=HEDGE_BUDGET)
+            _hedgers[name] = hedger
+        return hedger
+
+
+def get_hedger_stats():
+    with _hedgers_lock:
+        return {name: hedger.stats() for name, hedger in _hedgers.items()}
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from collections import deque
+from llm_client_pool import get_registry, DEEPSEEK_BASE_URL
+from llm_resilience import CircuitOpenError, LatencyTracker, get_circuit_breaker, is_retryable
+
+DEFAULT_MODEL = "deepseek-chat"
+# 本地 stub 等不校验密钥的服务商仍需要一个非空的 api_key
+PLACEHOLDER_API_KEY = "not-needed"
+
+# 样本少于该数的服务商优先被选中，以便尽快获得延迟数据
+ROUTER_MIN_SAMPLES = 5
+# 错误率超过该值的服务商视为不健康（所有服务商都不健康时仍会被使用）
+ROUTER_MAX_ERROR_RATE = 0.5
+# 错误率对延迟评分的惩罚系数：评分 = p50 延迟 × (1 + 系数 × 错误率)
+ROUTER_ERROR_PENALTY = 4.0
+
+
+def _is_client_error(error):
+    """不可重试的 4xx 响应"""
+    status = getattr(error, 'status_code', None)
+    return isinstance(status, int) and 400 <= status < 500 and not is_retryable(error)
+
+
+class Provider:
+    """一个 OpenAI 兼容的 LLM 服务商（DeepSeek、其他云服务或本地 stub 服务器）"""
+
+    def __init__(self, name, base_url, api_key=None, model=DEFAULT_MODEL):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key or PLACEHOLDER_API_KEY
+        self.model = model
+        # 熔断器按服务商名称共享
+        self.breaker = get_circuit_breaker(name)
+
+    @property
+    def client(self):
+        return get_registry().get_client(self.api_key, self.base_url)
+
+    @property
+    def async_client(self):
+        return get_registry().get_async_client(self.api_key, self.base_url)
+
+    def signature(self):
+        """不含密钥的配置标识，用于复用相同配置的实例"""
+        return (self.name, self.base_url, self.model)
+
+
+class ProviderStats:
+    """单个服务商最近 window 次调用的延迟和成败"""
+
+    def __init__(self, window=100):
+        self.latency = LatencyTracker(window)
+        self._outcomes = deque(maxlen=window)
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def record(self, ok):
+        self._outcomes.append(ok)
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+
+
+class LLMRouter:
+    """在多个服务商之间按滚动延迟和错误率选择
+
+    样本不足的服务商优先（探测）；其余按 p50 延迟和错误率评分，熔断器打开或
+    错误率过高的服务商排在最后。avoid 中的服务商（本次调用已尝试过或正在对冲）
+    只在没有其他可用服务商时才会被选中。
+    """
+
+    def __init__(self, providers, window=100):
+        if not providers:
+            raise ValueError("LLMRouter requires at least one provider")
+        self.providers = list(providers)
+        self._stats = {provider.name: ProviderStats(window) for provider in self.providers}
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.providers[0]
+
+    def _healthy(self, provider):
+        stats = self._stats[provider.name]
+        return (provider.breaker.state != provider.breaker.OPEN
+                and stats.error_rate <= ROUTER_MAX_ERROR_RATE
+                and get_registry().is_healthy(provider.api_key, provider.base_url))
+
+    def _score(self, provider):
+        stats = self._stats[provider.name]
+        samples = len(stats.latency)
+        if samples < ROUTER_MIN_SAMPLES:
+            return (0, samples + stats.in_flight)
+        p50 = stats.latency.percentile(0.5)
+        return (1, p50 * (1 + ROUTER_ERROR_PENALTY * stats.error_rate))
+
+    def select(self, avoid=()):
+        """选择本次调用使用的服务商，所有熔断器都拒绝时抛出 CircuitOpenError"""
+        ranked = sorted(
+            self.providers,
+            key=lambda provider: (provider.name in avoid, not self._healthy(provider), self._score(provider))
+        )
+        for provider in ranked:
+            if provider.breaker.allow():
+                with self._lock:
+                    self._stats[provider.name].in_flight += 1
+                return provider
+        raise CircuitOpenError("All LLM providers are unavailable")
+
+    def record_success(self, provider, latency):
+        """select 之后的调用成功（流式调用以收到响应头为准）"""
+        stats = self._stats[provider.name]
+        with self._lock:
+            stats.in_flight -= 1
+            stats.record(True)
+        stats.latency.record(latency)
+        provider.breaker.record_success()
+        get_registry().record_success(provider.api_key, provider.base_url)
+
+    def record_failure(self, provider, error):
+        """select 之后的调用失败；只有暂时性故障计入熔断器
+
+        不可重试的 4xx（400/401/404 等）说明服务商正常响应、是请求本身有误，
+        不计入错误率和客户端健康状态。
+        """
+        if _is_client_error(error):
+            with self._lock:
+                self._stats[provider.name].in_flight -= 1
+            provider.breaker.record_success()
+            return
+        with self._lock:
+            stats = self._stats[provider.name]
+            stats.in_flight -= 1
+            stats.record(False)
+        if is_retryable(error):
+            provider.breaker.record_failure()
+        else:
+            provider.breaker.record_success()
+        get_registry().record_failure(provider.api_key, provider.base_url, error)
+
+    def release(self, provider):
+        """select 之后的调用被取消，不计入成败"""
+        with self._lock:
+            self._stats[provider.name].in_flight -= 1
+        provider.breaker.release()
+
+    def record_stream_error(self, provider, error):
+        """流式响应在传输过程中出错"""
+        with self._lock:
+            self._stats[provider.name].record(False)
+        get_registry().record_failure(provider.api_key, provider.base_url, error)
+
+    def stats(self):
+        result = {}
+        for provider in self.providers:
+            stats = self._stats[provider.name]
+            result[provider.name] = {
+                "base_url": provider.base_url,
+                "model": provider.model,
+                "healthy": self._healthy(provider),
+                "breaker": provider.breaker.state,
+                "in_flight": stats.in_flight,
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "error_rate": round(stats.error_rate, 4),
+                "samples": len(stats.latency),
+                "p50": stats.latency.percentile(0.5),
+                "p90": stats.latency.percentile(0.9),
+            }
+        return result
+
+
+def parse_providers(raw=None, default_api_key=None, get_config=os.environ.get):
+    """解析 LLM_PROVIDERS 配置，未配置时只使用 DeepSeek
+
+    raw 为 JSON 字符串或字典列表，每项包含 name、base_url，可选 model、api_key，
+    或 api_key_env（通过 get_config 读取的配置键名）。例如：
+    [{"name": "deepseek", "base_url": "https://api.deepseek.com", "api_key_env": "DEEPSEEK_API_KEY"},
+     {"name": "local", "base_url": "http://127.0.0.1:8001/v1", "model": "stub"}]
+    """
+    if not raw:
+        return [Provider("deepseek", DEEPSEEK_BASE_URL, default_api_key)]
+
+    entries = json.loads(raw) if isinstance(raw, str) else raw
+    providers = []
+    for entry in entries:
+        api_key = entry.get("api_key")
+        if not api_key and entry.get("api_key_env"):
+            api_key = get_config(entry["api_key_env"])
+        if not api_key and entry["base_url"] == DEEPSEEK_BASE_URL:
+            api_key = default_api_key
+        providers.append(Provider(entry["name"], entry["base_url"], api_key, entry.get("model", DEFAULT_MODEL)))
+    if not providers:
+        raise ValueError("LLM_PROVIDERS must contain at least one provider")
+    return providers
@@ -0,0 +1,174 @@
+from collections import OrderedDict, deque
+import concurrent.futures
+import os
+import random
+import threading
+import time
+
+# 每个 (语言, 饮食, 目标) 组合保留的预生成食谱数，低于水位线时后台补充
+LUCKY_POOL_SIZE = int(os.getenv("LUCKY_POOL_SIZE", 3))
+LUCKY_POOL_LOW_WATERMARK = int(os.getenv("LUCKY_POOL_LOW_WATERMARK", 2))
+LUCKY_POOL_WORKERS = int(os.getenv("LUCKY_POOL_WORKERS", 2))
+# 最多维护的组合数，超出时淘汰最久未使用的组合
+LUCKY_POOL_MAX_KEYS = int(os.getenv("LUCKY_POOL_MAX_KEYS", 32))
+# 同一组合两次检查水位之间的最短间隔（秒）；页面每次重绘都会调用 ensure
+LUCKY_POOL_ENSURE_INTERVAL = float(os.getenv("LUCKY_POOL_ENSURE_INTERVAL", 10))
+
+# (适用的饮食, 各语言的食材)；"any" 表示任何饮食都可使用
+LUCKY_INGREDIENT_SETS = [
+    ({"any", "high-protein", "low-carb", "keto", "gluten-free"},
+     {"zh": "鸡胸肉, 西兰花, 胡萝卜", "en": "chicken breast, broccoli, carrot", "ja": "鶏むね肉, ブロッコリー, にんじん"}),
+    ({"any", "vegetarian", "vegan", "gluten-free", "high-protein"},
+     {"zh": "豆腐, 香菇, 青菜", "en": "tofu, shiitake, bok choy", "ja": "豆腐, しいたけ, チンゲン菜"}),
+    ({"any", "high-protein", "low-carb", "keto", "mediterranean", "gluten-free"},
+     {"zh": "三文鱼, 芦笋, 柠檬", "en": "salmon, asparagus, lemon", "ja": "サーモン, アスパラガス, レモン"}),
+    ({"any", "high-protein", "gluten-free"},
+     {"zh": "牛肉, 土豆, 洋葱", "en": "beef, potato, onion", "ja": "牛肉, じゃがいも, 玉ねぎ"}),
+    ({"any", "high-protein", "low-carb", "keto", "gluten-free"},
+     {"zh": "虾, 黄瓜, 番茄", "en": "shrimp, cucumber, tomato", "ja": "えび, きゅうり, トマト"}),
+    ({"any", "vegetarian", "high-protein", "gluten-free", "low-carb", "keto"},
+     {"zh": "鸡蛋, 菠菜, 奶酪", "en": "egg, spinach, cheese", "ja": "卵, ほうれん草, チーズ"}),
+    ({"any", "vegetarian", "vegan", "mediterranean", "gluten-free"},
+     {"zh": "鹰嘴豆, 番茄, 黄瓜, 橄榄油", "en": "chickpea, tomato, cucumber, olive oil", "ja": "ひよこ豆, トマト, きゅうり, オリーブオイル"}),
+    ({"any", "vegetarian", "vegan", "gluten-free"},
+     {"zh": "红薯, 黑豆, 牛油果", "en": "sweet potato, black bean, avocado", "ja": "さつまいも, 黒豆, アボカド"}),
+    ({"any", "vegetarian", "vegan", "low-carb", "keto", "gluten-free"},
+     {"zh": "西葫芦, 蘑菇, 大蒜", "en": "zucchini, mushroom, garlic", "ja": "ズッキーニ, きのこ, にんにく"}),
+    ({"any", "vegetarian", "mediterranean"},
+     {"zh": "意面, 番茄, 罗勒, 奶酪", "en": "pasta, tomato, basil, cheese", "ja": "パスタ, トマト, バジル, チーズ"}),
+    ({"any", "vegetarian", "vegan", "gluten-free"},
+     {"zh": "燕麦, 香蕉, 蓝莓", "en": "oat, banana, blueberry", "ja": "オートミール, バナナ, ブルーベリー"}),
+    ({"any", "high-protein", "mediterranean", "gluten-free"},
+     {"zh": "鳕鱼, 彩椒, 橄榄", "en": "cod, bell pepper, olive", "ja": "たら, パプリカ, オリーブ"}),
+]
+
+
+def lucky_ingredient_choices(language, diet=""):
+    """适合该饮食的随机食材组合（按语言）"""
+    diet = diet or "any"
+    choices = [names.get(language, names["en"]) for diets, names in LUCKY_INGREDIENT_SETS if diet in diets]
+    return choices or [names.get(language, names["en"]) for _, names in LUCKY_INGREDIENT_SETS]
+
+
+class LuckyPool:
+    """“手气不错”的预生成食谱池
+
+    按 (语言, 饮食, 目标) 分组保存已生成的食谱；take 取出一个后，若剩余数量
+    低于水位线，就在后台线程池中补充到 size 个。组合在首次 ensure/take 时才开始预热。
+    补充时绕过食谱缓存（regenerate=True），避免池中放入同一份缓存食谱的多个副本。
+    """
+
+    def __init__(self, llm, size=LUCKY_POOL_SIZE, low_watermark=LUCKY_POOL_LOW_WATERMARK,
+                 max_workers=LUCKY_POOL_WORKERS, max_keys=LUCKY_POOL_MAX_KEYS,
+                 ensure_interval=LUCKY_POOL_ENSURE_INTERVAL):
+        self.llm = llm
+        self.size = size
+        self.low_watermark = max(1, low_watermark)
+        self.max_keys = max_keys
+        self.ensure_interval = ensure_interval
+        self._pools = OrderedDict()     # key -> deque((ingredients, recipe))
+        self._pending = {}              # key -> 正在生成的数量
+        self._checked = {}              # key -> 上次检查水位的时间（monotonic）
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                                               thread_name_prefix="lucky-pool")
+        self.served = 0
+        self.misses = 0
+        self.failures = 0
+
+    def take(self, language, diet="", goal=""):
+        """取出一个预生成的 (食材, 食谱)；池为空时返回 None，并触发补充"""
+        key = (language, diet or "", goal or "")
+        with self._lock:
+            pool = self._touch(key)
+            item = pool.popleft() if pool else None
+            if item is None:
+                self.misses += 1
+            else:
+                self.served += 1
+        self.ensure(language, diet, goal, force=True)
+        return item
+
+    def ensure(self, language, diet="", goal="", force=False):
+        """池中（含生成中的）食谱数低于水位线时，后台补充到 size 个
+
+        同一组合在 ensure_interval 秒内只检查一次（force=True 时不受限制），
+        避免每次页面重绘都在补充失败后重新提交生成任务。
+        """
+        key = (language, diet or "", goal or "")
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._checked.get(key, float('-inf')) < self.ensure_interval:
+                return
+            self._checked[key] = now
+            pool = self._touch(key)
+            available = len(pool) + self._pending.get(key, 0)
+            if available >= self.low_watermark:
+                return
+            missing = self.size - available
+            if missing <= 0:
+                return
+            self._pending[key] = self._pending.get(key, 0) + missing
+            # 尽量让同一组合的食谱使用不同的食材
+            in_use = {ingredients for ingredients, _ in pool}
+            choices = [choice for choice in lucky_ingredient_choices(language, diet) if choice not in in_use]
+            random.shuffle(choices)
+
+        for index in range(missing):
+            ingredients = choices[index] if index < len(choices) else random.choice(lucky_ingredient_choices(language, diet))
+            self._executor.submit(self._fill, key, ingredients)
+
+    def _touch(self, key):
+        """获取组合对应的队列并标记为最近使用（调用方持有锁）"""
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = deque()
+            while len(self._pools) > self.max_keys:
+                evicted, _ = self._pools.popitem(last=False)
+                self._pending.pop(evicted, None)
+                self._checked.pop(evicted, None)
+        else:
+            self._pools.move_to_end(key)
+        return pool
+
+    def _fill(self, key, ingredients):
+        language, diet, goal = key
+        recipe = None
+        try:
+            recipe = self.llm.generate_recipe_and_nutrition(ingredients, diet, goal, language=language, regenerate=True)
+        except Exception as e:
+            print(f"Lucky pool generation failed: {str(e)}")
+
+        with self._lock:
+            if key in self._pending:
+                self._pending[key] = max(0, self._pending[key] - 1)
+            # 降级的模板食谱不放入池中，用户点击时再正常生成
+            if not recipe or recipe.get('fallback'):
+                self.failures += 1
+                return
+            pool = self._pools.get(key)
+            if pool is not None and len(pool) < self.size:
+                pool.append((ingredients, recipe))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "served": self.served,
+                "misses": self.misses,
+                "failures": self.failures,
+                "pools": {"|".join(key): len(pool) for key, pool in self._pools.items()},
+                "pending": sum(self._pending.values()),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_lucky_pool(llm):
+    """获取与 LLM 实例绑定的进程级预生成池（get_llm_interface 返回的实例是复用的）"""
+    with _pools_lock:
+        pool = _pools.get(id(llm))
+        if pool is None or pool.llm is not llm:
+            pool = _pools[id(llm)] = LuckyPool(llm)
+        return pool
@@ -0,0 +1,167 @@
+"""数据库维护命令
+
+    python manage_db.py migrate [--force]    执行尚未执行的一次性迁移（索引和数据回填）
+    python manage_db.py pool-stats           输出连接池统计
+    python manage_db.py repair-stats [--user NAME]
+                                             从食谱重算 user_stats 和按月计数
+    python manage_db.py compact-schema [--batch-size N] [--max-batches N] [--dry-run] [--restart]
+                                             把旧格式食谱分批转换为紧凑格式，中断后再次执行会继续
+    python manage_db.py export --user NAME [--output FILE] [--gzip]
+                                             流式导出用户的食谱（JSONL），默认输出到标准输出
+    python manage_db.py import --user NAME FILE [--batch-size N]
+                                             从 JSONL / JSONL.gz 批量导入食谱（FILE 为 - 时读取标准输入）
+    python manage_db.py delete-recipes --user NAME (--all | --ids ID [ID ...] | --before YYYY-MM-DD) [--soft]
+                                             分批删除用户的食谱并同步统计，--soft 时移入回收站
+    python manage_db.py restore-recipes --user NAME [--ids ID [ID ...]]
+                                             从回收站恢复食谱
+
+连接串读取环境变量 MONGODB_URI。
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from mongodb_manager import (BACKFILLS, DATABASE_NAME, DELETE_BATCH_SIZE, MIGRATION_BATCH_SIZE, MIGRATIONS, MongoDBManager,
+                             get_mongo_client, get_pool_stats, migrate_recipe_schema, rebuild_recipe_counts,
+                             rebuild_user_stats, run_migrations)
+from recipe_transfer import IMPORT_BATCH_SIZE, export_recipes, import_recipes
+
+
+def cmd_migrate(args):
+    db = get_mongo_client(args.uri)[DATABASE_NAME]
+    executed = run_migrations(db, force=args.force, backfill=True)
+    if executed:
+        print(f"Applied migrations: {', '.join(executed)}")
+    else:
+        print(f"Nothing to migrate ({len(MIGRATIONS) + len(BACKFILLS)} migrations already applied)")
+
+
+def cmd_pool_stats(args):
+    get_mongo_client(args.uri).admin.command("ping")
+    print(json.dumps(get_pool_stats(), indent=2))
+
+
+def cmd_repair_stats(args):
+    db = get_mongo_client(args.uri)[DATABASE_NAME]
+    users = rebuild_user_stats(db, args.user)
+    counters = rebuild_recipe_counts(db, args.user)
+    print(f"Rebuilt user_stats for {users} user(s) and {counters} monthly counter(s)")
+
+
+def cmd_compact_schema(args):
+    db = get_mongo_client(args.uri)[DATABASE_NAME]
+    result = migrate_recipe_schema(db, batch_size=args.batch_size, max_batches=args.max_batches,
+                                   dry_run=args.dry_run, restart=args.restart)
+    before, after = result["bytes_before"], result["bytes_after"]
+    saved = f", {before - after} bytes saved ({(before - after) / before:.0%})" if before else ""
+    action = "Would convert" if args.dry_run else "Converted"
+    print(f"{action} {result['converted']} recipe(s){saved}")
+    if not result["done"]:
+        print("Stopped before the end; run again to continue")
+
+
+def cmd_export(args):
+    db = get_mongo_client(args.uri)[DATABASE_NAME]
+    compress = args.gzip or (args.output or "").endswith(".gz")
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_recipes(db, args.user, compress=compress):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+def cmd_import(args):
+    db = get_mongo_client(args.uri)[DATABASE_NAME]
+    # 去重依赖已有食谱的 content_hash
+    run_migrations(db, backfill=True)
+    source = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+    try:
+        result = import_recipes(db, args.user, source, batch_size=args.batch_size)
+    finally:
+        if args.file != "-":
+            source.close()
+    print(f"Read {result['read']}, inserted {result['inserted']}, "
+          f"skipped {result['duplicates']} duplicate(s), {result['errors']} error(s)")
+
+
+def cmd_delete_recipes(args):
+    manager = MongoDBManager(args.uri)
+    if args.all:
+        deleted = manager.clear_recipes(args.user, soft=args.soft, batch_size=args.batch_size)
+    elif args.ids:
+        deleted = manager.delete_recipes(args.user, args.ids, soft=args.soft, batch_size=args.batch_size)
+    else:
+        before = datetime.strptime(args.before, "%Y-%m-%d")
+        deleted = manager.delete_recipes_matching(args.user, {"created": {"$lt": before}}, soft=args.soft,
+                                                  batch_size=args.batch_size)
+    print(f"{'Moved' if args.soft else 'Deleted'} {deleted} recipe(s){' to the trash' if args.soft else ''}")
+
+
+def cmd_restore_recipes(args):
+    restored = MongoDBManager(args.uri).restore_recipes(args.user, args.ids)
+    print(f"Restored {restored} recipe(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI"), help="MongoDB 连接串，默认读取 MONGODB_URI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="执行一次性迁移")
+    migrate.add_argument("--force", action="store_true", help="重新执行所有迁移（迁移均为幂等操作）")
+    migrate.set_defaults(func=cmd_migrate)
+
+    pool_stats = subparsers.add_parser("pool-stats", help="输出连接池统计")
+    pool_stats.set_defaults(func=cmd_pool_stats)
+
+    repair_stats = subparsers.add_parser("repair-stats", help="从食谱重算 user_stats 和按月计数")
+    repair_stats.add_argument("--user", help="只重算该用户，默认重算所有用户")
+    repair_stats.set_defaults(func=cmd_repair_stats)
+
+    compact_schema = subparsers.add_parser("compact-schema", help="把旧格式食谱分批转换为紧凑格式")
+    compact_schema.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    compact_schema.add_argument("--max-batches", type=int, help="最多处理的批数，默认处理全部")
+    compact_schema.add_argument("--dry-run", action="store_true", help="只统计可转换的食谱和节省的空间")
+    compact_schema.add_argument("--restart", action="store_true", help="忽略已保存的进度，从头开始")
+    compact_schema.set_defaults(func=cmd_compact_schema)
+
+    export = subparsers.add_parser("export", help="流式导出用户的食谱")
+    export.add_argument("--user", required=True)
+    export.add_argument("--output", help="输出文件，以 .gz 结尾时自动压缩；默认输出到标准输出")
+    export.add_argument("--gzip", action="store_true", help="输出 gzip 压缩的 JSONL")
+    export.set_defaults(func=cmd_export)
+
+    import_parser = subparsers.add_parser("import", help="从 JSONL 批量导入食谱")
+    import_parser.add_argument("--user", required=True)
+    import_parser.add_argument("file", help="JSONL 或 JSONL.gz 文件，- 表示标准输入")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_parser.set_defaults(func=cmd_import)
+
+    delete_recipes = subparsers.add_parser("delete-recipes", help="分批删除用户的食谱")
+    delete_recipes.add_argument("--user", required=True)
+    target = delete_recipes.add_mutually_exclusive_group(required=True)
+    target.add_argument("--all", action="store_true", help="删除该用户的全部食谱")
+    target.add_argument("--ids", nargs="+", help="要删除的食谱 id")
+    target.add_argument("--before", help="删除该日期（UTC）之前创建的食谱")
+    delete_recipes.add_argument("--soft", action="store_true", help="移入回收站，保留期内可以恢复")
+    delete_recipes.add_argument("--batch-size", type=int, default=DELETE_BATCH_SIZE)
+    delete_recipes.set_defaults(func=cmd_delete_recipes)
+
+    restore_recipes = subparsers.add_parser("restore-recipes", help="从回收站恢复食谱")
+    restore_recipes.add_argument("--user", required=True)
+    restore_recipes.add_argument("--ids", nargs="+", help="要恢复的食谱 id，默认恢复全部")
+    restore_recipes.set_defaults(func=cmd_restore_recipes)
+
+    args = parser.parse_args()
+    if not args.uri:
+        print("MONGODB_URI is not set")
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,618 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo import monitoring
+from bson import json_util
+from datetime import datetime, timedelta
+import base64
 import hashlib
+import os
+import threading
+
+from recipe_schema import (LEGACY_FIELDS, SCHEMA_VERSION, compact_recipe, content_hash, decode_diet, decode_goal,
+                           diet_condition, recipe_from_document)
+from recipe_search import SEARCH_FIELDS, build_search_fields, search_pipeline
+
+DATABASE_NAME = "recipe_db"
+
+# 连接池配置，可通过环境变量覆盖；所有会话共享同一个 MongoClient
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 2))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60_000))
+# 连接池耗尽时等待空闲连接的最长时间
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5_000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10_000))
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """通过 CMAP 事件统计连接池状态：当前连接数、在用连接数、借出次数和等待超时次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "created": self.created,
+                "closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pools_cleared": self.pools_cleared,
+            }
+
+
+_pool_metrics = PoolMetrics()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_mongo_client(connection_string):
+    """获取进程共享的 MongoClient（每个连接串一个连接池和一组监控线程）"""
+    with _clients_lock:
+        client = _clients.get(connection_string)
+        if client is None:
+            client = MongoClient(
+                connection_string,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                appname="smart-recipe",
+                event_listeners=[_pool_metrics],
+            )
+            _clients[connection_string] = client
+        return client
+
+
+def get_pool_stats():
+    """连接池统计（所有共享客户端合计）"""
+    return {**_pool_metrics.stats(), "clients": len(_clients)}
+
+
+def _migration_indexes_v1(db):
+    db['users'].create_index("username", unique=True)
+    db['recipes'].create_index([("username", 1), ("created", -1)])
+
+
+def _migration_keyset_indexes(db):
+    # 与 SUMMARY_SORTS 的排序键一致，分页查询无需内存排序
+    db['recipes'].create_index([("username", 1), ("created", -1), ("_id", -1)])
+    db['recipes'].create_index([("username", 1), ("rating", -1), ("created", -1), ("_id", -1)])
+
+
+MIGRATION_BATCH_SIZE = 1000
+
+
+def build_recipe_document(username, recipe_data, created=None):
+    """按当前存储格式构造要插入的食谱文档（含搜索词元和内容哈希）"""
+    recipe_doc = {
+        "username": username,
+        **compact_recipe(recipe_data),
+        "created": created or datetime.utcnow(),
+    }
+    recipe_doc.update(build_search_fields(recipe_doc))
+    recipe_doc["content_hash"] = content_hash(recipe_doc)
+    return recipe_doc
+
+
+def _migration_search_tokens(db):
+    """为已有食谱分批回填搜索词元"""
+    recipes = db['recipes']
+    fields = {"title": 1, "ingredients": 1, "tags": 1, "notes": 1}
+    batch = []
+    for doc in recipes.find({"search_tokens": {"$exists": False}}, fields):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": build_search_fields(doc)}))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            recipes.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        recipes.bulk_write(batch, ordered=False)
+
+
+def month_key(moment):
+    """按月计数使用的月份键（UTC，YYYY-MM）"""
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+def recent_months(until, count):
+    """截至 until 所在月份的最近 count 个月份键，按时间升序"""
+    months = []
+    year, month = until.year, until.month
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    months.reverse()
+    return months
+
+
+def rebuild_recipe_counts(db, username=None):
+    """从食谱重新计算按月计数（username 为 None 时重算所有用户），返回写入的计数文档数"""
+    counts = db['recipe_counts']
+    match = {"created": {"$type": "date"}}
+    if username is not None:
+        match["username"] = username
+        counts.delete_many({"username": username})
+    else:
+        counts.delete_many({})
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"username": "$username", "month": {"$dateToString": {"format": "%Y-%m", "date": "$created"}}},
+            "count": {"$sum": 1},
+        }},
+    ]
+    batch = []
+    written = 0
+    for row in db['recipes'].aggregate(pipeline, allowDiskUse=True):
+        user, month = row["_id"]["username"], row["_id"]["month"]
+        batch.append(UpdateOne({"_id": f"{user}|{month}"},
+                               {"$set": {"username": user, "month": month, "count": row["count"]}}, upsert=True))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            counts.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        counts.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+# user_stats 中的直方图字段 -> 食谱字段；空的菜系和标签不计入
+USER_STATS_HISTOGRAMS = {"diets": "diet", "goals": "goal", "cuisines": "cuisine", "tags": "tags"}
+_SKIP_EMPTY_HISTOGRAMS = {"cuisines", "tags"}
+# 饮食和目标以编码存储，直方图中使用解码后的值
+_HISTOGRAM_DECODERS = {"diets": decode_diet, "goals": decode_goal}
+
+
+def _stats_key(value):
+    # 直方图的键是用户数据（标签可能含 "." 或以 "$" 开头，无偏好为空字符串），加前缀并替换点号后才能作为字段名
+    return "_" + str(value).replace(".", "\uff0e")
+
+
+def _stats_value(key):
+    return key[1:].replace("\uff0e", ".")
+
+
+def recipe_stats_increments(recipe, sign=1):
+    """一条食谱对 user_stats 的 $inc 增量；sign 为 -1 时用于删除"""
+    inc = {"total_recipes": sign}
+    rating = recipe.get("rating")
+    if isinstance(rating, (int, float)) and not isinstance(rating, bool):
+        inc["rating_sum"] = sign * rating
+        inc["rating_count"] = sign
+    for histogram, field in USER_STATS_HISTOGRAMS.items():
+        values = recipe.get(field)
+        values = values if isinstance(values, list) else [values or ""]
+        decode = _HISTOGRAM_DECODERS.get(histogram)
+        for value in (decode(value) for value in values) if decode else values:
+            if histogram in _SKIP_EMPTY_HISTOGRAMS and not value:
+                continue
+            path = f"{histogram}.{_stats_key(value)}"
+            inc[path] = inc.get(path, 0) + sign
+    return inc
+
+
+def compute_user_stats(db, username):
+    """用一次 $facet 聚合从食谱完整计算某个用户的 user_stats 文档（不写入）"""
+    def histogram(field, skip_empty):
+        stages = [{"$group": {"_id": {"$ifNull": [f"${field}", ""]}, "count": {"$sum": 1}}}]
+        if skip_empty:
+            stages.insert(0, {"$match": {field: {"$nin": ["", None]}}})
+        return stages
+
+    facets = {
+        "summary": [{"$group": {"_id": None, "total_recipes": {"$sum": 1}}}],
+        "ratings": [
+            {"$match": {"rating": {"$type": "number"}}},
+            {"$group": {"_id": None, "rating_sum": {"$sum": "$rating"}, "rating_count": {"$sum": 1}}},
+        ],
+    }
+    for name, field in USER_STATS_HISTOGRAMS.items():
+        stages = histogram(field, name in _SKIP_EMPTY_HISTOGRAMS)
+        facets[name] = [{"$unwind": f"${field}"}] + stages if field == "tags" else stages
+
+    pipeline = [
+        {"$match": {"username": username}},
+        {"$project": {"rating": 1, "diet": 1, "goal": 1, "cuisine": 1, "tags": 1}},
+        {"$facet": facets},
+    ]
+    result = next(iter(db['recipes'].aggregate(pipeline)), None) or {}
+    summary = (result.get("summary") or [{}])[0]
+    ratings = (result.get("ratings") or [{}])[0]
+    doc = {
+        "_id": username,
+        "total_recipes": summary.get("total_recipes", 0),
+        "rating_sum": ratings.get("rating_sum", 0),
+        "rating_count": ratings.get("rating_count", 0),
+        "updated": datetime.utcnow(),
+    }
+    for name in USER_STATS_HISTOGRAMS:
+        decode = _HISTOGRAM_DECODERS.get(name, lambda value: value)
+        histogram = doc[name] = {}
+        for row in result.get(name, []):
+            # 迁移期间同一饮食可能同时以编码和字符串存储
+            key = _stats_key(decode(row["_id"]))
+            histogram[key] = histogram.get(key, 0) + row["count"]
+    return doc
+
+
+def rebuild_user_stats(db, username=None):
+    """从食谱重新计算 user_stats（username 为 None 时重算所有用户），返回重算的用户数
+
+    用于修复增量更新可能产生的偏差；重算期间并发写入的增量可能被覆盖，应在低峰期执行。
+    """
+    stats = db['user_stats']
+    usernames = [username] if username is not None else db['recipes'].distinct("username")
+    for user in usernames:
+        # 没有食谱的用户也写入（计数为 0），之后的读取仍是一次点查询
+        stats.replace_one({"_id": user}, compute_user_stats(db, user), upsert=True)
+    if username is None:
+        stats.delete_many({"_id": {"$nin": usernames}})
+    return len(usernames)
+
+
+SCHEMA_MIGRATION_ID = f"recipe_schema_v{SCHEMA_VERSION}"
+
+
+def migrate_recipe_schema(db, batch_size=MIGRATION_BATCH_SIZE, max_batches=None, dry_run=False, restart=False):
+    """把旧格式食谱分批转换为当前存储格式，可中断后继续
+
+    按 _id 顺序处理，每批写入后把进度（最后处理的 _id）保存在 migrations 集合中，
+    再次执行时从该位置继续；restart=True 时从头开始。dry_run 只统计不写入。
+    返回 {"converted", "bytes_before", "bytes_after", "done"}。
+    """
+    from bson import encode as bson_encode
+
+    recipes = db['recipes']
+    progress = db['migrations']
+    checkpoint = None if restart else progress.find_one({"_id": SCHEMA_MIGRATION_ID})
+    last_id = checkpoint.get("last_id") if checkpoint else None
+    totals = {"converted": 0, "bytes_before": 0, "bytes_after": 0, "done": False}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        query = {"v": {"$ne": SCHEMA_VERSION}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = list(recipes.find(query).sort("_id", 1).limit(batch_size))
+        if not docs:
+            totals["done"] = True
+            break
+        updates = []
+        for doc in docs:
+            compact = compact_recipe(doc)
+            converted = {key: value for key, value in doc.items() if key not in LEGACY_FIELDS}
+            converted.update(compact)
+            totals["bytes_before"] += len(bson_encode(doc))
+            totals["bytes_after"] += len(bson_encode(converted))
+            unset = {field: "" for field in LEGACY_FIELDS if field in doc and field not in compact}
+            update = {"$set": compact}
+            if unset:
+                update["$unset"] = unset
+            # 条件中带上版本，重复执行或与新写入并发时不会二次转换
+            updates.append(UpdateOne({"_id": doc["_id"], "v": {"$ne": SCHEMA_VERSION}}, update))
+        last_id = docs[-1]["_id"]
+        totals["converted"] += len(docs)
+        batches += 1
+        if dry_run:
+            continue
+        recipes.bulk_write(updates, ordered=False)
+        progress.update_one({"_id": SCHEMA_MIGRATION_ID},
+                            {"$set": {"last_id": last_id, "updated": datetime.utcnow()},
+                             "$inc": {"converted": len(docs)}}, upsert=True)
+    if totals["done"] and not dry_run:
+        progress.update_one({"_id": SCHEMA_MIGRATION_ID}, {"$set": {"applied": datetime.utcnow()}}, upsert=True)
+    return totals
+
+
+def _migration_content_hash(db):
+    """为已有食谱回填内容哈希，导入时据此去重"""
+    recipes = db['recipes']
+    batch = []
+    for doc in recipes.find({"content_hash": {"$exists": False}}, {field: 0 for field in SEARCH_FIELDS}):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"content_hash": content_hash(doc)}}))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            recipes.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        recipes.bulk_write(batch, ordered=False)
+
+
+# 批量删除每批处理的食谱数：每批一次查询 + 一次 delete_many，避免单条操作长时间占用写锁
+DELETE_BATCH_SIZE = int(os.getenv("RECIPE_DELETE_BATCH_SIZE", 1000))
+# 软删除的食谱在回收站中保留的天数，到期由 TTL 索引自动清除
+TRASH_RETENTION_DAYS = int(os.getenv("RECIPE_TRASH_RETENTION_DAYS", 30))
+
+
+def _migration_recipe_trash(db):
+    """建立回收站集合的 TTL 索引
+
+    修改 TRASH_RETENTION_DAYS 后需要用 collMod 更新已有索引的 expireAfterSeconds。
+    """
+    trash = db['recipes_trash']
+    trash.create_index("deleted_at", expireAfterSeconds=TRASH_RETENTION_DAYS * 24 * 3600)
+    trash.create_index([("username", 1), ("deleted_at", -1)])
+
+
+def _object_ids(recipe_ids):
+    """把字符串 id 转换为 ObjectId，忽略无效的 id 并去重"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    ids = []
+    for recipe_id in recipe_ids:
+        try:
+            ids.append(recipe_id if isinstance(recipe_id, ObjectId) else ObjectId(recipe_id))
+        except (InvalidId, TypeError):
+            continue
+    return list(dict.fromkeys(ids))
+
+
+def _after(query, last_id):
+    # 按 _id 顺序分批处理时，下一批从上一批最后的 _id 之后开始
+    return query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+
+
+def _migration_write_indexes(db):
+    """搜索词元、内容哈希和按月计数使用的索引（对应的数据由 BACKFILLS 回填）"""
+    db['recipes'].create_index([("username", 1), ("search_tokens", 1)])
+    db['recipes'].create_index([("username", 1), ("content_hash", 1)])
+    db['recipe_counts'].create_index([("username", 1), ("month", 1)])
+
+
+def _migration_recipe_counts(db):
+    """从已有食谱回填按月计数"""
+    rebuild_recipe_counts(db)
+
+
+def _migration_user_stats(db):
+    rebuild_user_stats(db)
+
+
+# 按顺序执行的一次性迁移；已执行的记录在 migrations 集合中，新迁移追加到末尾。
+# MIGRATIONS 只建索引，启动时自动执行；BACKFILLS 需要扫描整个集合，
+# 只由 manage_db.py migrate 执行，避免应用启动时长时间阻塞
+MIGRATIONS = [
+    ("indexes_v1", _migration_indexes_v1),
+    ("keyset_indexes_v1", _migration_keyset_indexes),
+    ("write_indexes_v1", _migration_write_indexes),
+    ("recipe_trash_v1", _migration_recipe_trash),
+]
+BACKFILLS = [
+    ("search_tokens_v1", _migration_search_tokens),
+    ("recipe_counts_v1", _migration_recipe_counts),
+    ("user_stats_v1", _migration_user_stats),
+    ("content_hash_v1", _migration_content_hash),
+]
+
+_migrated = set()
+_migrated_lock = threading.Lock()
+
+
+def run_migrations(db, force=False, backfill=False):
+    """执行尚未执行过的迁移，返回本次执行的迁移名称
+
+    backfill=True 时同时执行 BACKFILLS 中的数据回填；否则只提示尚未执行的回填。
+    每个进程对同一数据库只检查一次；force=True 时忽略记录重新执行（迁移均为幂等操作）。
+    """
+    key = (id(db.client), db.name, backfill)
+    with _migrated_lock:
+        if key in _migrated and not force:
+            return []
+        applied = set() if force else {doc["_id"] for doc in db['migrations'].find({}, {"_id": 1})}
+        executed = []
+        for name, migrate in MIGRATIONS + (BACKFILLS if backfill else []):
+            if name in applied:
+                continue
+            migrate(db)
+            db['migrations'].update_one({"_id": name}, {"$set": {"applied": datetime.utcnow()}}, upsert=True)
+            executed.append(name)
+        if not backfill:
+            pending = [name for name, _ in BACKFILLS if name not in applied]
+            if pending:
+                print(f"Pending data migrations: {', '.join(pending)}; run `python manage_db.py migrate`")
+        _migrated.add(key)
+        return executed
+
+
+# 列表视图只需要的字段；ingredients 只取前 4 项（用于预览前 3 项并判断是否还有更多）
+SUMMARY_PREVIEW_INGREDIENTS = 3
+SUMMARY_PROJECTION = {
+    "title": 1,
+    "created": 1,
+    "rating": 1,
+    "tags": 1,
+    "diet": 1,
+    "goal": 1,
+    "cuisine": 1,
+    "ingredients": {"$slice": SUMMARY_PREVIEW_INGREDIENTS + 1},
+}
+# 列表排序方式 -> sort 参数（_id 作为同一时间戳下的次序）
+SUMMARY_SORTS = {
+    "newest": [("created", -1), ("_id", -1)],
+    "oldest": [("created", 1), ("_id", 1)],
+    "rating": [("rating", -1), ("created", -1), ("_id", -1)],
+}
+
+
+MAX_PAGE_SIZE = 100
+# 删除食谱时为更新统计而取回的字段
+STATS_PROJECTION = {"username": 1, "created": 1, "rating": 1, "diet": 1, "goal": 1, "cuisine": 1, "tags": 1}
+# 统计页每个维度显示的条目数和按月统计的月数
+STATISTICS_TOP_N = 5
+STATISTICS_MONTHS = 12
+
+
+def encode_cursor(sort, values):
+    """把排序方式和最后一条记录的排序键值编码为不透明的续页令牌"""
+    payload = json_util.dumps({"s": sort, "v": values}, json_options=json_util.RELAXED_JSON_OPTIONS, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort):
+    """解析续页令牌，令牌无效或与排序方式不符时抛出 ValueError"""
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8"))
+        values = payload["v"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort or not isinstance(values, list) or len(values) != len(SUMMARY_SORTS[sort]):
+        raise ValueError("Cursor does not match the requested sort")
+    return values
+
+
+def _keyset_filter(sort_keys, values):
+    """按 (k1, k2, ...) 字典序取排在 values 之后的记录：
+    k1 越过 v1，或 k1 = v1 且 k2 越过 v2，依此类推"""
+    clauses = []
+    for index, (field, direction) in enumerate(sort_keys):
+        value = values[index]
+        # 缺失字段（例如未评分）按 null 排序：升序时在最前，降序时在最后
+        if direction < 0:
+            if value is None:
+                continue
+            condition = {"$not": {"$gte": value}}
+        else:
+            condition = {"$ne": None} if value is None else {"$gt": value}
+        clause = {prior: prior_value for (prior, _), prior_value in zip(sort_keys[:index], values)}
+        clause[field] = condition
+        clauses.append(clause)
+    return {"$or": clauses} if clauses else {"_id": {"$exists": False}}
+
+
+class RecipeSummary:
+    """食谱列表项：只包含列表和统计视图展示的字段，完整文档在查看时再通过 get_recipe 获取"""
+
+    __slots__ = ("id", "title", "created", "rating", "tags", "diet", "goal", "cuisine",
+                 "ingredients_preview", "more_ingredients")
+
+    def __init__(self, id, title="", created=None, rating=0, tags=None, diet="", goal="", cuisine="",
+                 ingredients_preview=None, more_ingredients=False):
+        self.id = id
+        self.title = title
+        self.created = created
+        self.rating = rating
+        self.tags = tags or []
+        self.diet = diet
+        self.goal = goal
+        self.cuisine = cuisine
+        self.ingredients_preview = ingredients_preview or []
+        self.more_ingredients = more_ingredients
+
+    @classmethod
+    def from_document(cls, doc):
+        ingredients = doc.get("ingredients") or []
+        if isinstance(ingredients, str):
+            # 旧数据中 ingredients 可能是字符串
+            preview, more = [ingredients[:100]], len(ingredients) > 100
+        else:
+            preview, more = list(ingredients[:SUMMARY_PREVIEW_INGREDIENTS]), len(ingredients) > SUMMARY_PREVIEW_INGREDIENTS
+        return cls(
+            str(doc["_id"]),
+            doc.get("title", ""),
+            doc.get("created"),
+            doc.get("rating") or 0,
+            doc.get("tags") or [],
+            decode_diet(doc.get("diet", "")),
+            decode_goal(doc.get("goal", "")),
+            doc.get("cuisine", ""),
+            preview,
+            more,
+        )
+
+    @property
+    def ingredients_text(self):
+        return ', '.join(str(item) for item in self.ingredients_preview) + ('...' if self.more_ingredients else '')
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "created": self.created.isoformat() if isinstance(self.created, datetime) else self.created,
+            "rating": self.rating,
+            "tags": self.tags,
+            "diet": self.diet,
+            "goal": self.goal,
+            "cuisine": self.cuisine,
+            "ingredients_preview": self.ingredients_preview,
+            "more_ingredients": self.more_ingredients,
+        }
 
 
 class MongoDBManager:
-    def __init__(self, connection_string):
-        """初始化 MongoDB 连接"""
-        self.client = MongoClient(connection_string)
-        self.db = self.client['recipe_db']
+    def __init__(self, connection_string, migrate=True):
+        """初始化 MongoDB 连接（复用进程共享的 MongoClient）"""
+        self.client = get_mongo_client(connection_string)
+        self.db = self.client[DATABASE_NAME]
         self.users_collection = self.db['users']
         self.recipes_collection = self.db['recipes']
+        # 每个用户每月的食谱数（_id 为 "username|YYYY-MM"），随保存/删除增减
+        self.recipe_counts_collection = self.db['recipe_counts']
+        # 每个用户的汇总统计（_id 为用户名），随保存/删除用 $inc 增量更新
+        self.user_stats_collection = self.db['user_stats']
+        # 软删除的食谱（保留原文档和 deleted_at），TRASH_RETENTION_DAYS 天后自动清除
+        self.trash_collection = self.db['recipes_trash']
 
-        # 创建索引
-        self._create_indexes()
-
-    def _create_indexes(self):
-        """创建数据库索引"""
-        try:
-            self.users_collection.create_index("username", unique=True)
-            self.recipes_collection.create_index([("username", 1), ("created", -1)])
-        except:
-            pass
+        # 建索引的一次性迁移：每个进程只检查一次，已执行过的迁移不会重复 create_index；
+        # 数据回填不在这里执行（见 BACKFILLS）
+        if migrate:
+            try:
+                run_migrations(self.db)
+            except Exception as e:
+                print(f"MongoDB migration failed: {e}")
 
     def hash_password(self, password):
         """密码加密"""
@@ -74,72 +666,339 @@ class MongoDBManager:
         )
 
     def save_recipe(self, username, recipe_data):
-        """保存食谱"""
-        recipe_doc = {
-            "username": username,
-            "title": recipe_data.get("title", ""),
-            "description": recipe_data.get("description", ""),
-            "ingredients": recipe_data.get("ingredients", []),
-            "instructions": recipe_data.get("instructions", []),
-            "nutrition_info": recipe_data.get("nutrition", ""),
-            "serves": recipe_data.get("serves", ""),
-            "prep_time": recipe_data.get("prep_time", ""),
-            "cook_time": recipe_data.get("cook_time", ""),
-            "difficulty": recipe_data.get("difficulty", ""),
-            "cuisine": recipe_data.get("cuisine", ""),
-            "diet": recipe_data.get("diet", ""),
-            "goal": recipe_data.get("goal", ""),
-            "created": datetime.utcnow(),
-            "rating": recipe_data.get("rating", 0),
-            "tags": recipe_data.get("tags", []),
-            "notes": recipe_data.get("notes", ""),
-            # 保持向后兼容性
-            "recipe_text": recipe_data.get("recipe_text", ""),
-            "nutrition": recipe_data.get("nutrition", "")
-        }
+        """保存食谱（当前存储格式见 recipe_schema，读取时用 recipe_from_document 转换）"""
+        recipe_doc = build_recipe_document(username, recipe_data)
 
         result = self.recipes_collection.insert_one(recipe_doc)
+        self._inc_stats_many(username, [recipe_doc], 1)
         return str(result.inserted_id)
 
-    def get_user_recipes(self, username, limit=50, skip=0):
-        """获取用户的食谱"""
+    def get_user_recipes(self, username, limit=50, skip=0, language=None):
+        """获取用户的食谱（完整文档，难度按 language 翻译）"""
         recipes = self.recipes_collection.find(
-            {"username": username}
+            {"username": username}, {field: 0 for field in SEARCH_FIELDS}
         ).sort("created", -1).skip(skip).limit(limit)
 
-        return list(recipes)
+        return [recipe_from_document(recipe, language) for recipe in recipes]
+
+    def list_recipe_summaries(self, username, limit=50, skip=0, diet=None, sort="newest"):
+        """列表视图用的食谱摘要（投影查询，不传输步骤、营养等大字段）
+
+        diet 为 None 时不过滤；sort 取值见 SUMMARY_SORTS。
+        """
+        query = {"username": username}
+        if diet is not None:
+            query["diet"] = diet_condition(diet)
+        cursor = self.recipes_collection.find(query, SUMMARY_PROJECTION).sort(SUMMARY_SORTS.get(sort, SUMMARY_SORTS["newest"]))
+        return [RecipeSummary.from_document(doc) for doc in cursor.skip(skip).limit(limit)]
+
+    def list_recipe_page(self, username, limit=20, cursor=None, diet=None, sort="newest"):
+        """按 (username, 排序键, _id) 键集分页获取食谱摘要
+
+        返回 (摘要列表, 下一页令牌)，没有更多数据时令牌为 None。每一页都是从索引位置
+        开始的范围查询，不使用 skip，翻到多深的页耗时都与第一页相同。
+        """
+        if sort not in SUMMARY_SORTS:
+            sort = "newest"
+        sort_keys = SUMMARY_SORTS[sort]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        query = {"username": username}
+        if diet is not None:
+            query["diet"] = diet_condition(diet)
+        if cursor:
+            query.update(_keyset_filter(sort_keys, decode_cursor(cursor, sort)))
+
+        docs = list(self.recipes_collection.find(query, SUMMARY_PROJECTION).sort(sort_keys).limit(limit + 1))
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            last = docs[-1]
+            next_cursor = encode_cursor(sort, [last.get(field) for field, _ in sort_keys])
+        return [RecipeSummary.from_document(doc) for doc in docs], next_cursor
+
+    def get_recipe(self, recipe_id, username=None, language=None):
+        """获取单个食谱的完整文档（查看详情时使用）；username 不为 None 时只返回该用户的食谱，
+        难度按 language 翻译（None 时为英文）"""
+        from bson import ObjectId
+        from bson.errors import InvalidId
+        try:
+            query = {"_id": ObjectId(recipe_id)}
+        except (InvalidId, TypeError):
+            return None
+        if username is not None:
+            query["username"] = username
+        # 搜索词元只在服务端使用
+        return recipe_from_document(self.recipes_collection.find_one(query, {field: 0 for field in SEARCH_FIELDS}), language)
 
     def delete_recipe(self, recipe_id):
         """删除食谱"""
         from bson import ObjectId
-        result = self.recipes_collection.delete_one({"_id": ObjectId(recipe_id)})
-        return result.deleted_count > 0
-
-    def search_recipes(self, username, query):
-        """搜索食谱"""
-        search_filter = {
-            "username": username,
-            "$or": [
-                {"ingredients": {"$regex": query, "$options": "i"}},
-                {"recipe_text": {"$regex": query, "$options": "i"}},
-                {"tags": {"$regex": query, "$options": "i"}}
-            ]
+        deleted = self.recipes_collection.find_one_and_delete({"_id": ObjectId(recipe_id)}, projection=STATS_PROJECTION)
+        if deleted is None:
+            return False
+        self._inc_stats_many(deleted.get("username"), [deleted], -1)
+        return True
+
+    def delete_recipes(self, username, recipe_ids, soft=False, batch_size=DELETE_BATCH_SIZE):
+        """按 id 批量删除该用户的食谱，返回删除数；无效或不属于该用户的 id 忽略
+
+        soft=True 时移入回收站，可用 restore_recipes 恢复。
+        """
+        ids = _object_ids(recipe_ids)
+        deleted = 0
+        for start in range(0, len(ids), batch_size):
+            deleted += self._delete_batch(username, ids[start:start + batch_size], soft)
+        return deleted
+
+    def delete_recipes_matching(self, username, query=None, soft=False, batch_size=DELETE_BATCH_SIZE):
+        """批量删除该用户符合 query（附加的查询条件，None 表示全部）的食谱，返回删除数
+
+        按 _id 顺序每次取 batch_size 个 id，再用一次 delete_many 删除，统计按删除的食谱增量扣减。
+        """
+        query = {**(query or {}), "username": username}
+        deleted = 0
+        last_id = None
+        while True:
+            ids = [doc["_id"] for doc in
+                   self.recipes_collection.find(_after(query, last_id), {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not ids:
+                return deleted
+            deleted += self._delete_batch(username, ids, soft)
+            last_id = ids[-1]
+
+    def clear_recipes(self, username, soft=False, batch_size=DELETE_BATCH_SIZE):
+        """删除该用户的全部食谱，返回删除数
+
+        硬删除时不读取食谱内容，分批删除后直接重置 user_stats 和按月计数；
+        soft=True 时整体移入回收站。
+        """
+        if soft:
+            return self.delete_recipes_matching(username, soft=True, batch_size=batch_size)
+        deleted = 0
+        while True:
+            ids = [doc["_id"] for doc in
+                   self.recipes_collection.find({"username": username}, {"_id": 1}).sort("_id", 1).limit(batch_size)]
+            if not ids:
+                break
+            deleted += self.recipes_collection.delete_many({"_id": {"$in": ids}, "username": username}).deleted_count
+        # 没有剩余食谱，重算只写入计数为 0 的统计文档并删除按月计数
+        self._rebuild_counters(username)
+        return deleted
+
+    def _delete_batch(self, username, ids, soft):
+        query = {"_id": {"$in": ids}, "username": username}
+        # 软删除保留完整文档（含搜索词元），恢复时原样写回
+        docs = list(self.recipes_collection.find(query, None if soft else STATS_PROJECTION))
+        if not docs:
+            return 0
+        if soft:
+            deleted_at = datetime.utcnow()
+            # 按 _id 覆盖写入，上次中断后重试不会产生重复
+            self.trash_collection.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, {**doc, "deleted_at": deleted_at}, upsert=True) for doc in docs],
+                ordered=False
+            )
+        result = self.recipes_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}, "username": username})
+        if result.deleted_count == len(docs):
+            self._inc_stats_many(username, docs, -1)
+        else:
+            # 部分食谱已被并发删除，无法确定哪些由本次删除，改为重算
+            self._rebuild_counters(username)
+        return result.deleted_count
+
+    def _rebuild_counters(self, username):
+        """从食谱重算该用户的按月计数和 user_stats
+
+        user_stats 文档最后写入：它存在即表示该用户的两类计数都已从食谱完整计算过，
+        之后才可以只做增量更新。
+        """
+        rebuild_recipe_counts(self.db, username)
+        rebuild_user_stats(self.db, username)
+
+    def _ensure_counters(self, username):
+        """统计文档缺失（新用户或尚未回填的旧用户）时从食谱重算一次"""
+        if self.user_stats_collection.find_one({"_id": username}, {"_id": 1}) is None:
+            self._rebuild_counters(username)
+
+    def _inc_stats_many(self, username, docs, sign):
+        """把多条食谱的统计增量合并为一次 user_stats 更新和一次按月计数的批量写入
+
+        user_stats 不存在时不做 upsert（否则尚未回填的旧用户会得到只含本次增量的统计），
+        而是从食谱重算该用户的全部计数；此时食谱已写入或删除，重算结果包含本次变更。
+        """
+        if username is None:
+            return
+        inc = {}
+        months = {}
+        for doc in docs:
+            for path, amount in recipe_stats_increments(doc, sign).items():
+                inc[path] = inc.get(path, 0) + amount
+            if isinstance(doc.get("created"), datetime):
+                month = month_key(doc["created"])
+                months[month] = months.get(month, 0) + sign
+        result = self.user_stats_collection.update_one(
+            {"_id": username},
+            {"$inc": inc, "$set": {"updated": datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            self._rebuild_counters(username)
+            return
+        if months:
+            self.recipe_counts_collection.bulk_write([
+                UpdateOne({"_id": f"{username}|{month}"},
+                          {"$inc": {"count": amount}, "$setOnInsert": {"username": username, "month": month}},
+                          upsert=True)
+                for month, amount in months.items()
+            ], ordered=False)
+
+    def list_trash(self, username, limit=MAX_PAGE_SIZE):
+        """回收站中的食谱摘要，最近删除的在前"""
+        docs = self.trash_collection.find({"username": username}, SUMMARY_PROJECTION) \
+            .sort("deleted_at", -1).limit(limit)
+        return [RecipeSummary.from_document(doc) for doc in docs]
+
+    def count_trash(self, username):
+        return self.trash_collection.count_documents({"username": username})
+
+    def restore_recipes(self, username, recipe_ids=None, batch_size=DELETE_BATCH_SIZE):
+        """把回收站中的食谱恢复到食谱集合（recipe_ids 为 None 时恢复全部），返回恢复数"""
+        query = {"username": username}
+        if recipe_ids is not None:
+            query["_id"] = {"$in": _object_ids(recipe_ids)}
+        restored = 0
+        last_id = None
+        while True:
+            docs = list(self.trash_collection.find(_after(query, last_id)).sort("_id", 1).limit(batch_size))
+            if not docs:
+                return restored
+            last_id = docs[-1]["_id"]
+            for doc in docs:
+                doc.pop("deleted_at", None)
+            failed = set()
+            try:
+                self.recipes_collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # 已存在（例如重复恢复）的食谱不再计入统计
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+            self.trash_collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            if inserted:
+                self._inc_stats_many(username, inserted, 1)
+            restored += len(inserted)
+
+    def empty_trash(self, username):
+        """永久删除回收站中该用户的食谱，返回删除数"""
+        return self.trash_collection.delete_many({"username": username}).deleted_count
+
+    def get_user_stats(self, username):
+        """用户的汇总统计（一次按 _id 的点查询）
+
+        返回 total_recipes、avg_rating（没有评分时为 None）以及 diets / goals / cuisines / tags
+        的 {值: 次数}；统计文档缺失时从食谱重算一次（同时重算按月计数）。
+        """
+        doc = self.user_stats_collection.find_one({"_id": username})
+        if doc is None:
+            self._rebuild_counters(username)
+            doc = self.user_stats_collection.find_one({"_id": username}) or {}
+        rating_count = doc.get("rating_count", 0)
+        stats = {
+            "total_recipes": doc.get("total_recipes", 0),
+            "avg_rating": doc.get("rating_sum", 0) / rating_count if rating_count > 0 else None,
         }
+        for name in USER_STATS_HISTOGRAMS:
+            stats[name] = {_stats_value(key): count for key, count in (doc.get(name) or {}).items() if count > 0}
+        return stats
+
+    def get_user_recipes_by_month(self, username, year, month, limit=MAX_PAGE_SIZE):
+        """某月（UTC）创建的食谱摘要，按创建时间倒序；只需要数量时使用 count_recipes_in_month"""
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        docs = self.recipes_collection.find(
+            {"username": username, "created": {"$gte": start, "$lt": end}}, SUMMARY_PROJECTION
+        ).sort(SUMMARY_SORTS["newest"]).limit(limit)
+        return [RecipeSummary.from_document(doc) for doc in docs]
+
+    def count_recipes_in_month(self, username, year, month):
+        """某月（UTC）创建的食谱数，读取按月计数集合"""
+        self._ensure_counters(username)
+        doc = self.recipe_counts_collection.find_one({"_id": f"{username}|{year:04d}-{month:02d}"}, {"count": 1})
+        return doc["count"] if doc else 0
+
+    def count_recipes(self, username, start=None, end=None):
+        """[start, end) 内创建的食谱数；只扫描 (username, created) 索引，不读取文档"""
+        query = {"username": username}
+        if start is not None or end is not None:
+            query["created"] = {}
+            if start is not None:
+                query["created"]["$gte"] = start
+            if end is not None:
+                query["created"]["$lt"] = end
+        return self.recipes_collection.count_documents(query)
+
+    def count_recipes_by_period(self, username, unit="month", periods=12, until=None):
+        """截至 until（默认当前 UTC 时间）所在周期的最近 periods 个周期的食谱数
 
-        return list(self.recipes_collection.find(search_filter).sort("created", -1))
-
-    def get_recipe_statistics(self, username):
-        """获取用户食谱统计"""
-        pipeline = [
-            {"$match": {"username": username}},
-            {"$group": {
-                "_id": None,
-                "total_recipes": {"$sum": 1},
-                "avg_rating": {"$avg": "$rating"},
-                "most_used_diet": {"$push": "$diet"},
-                "most_used_goal": {"$push": "$goal"}
-            }}
-        ]
-
-        stats = list(self.recipes_collection.aggregate(pipeline))
-        return stats[0] if stats else {}
\ No newline at end of file
+        unit 为 "day"、"week"（周一开始）或 "month"；返回按时间升序的
+        [{"period": "YYYY-MM-DD" 或 "YYYY-MM", "count"}]。按月读取计数集合（一次范围查询），
+        按日/周对每个周期执行一次只计数的索引查询。
+        """
+        until = until or datetime.utcnow()
+        if unit == "month":
+            self._ensure_counters(username)
+            months = recent_months(until, periods)
+            counts = {doc["month"]: doc["count"] for doc in self.recipe_counts_collection.find(
+                {"username": username, "month": {"$gte": months[0], "$lte": months[-1]}}, {"month": 1, "count": 1})}
+            return [{"period": key, "count": counts.get(key, 0)} for key in months]
+
+        if unit == "week":
+            step = timedelta(weeks=1)
+            current = datetime(until.year, until.month, until.day) - timedelta(days=until.weekday())
+        elif unit == "day":
+            step = timedelta(days=1)
+            current = datetime(until.year, until.month, until.day)
+        else:
+            raise ValueError(f"Unknown period unit: {unit}")
+
+        starts = [current - step * index for index in range(periods - 1, -1, -1)]
+        return [{"period": start.strftime("%Y-%m-%d"), "count": self.count_recipes(username, start, start + step)}
+                for start in starts]
+
+    def search_recipes(self, username, query, projection=None, limit=50, skip=0, diet=None):
+        """在标题、食材、标签和备注中搜索食谱，按相关度排序分页返回
+
+        查询中的所有词元都须命中（中文按二元组匹配），结果带 score 字段；
+        projection 为 SUMMARY_PROJECTION 时只返回列表视图需要的字段。limit 最多为 MAX_PAGE_SIZE + 1，
+        调用方可以多取一条来判断是否还有下一页。
+        """
+        pipeline = search_pipeline(username, query, projection, min(limit, MAX_PAGE_SIZE + 1), skip,
+                                   diet_condition(diet) if diet is not None else None)
+        if pipeline is None:
+            return []
+        return list(self.recipes_collection.aggregate(pipeline))
+
+    def get_recipe_statistics(self, username, top=STATISTICS_TOP_N, months=STATISTICS_MONTHS):
+        """获取用户食谱统计（读取 user_stats 和按月计数，不扫描食谱）
+
+        返回 total_recipes、avg_rating、top_diets / top_goals / top_cuisines / top_tags
+        （[{"value", "count"}]，按次数降序）和 monthly（截至本月的最近 months 个自然月，
+        [{"month": "YYYY-MM", "count"}]，按月份升序，没有食谱的月份为 0）；没有食谱时返回空字典。
+        """
+        stats = self.get_user_stats(username)
+        if not stats["total_recipes"]:
+            return {}
+
+        def top_values(histogram):
+            ranked = sorted(histogram.items(), key=lambda item: (-item[1], item[0]))[:top]
+            return [{"value": value, "count": count} for value, count in ranked]
+
+        return {
+            "total_recipes": stats["total_recipes"],
+            "avg_rating": stats["avg_rating"],
+            "top_diets": top_values(stats["diets"]),
+            "top_goals": top_values(stats["goals"]),
+            "top_cuisines": top_values(stats["cuisines"]),
+            "top_tags": top_values(stats["tags"]),
+            "monthly": [{"month": row["period"], "count": row["count"]}
+                        for row in self.count_recipes_by_period(username, "month", months)],
+        }
@@ -0,0 +1,172 @@
+from collections import deque
+import functools
+import re
+import threading
+
+# 输出 token 上限的取值范围；MAX_OUTPUT_TOKENS 与原先固定的 max_tokens 相同
+MIN_OUTPUT_TOKENS = 600
+MAX_OUTPUT_TOKENS = 2500
+# 估算值之上的安全余量
+OUTPUT_TOKEN_MARGIN = 1.25
+
+LANGUAGE_NAMES = {
+    "zh": "Simplified Chinese",
+    "en": "English",
+    "ja": "Japanese",
+}
+
+# 各难度要求的步骤数；难度可能是界面上的译文
+DIFFICULTY_STEPS = {
+    "easy": 5, "简单": 5, "簡単": 5,
+    "medium": 7, "中等": 7, "中級": 7,
+    "hard": 10, "困难": 10, "難しい": 10,
+}
+DEFAULT_STEPS = 7
+
+# 单条内容的平均 token 数（英文）；中日文每个字符接近一个 token，按语言系数放大
+TOKENS_PER_INGREDIENT = 18
+TOKENS_PER_STEP = 40
+TOKENS_FIXED = 260
+LANGUAGE_TOKEN_FACTOR = {"zh": 1.3, "ja": 1.5}
+
+_CJK_RE = re.compile(r'[぀-ヿ㐀-鿿가-힯]')
+
+
+def estimate_tokens(text):
+    """粗略估算文本的 token 数：CJK 字符约 1 个/字，其余约 4 字符/个"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_ingredients(ingredients):
+    if isinstance(ingredients, str):
+        return [item for item in re.split(r'[,，、;；\n]+', ingredients) if item.strip()]
+    return list(ingredients or [])
+
+
+def parse_servings(servings, default=2):
+    """份数可能来自表单原文（"4 people"、"2-3"），取其中第一个整数，没有时返回 default"""
+    if isinstance(servings, int) and not isinstance(servings, bool):
+        return servings if servings > 0 else default
+    match = re.search(r'\d+', str(servings or ""))
+    return int(match.group()) if match and int(match.group()) > 0 else default
+
+
+def instruction_steps(difficulty):
+    """按难度确定要求模型输出的步骤数"""
+    return DIFFICULTY_STEPS.get(str(difficulty or "").strip().casefold(), DEFAULT_STEPS)
+
+
+@functools.lru_cache(maxsize=16)
+def _system_prompt(language):
+    """按语言缓存的系统提示词；内容固定，便于服务商复用前缀缓存"""
+    language_name = LANGUAGE_NAMES.get(language, language)
+    return (
+        f"You are a chef and certified nutritionist. Write every text value in {language_name}; "
+        "keep JSON keys in English. Reply with one ```json fenced object and nothing else:\n"
+        '{"title":"","description":"","ingredients":["item with quantity"],'
+        '"instructions":["step with timing and technique"],'
+        '"nutrition":{"Calories":"N kcal","Protein":"N g","Carbohydrates":"N g","Fat":"N g","Fiber":"N g",'
+        '"Sugar":"N g","Sodium":"N mg","Vitamin A":"N IU","Calcium":"N mg","Iron":"N mg"},'
+        '"serves":0,"prep_time":"N min","cook_time":"N min","difficulty":"Easy/Medium/Hard"}\n'
+        "Nutrition is per serving, estimated from USDA data. Strictly follow the diet. Optimize for the goal: "
+        "muscle gain = high protein; weight loss = fewer calories, high fiber, lean protein; "
+        "energy = complex carbs, B vitamins; heart health = low sodium, omega-3, little saturated fat."
+    )
+
+
+class PromptBuilder:
+    """构建紧凑的食谱生成消息，并按请求参数给出 max_tokens"""
+
+    def build_messages(self, ingredients, diet, goal, language="en", cuisine=None, cooking_time=None, difficulty=None, servings=2):
+        steps = instruction_steps(difficulty)
+        lines = [
+            f"Ingredients: {ingredients}",
+            f"Diet: {diet or 'none'}",
+            f"Goal: {goal or 'general nutrition'}",
+            f"Cuisine: {cuisine or 'any'}",
+            f"Cooking time: {cooking_time or 'any'}",
+            f"Difficulty: {difficulty or 'medium'}",
+            f"Servings: {servings}",
+            f"Steps: about {steps}",
+        ]
+        return [
+            {"role": "system", "content": _system_prompt(language)},
+            {"role": "user", "content": "\n".join(lines)},
+        ]
+
+    def max_tokens(self, ingredients, language="en", difficulty=None, servings=2, observed=None):
+        """估算输出 token 数并加余量
+
+        observed 为同语言最近调用实际输出 token 数的高分位，用于修正估算偏低的情况。
+        """
+        ingredient_count = len(_split_ingredients(ingredients)) + 3 + min(parse_servings(servings), 10) // 4
+        estimate = TOKENS_FIXED + ingredient_count * TOKENS_PER_INGREDIENT + instruction_steps(difficulty) * TOKENS_PER_STEP
+        estimate *= LANGUAGE_TOKEN_FACTOR.get(language, 1.0)
+        if observed:
+            estimate = max(estimate, observed)
+        return int(min(MAX_OUTPUT_TOKENS, max(MIN_OUTPUT_TOKENS, estimate * OUTPUT_TOKEN_MARGIN)))
+
+
+class TokenUsageTracker:
+    """记录每次调用的 prompt/completion token 数"""
+
+    def __init__(self, recent=200):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent)
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.truncated = 0
+
+    def record(self, provider, language, prompt_tokens, completion_tokens, max_tokens, finish_reason=None, estimated=False):
+        entry = {
+            "provider": provider,
+            "language": language,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "max_tokens": max_tokens,
+            "finish_reason": finish_reason,
+            "estimated": estimated,
+        }
+        with self._lock:
+            self._recent.append(entry)
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            if finish_reason == "length":
+                self.truncated += 1
+        return entry
+
+    def completion_percentile(self, language, q=0.95, min_samples=10):
+        """同语言最近调用输出 token 数的分位值，样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(entry["completion_tokens"] for entry in self._recent
+                             if entry["language"] == language and not entry["estimated"])
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.calls, 1) if self.calls else 0.0,
+                "avg_completion_tokens": round(self.completion_tokens / self.calls, 1) if self.calls else 0.0,
+                "truncated": self.truncated,
+                "recent": list(self._recent)[-20:],
+            }
+
+
+_token_usage = TokenUsageTracker()
+
+
+def get_token_usage():
+    """进程级 token 用量记录"""
+    return _token_usage
+
+
+def get_token_usage_stats():
+    return _token_usage.stats()
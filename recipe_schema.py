@@ -0,0 +1,276 @@
+import hashlib
+import json
+import re
+import unicodedata
+
+# 食谱文档的存储格式版本：缺少 v 字段的是旧格式（v1）
+SCHEMA_VERSION = 2
+
+# 饮食、目标、难度存为短整数编码；表中没有的值按原字符串保存
+DIET_CODES = {"": 0, "vegetarian": 1, "vegan": 2, "keto": 3, "low-carb": 4, "high-protein": 5,
+              "mediterranean": 6, "gluten-free": 7}
+GOAL_CODES = {"": 0, "weight-loss": 1, "muscle-gain": 2, "energy": 3, "digestion": 4, "immunity": 5,
+              "heart-health": 6}
+DIFFICULTY_CODES = {"": 0, "easy": 1, "medium": 2, "hard": 3}
+# 各语言的难度名称（与界面翻译一致）；英文为首字母大写的编码值
+DIFFICULTY_LABELS = {
+    "zh": {"easy": "简单", "medium": "中等", "hard": "困难"},
+    "ja": {"easy": "簡単", "medium": "中級", "hard": "難しい"},
+}
+# 模型按用户语言返回的难度
+DIFFICULTY_ALIASES = {label: value for labels in DIFFICULTY_LABELS.values() for value, label in labels.items()}
+_DIETS = {code: value for value, code in DIET_CODES.items()}
+_GOALS = {code: value for value, code in GOAL_CODES.items()}
+_DIFFICULTIES = {code: value for value, code in DIFFICULTY_CODES.items()}
+
+# (显示名称, 存储字段, 单位)；存储字段为数值，便于范围查询
+NUTRIENTS = [
+    ("Calories", "kcal", "kcal"),
+    ("Protein", "protein_g", "g"),
+    ("Carbohydrates", "carbs_g", "g"),
+    ("Fat", "fat_g", "g"),
+    ("Fiber", "fiber_g", "g"),
+    ("Sugar", "sugar_g", "g"),
+    ("Sodium", "sodium_mg", "mg"),
+    ("Vitamin A", "vitamin_a_iu", "IU"),
+    ("Calcium", "calcium_mg", "mg"),
+    ("Iron", "iron_mg", "mg"),
+]
+NUTRIENT_ALIASES = {
+    "calories": "Calories", "卡路里": "Calories", "热量": "Calories", "カロリー": "Calories",
+    "protein": "Protein", "蛋白质": "Protein", "タンパク質": "Protein",
+    "carbohydrates": "Carbohydrates", "carbs": "Carbohydrates", "碳水化合物": "Carbohydrates", "炭水化物": "Carbohydrates",
+    "fat": "Fat", "脂肪": "Fat", "脂質": "Fat",
+    "fiber": "Fiber", "纤维": "Fiber", "膳食纤维": "Fiber", "食物繊維": "Fiber",
+    "sugar": "Sugar", "糖": "Sugar", "糖質": "Sugar",
+    "sodium": "Sodium", "钠": "Sodium", "ナトリウム": "Sodium",
+    "vitamin a": "Vitamin A", "vitamina": "Vitamin A", "维生素a": "Vitamin A", "ビタミンa": "Vitamin A",
+    "calcium": "Calcium", "钙": "Calcium", "カルシウム": "Calcium",
+    "iron": "Iron", "铁": "Iron", "鉄": "Iron",
+}
+_NUTRIENT_FIELDS = {name: (field, unit) for name, field, unit in NUTRIENTS}
+# 换算到存储单位的系数
+_UNIT_FACTORS = {
+    ("g", "mg"): 1000, ("mg", "g"): 0.001, ("μg", "mg"): 0.001, ("mcg", "mg"): 0.001,
+    ("kj", "kcal"): 1 / 4.184, ("cal", "kcal"): 1, ("千卡", "kcal"): 1, ("大卡", "kcal"): 1,
+    ("克", "g"): 1, ("毫克", "mg"): 1,
+}
+# 英文单位的其他写法
+_UNIT_ALIASES = {"gram": "g", "grams": "g", "milligram": "mg", "milligrams": "mg", "kcals": "kcal",
+                 "calories": "kcal", "mcg": "μg"}
+# 整个值须是“数字 + 可选单位”，范围（"200-300 kcal"）或带说明的文本不解析
+_QUANTITY_RE = re.compile(r'\s*(\d+(?:\.\d+)?)\s*([a-zA-Z\u03bc\u4e00-\u9fff]*)\s*')
+# 千位分隔符（NFKC 后全角逗号也是 ","），只去掉后面恰好跟三位数字的逗号
+_GROUPING_RE = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+# 长的单位写在前面，避免 "min" 只匹配到 "m"
+_HOURS_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:hours|hour|hrs|hr|h|小时|小時|時間)', re.IGNORECASE)
+_MINUTES_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:minutes|minute|mins|min|m|分钟|分鐘|分)', re.IGNORECASE)
+# 时长之间允许的连接词，例如 "1 hour and 30 min"
+_DURATION_JOINERS_RE = re.compile(r'(?:\s|,|&|\band\b)*', re.IGNORECASE)
+
+# 参与内容哈希（导入去重）的字段；评分、标签、备注等用户数据不参与
+CONTENT_FIELDS = ("title", "description", "ingredients", "instructions", "nutrients", "serves", "cuisine",
+                  "diet", "goal", "difficulty", "prep_min", "cook_min", "prep_time", "cook_time")
+
+# 旧格式中被新格式取代的字段，迁移时删除
+LEGACY_FIELDS = ("nutrition", "nutrition_info", "recipe_text", "prep_time", "cook_time")
+
+
+def _number(value):
+    # 保留完整精度，只在显示时格式化（见 _format_number）
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def _normalize(text):
+    # NFKC 把全角数字、微符号 µ（U+00B5）等统一为标准形式（µ → μ）
+    return unicodedata.normalize('NFKC', str(text or ""))
+
+
+def _normalize_number_text(text):
+    # 在 _normalize 的基础上去掉千位分隔符："1,200 mg" / "1，050 kcal" -> "1200 mg" / "1050 kcal"
+    return _GROUPING_RE.sub("", _normalize(text))
+
+
+def encode_code(codes, value):
+    """把饮食/目标/难度值编码为整数，未知值保留原字符串"""
+    if isinstance(value, int):
+        return value
+    text = str(value or "").strip()
+    key = text.casefold()
+    return codes.get(DIFFICULTY_ALIASES.get(key, key) if codes is DIFFICULTY_CODES else key, text)
+
+
+def decode_diet(value):
+    return _DIETS.get(value, value) if isinstance(value, int) else (value or "")
+
+
+def decode_goal(value):
+    return _GOALS.get(value, value) if isinstance(value, int) else (value or "")
+
+
+def decode_difficulty(value):
+    return _DIFFICULTIES.get(value, value) if isinstance(value, int) else (value or "")
+
+
+def diet_condition(diet):
+    """按饮食过滤的查询条件；迁移期间新旧两种存储形式都要匹配"""
+    code = encode_code(DIET_CODES, diet)
+    return diet if code == diet else {"$in": [code, diet]}
+
+
+def _parse_serves(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    match = re.search(r'\d+', str(value or ""))
+    return int(match.group()) if match else None
+
+
+def parse_minutes(text):
+    """"1 hour 30 min" / "45分钟" / "20" -> 分钟数
+
+    范围（"15-20 min"）或含其他文字（"about 30 min"）时返回 None，由调用方保留原文本。
+    """
+    if isinstance(text, (int, float)):
+        return _number(text)
+    text = _normalize_number_text(text)
+    bare = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*', text)
+    if bare:
+        return _number(float(bare.group(1)))
+    hours = [float(value) for value in _HOURS_RE.findall(text)]
+    rest = _HOURS_RE.sub(" ", text)
+    minutes = [float(value) for value in _MINUTES_RE.findall(rest)]
+    rest = _MINUTES_RE.sub(" ", rest)
+    if not (hours or minutes) or not _DURATION_JOINERS_RE.fullmatch(rest):
+        return None
+    return _number(sum(hours) * 60 + sum(minutes))
+
+
+def parse_nutrient(text, unit):
+    """"320 kcal" / "1.2 g"（钠）/ "1,200 mg" -> 存储单位下的数值
+
+    范围、带说明的文本或未知单位返回 None，由调用方保留原文本。
+    """
+    if isinstance(text, (int, float)):
+        return _number(text)
+    match = _QUANTITY_RE.fullmatch(_normalize_number_text(text))
+    if not match:
+        return None
+    value, found = float(match.group(1)), match.group(2).casefold()
+    found = _UNIT_ALIASES.get(found, found)
+    if found and found != unit.casefold():
+        factor = _UNIT_FACTORS.get((found, unit))
+        if factor is None:
+            return None
+        value *= factor
+    return _number(value)
+
+
+def _nutrition_items(nutrition):
+    if isinstance(nutrition, dict):
+        return nutrition.items()
+    # 旧数据中营养信息可能是 "- Calories: 320 kcal" 形式的多行文本
+    items = []
+    for line in str(nutrition or "").splitlines():
+        if ':' in line:
+            key, value = line.split(':', 1)
+            items.append((key.strip().lstrip('-').strip(), value.strip()))
+    return items
+
+
+def compact_nutrients(nutrition):
+    """营养信息 -> {存储字段: 数值}；无法解析的值保留原文本"""
+    nutrients = {}
+    for key, value in _nutrition_items(nutrition):
+        name = NUTRIENT_ALIASES.get(str(key).strip().casefold(), key)
+        if name not in _NUTRIENT_FIELDS or value in (None, ""):
+            continue
+        field, unit = _NUTRIENT_FIELDS[name]
+        number = parse_nutrient(value, unit)
+        if number is not None:
+            nutrients[field] = number
+        elif str(value).strip() and str(value).strip().casefold() != "not available":
+            nutrients[field] = str(value).strip()
+    return nutrients
+
+
+def compact_recipe(recipe):
+    """把食谱（生成结果或旧格式文档）转换为当前存储格式的字段，不含 username/created 等元数据"""
+    nutrition = recipe.get("nutrition") or recipe.get("nutrition_info") or {}
+    doc = {
+        "v": SCHEMA_VERSION,
+        "title": recipe.get("title", ""),
+        "description": recipe.get("description", ""),
+        "ingredients": recipe.get("ingredients", []),
+        "instructions": recipe.get("instructions", []),
+        "nutrients": compact_nutrients(nutrition),
+        "serves": _parse_serves(recipe.get("serves")),
+        "cuisine": recipe.get("cuisine", ""),
+        "diet": encode_code(DIET_CODES, recipe.get("diet", "")),
+        "goal": encode_code(GOAL_CODES, recipe.get("goal", "")),
+        "difficulty": encode_code(DIFFICULTY_CODES, recipe.get("difficulty", "")),
+        "rating": recipe.get("rating", 0),
+        "tags": recipe.get("tags", []),
+        "notes": recipe.get("notes", ""),
+    }
+    for field in ("prep", "cook"):
+        text = recipe.get(f"{field}_time")
+        minutes = recipe.get(f"{field}_min") if text is None else parse_minutes(text)
+        if minutes is not None:
+            doc[f"{field}_min"] = minutes
+        elif text:
+            # 无法解析的时间保留原文本
+            doc[f"{field}_time"] = text
+    return doc
+
+
+def _format_number(value):
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def difficulty_label(difficulty, language=None):
+    """难度的显示名称：已知难度按 language 翻译（None 或其他语言为英文），未知值原样返回"""
+    key = DIFFICULTY_ALIASES.get(str(difficulty).strip(), str(difficulty).strip().casefold())
+    if key not in DIFFICULTY_CODES or not key:
+        return difficulty
+    return DIFFICULTY_LABELS.get(language, {}).get(key, key.capitalize())
+
+
+def recipe_from_document(doc, language=None):
+    """读取适配：把任意版本的存储文档转换为显示和导出使用的格式
+
+    nutrition 为 {"Calories": "320 kcal", ...}，prep_time / cook_time 为 "15 min"，
+    diet / goal / difficulty 为字符串；旧格式文档只补齐这些字段。difficulty 按 language
+    翻译，language 为 None 时为英文（导出和内容哈希使用）。
+    """
+    if doc is None:
+        return None
+    recipe = dict(doc)
+    if recipe.get("v", 1) < 2:
+        recipe["nutrition"] = recipe.get("nutrition") or recipe.get("nutrition_info") or {}
+        if recipe.get("difficulty"):
+            recipe["difficulty"] = difficulty_label(recipe["difficulty"], language)
+        return recipe
+
+    nutrients = recipe.pop("nutrients", None) or {}
+    recipe["nutrition"] = {
+        name: f"{_format_number(nutrients[field])} {unit}" if isinstance(nutrients[field], (int, float)) else nutrients[field]
+        for name, field, unit in NUTRIENTS if field in nutrients
+    }
+    for field in ("prep", "cook"):
+        minutes = recipe.pop(f"{field}_min", None)
+        if minutes is not None:
+            recipe[f"{field}_time"] = f"{_format_number(minutes)} min"
+    recipe["diet"] = decode_diet(recipe.get("diet"))
+    recipe["goal"] = decode_goal(recipe.get("goal"))
+    recipe["difficulty"] = difficulty_label(decode_difficulty(recipe.get("difficulty")), language)
+    if recipe.get("serves") is None:
+        recipe["serves"] = ""
+    return recipe
+
+
+def content_hash(recipe):
+    """食谱内容的哈希（任意存储版本或生成结果都先规范为当前格式再计算），用于导入去重"""
+    compact = compact_recipe(recipe_from_document(recipe))
+    content = {field: compact[field] for field in CONTENT_FIELDS if field in compact}
+    payload = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
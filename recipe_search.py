@@ -0,0 +1,122 @@
+import re
+import unicodedata
+
+from semantic_cache import singularize
+
+# 单个食谱最多索引的词元数，避免超长备注撑大多键索引
+MAX_DOCUMENT_TOKENS = 512
+# 单次查询最多使用的词元数
+MAX_QUERY_TOKENS = 16
+# 相关度权重：标题 > 食材/标签 > 备注（所有字段的命中都计入 search_tokens）
+TITLE_WEIGHT = 3
+KEYWORD_WEIGHT = 2
+
+# 中日韩文字没有空格分词，按连续片段切分后做单字 + 二元组
+_CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN_RE = re.compile(f'[{_CJK_RANGES}]+|[^\\W_{_CJK_RANGES}]+')
+_CJK_RE = re.compile(f'[{_CJK_RANGES}]')
+
+
+def _normalize(text):
+    # NFKC 把全角字母数字、半角片假名统一为标准形式
+    return unicodedata.normalize('NFKC', str(text)).casefold()
+
+
+def _word_token(word):
+    return singularize(word) if word.isalpha() else word
+
+
+def tokenize(text):
+    """索引用的词元：拉丁文按单词（单数化），中日韩文字按单字和相邻二元组"""
+    tokens = []
+    for run in _TOKEN_RE.findall(_normalize(text)):
+        if _CJK_RE.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(_word_token(run))
+    return tokens
+
+
+def query_tokens(query):
+    """查询用的词元：中日韩片段只取二元组（单字片段取单字），所有词元都须命中"""
+    tokens = []
+    for run in _TOKEN_RE.findall(_normalize(query)):
+        if not _CJK_RE.match(run):
+            tokens.append(_word_token(run))
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return list(dict.fromkeys(tokens))[:MAX_QUERY_TOKENS]
+
+
+def _unique(tokens, limit=MAX_DOCUMENT_TOKENS):
+    return list(dict.fromkeys(tokens))[:limit]
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        return [value]
+    return list(value or [])
+
+
+def build_search_fields(recipe):
+    """根据食谱的标题、食材、标签和备注生成搜索字段
+
+    search_tokens 带多键索引，用于匹配；search_title / search_keywords 只用于相关度排序。
+    """
+    title = tokenize(recipe.get("title") or "")
+    keywords = []
+    for value in _as_list(recipe.get("ingredients")) + _as_list(recipe.get("tags")):
+        keywords.extend(tokenize(value))
+    notes = tokenize(recipe.get("notes") or "")
+    return {
+        "search_tokens": _unique(title + keywords + notes),
+        "search_title": _unique(title),
+        "search_keywords": _unique(keywords),
+    }
+
+
+SEARCH_FIELDS = ("search_tokens", "search_title", "search_keywords")
+
+
+def _matched(field, tokens):
+    """查询词元中出现在 field 里的个数（只遍历不超过 MAX_QUERY_TOKENS 个查询词元）"""
+    return {"$size": {"$filter": {
+        "input": tokens,
+        "as": "token",
+        "cond": {"$in": ["$$token", {"$ifNull": [f"${field}", []]}]},
+    }}}
+
+
+def search_pipeline(username, query, projection=None, limit=50, skip=0, diet=None):
+    """构造搜索聚合管道；查询中没有可用词元时返回 None
+
+    先用 (username, search_tokens) 索引找出包含全部词元的食谱，再按加权命中数、
+    创建时间排序并分页（$sort + $limit 由服务器按 top-k 处理）。
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return None
+    match = {"username": username, "search_tokens": {"$all": tokens}}
+    if diet is not None:
+        match["diet"] = diet
+    if projection:
+        # find 投影中的 {"$slice": n} 在聚合中要写成 {"$slice": ["$field", n]}
+        project = {field: {"$slice": [f"${field}", value["$slice"]]} if isinstance(value, dict) and "$slice" in value else value
+                   for field, value in projection.items()}
+        project["score"] = 1
+    else:
+        project = {field: 0 for field in SEARCH_FIELDS}
+    return [
+        {"$match": match},
+        {"$addFields": {"score": {"$add": [
+            {"$multiply": [TITLE_WEIGHT, _matched("search_title", tokens)]},
+            {"$multiply": [KEYWORD_WEIGHT, _matched("search_keywords", tokens)]},
+        ]}}},
+        {"$sort": {"score": -1, "created": -1, "_id": -1}},
+        {"$skip": max(0, int(skip))},
+        {"$limit": max(1, int(limit))},
+        {"$project": project},
+    ]
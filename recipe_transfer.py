@@ -0,0 +1,140 @@
+"""食谱的流式导出（JSONL / gzip）和批量导入
+
+导出按 _id 顺序用游标分批读取，每行一个食谱（recipe_from_document 转换后的格式，不含
+_id、username 和服务端字段），边读边输出，内存占用与食谱数无关。导入逐行解析，按内容
+哈希去重后用 insert_many(ordered=False) 分批写入，结束时重算该用户的统计。
+"""
+import gzip
+import io
+import os
+import zlib
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from mongodb_manager import build_recipe_document, rebuild_recipe_counts, rebuild_user_stats
+from recipe_schema import recipe_from_document
+from recipe_search import SEARCH_FIELDS
+
+EXPORT_BATCH_SIZE = int(os.getenv("RECIPE_EXPORT_BATCH_SIZE", 500))
+IMPORT_BATCH_SIZE = int(os.getenv("RECIPE_IMPORT_BATCH_SIZE", 1000))
+# 单行最大字节数，超出的行视为无效
+MAX_LINE_BYTES = 1024 * 1024
+
+# 导出时去掉的字段：重新导入时会重新生成，或是旧格式中重复的营养信息
+_EXPORT_EXCLUDED = ("_id", "username", "v", "content_hash", "nutrition_info") + SEARCH_FIELDS
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def export_lines(db, username, batch_size=EXPORT_BATCH_SIZE):
+    """逐个生成某用户食谱的 JSONL 行（bytes，含换行符）"""
+    cursor = db['recipes'].find({"username": username}, {field: 0 for field in SEARCH_FIELDS}) \
+        .sort("_id", 1).batch_size(batch_size)
+    for doc in cursor:
+        recipe = recipe_from_document(doc)
+        for field in _EXPORT_EXCLUDED:
+            recipe.pop(field, None)
+        if not recipe.get("recipe_text"):
+            recipe.pop("recipe_text", None)
+        line = json_util.dumps(recipe, json_options=json_util.RELAXED_JSON_OPTIONS, ensure_ascii=False)
+        yield line.encode("utf-8") + b"\n"
+
+
+def export_recipes(db, username, compress=False, batch_size=EXPORT_BATCH_SIZE, chunk_size=64 * 1024):
+    """流式导出，生成约 chunk_size 大小的数据块；compress=True 时输出 gzip 格式"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    buffered = 0
+    for line in export_lines(db, username, batch_size):
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= chunk_size:
+            data = b"".join(buffer)
+            buffer, buffered = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = b"".join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def _open_lines(stream):
+    """按行读取上传的文件或标准输入，自动识别 gzip
+
+    超过 MAX_LINE_BYTES 的行只保留开头部分（长度仍大于 MAX_LINE_BYTES），其余内容读到
+    换行为止丢弃，整行作为一行返回，不会被拆成多条记录。
+    """
+    reader = stream if hasattr(stream, "peek") else io.BufferedReader(stream)
+    if reader.peek(2)[:2] == _GZIP_MAGIC:
+        reader = gzip.GzipFile(fileobj=reader)
+    while True:
+        line = reader.readline(MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        if len(line) > MAX_LINE_BYTES and not line.endswith(b"\n"):
+            while True:
+                rest = reader.readline(MAX_LINE_BYTES)
+                if not rest or rest.endswith(b"\n"):
+                    break
+        yield line
+
+
+def import_recipes(db, username, stream, batch_size=IMPORT_BATCH_SIZE):
+    """从 JSONL（可为 gzip）流批量导入食谱到 username 名下
+
+    与该用户已有食谱或文件中前面的食谱内容相同（内容哈希一致）的行跳过；
+    无法解析的行计入 errors。返回 {"read", "inserted", "duplicates", "errors"}。
+    """
+    recipes = db['recipes']
+    result = {"read": 0, "inserted": 0, "duplicates": 0, "errors": 0}
+    seen = set()
+    batch = []
+
+    def flush():
+        hashes = [doc["content_hash"] for doc in batch]
+        existing = {doc["content_hash"] for doc in recipes.find(
+            {"username": username, "content_hash": {"$in": hashes}}, {"content_hash": 1})}
+        docs = [doc for doc in batch if doc["content_hash"] not in existing]
+        result["duplicates"] += len(batch) - len(docs)
+        batch.clear()
+        if not docs:
+            return
+        try:
+            result["inserted"] += len(recipes.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            result["inserted"] += e.details.get("nInserted", 0)
+            result["errors"] += len(e.details.get("writeErrors", []))
+
+    for line in _open_lines(stream):
+        if not line.strip():
+            continue
+        result["read"] += 1
+        try:
+            if len(line) > MAX_LINE_BYTES:
+                raise ValueError("Line too long")
+            recipe = json_util.loads(line.decode("utf-8"))
+            if not isinstance(recipe, dict):
+                raise ValueError("Not a JSON object")
+            created = recipe.get("created")
+            doc = build_recipe_document(username, recipe, created if hasattr(created, "year") else None)
+        except Exception:
+            result["errors"] += 1
+            continue
+        if doc["content_hash"] in seen:
+            result["duplicates"] += 1
+            continue
+        seen.add(doc["content_hash"])
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    # 批量写入不逐条维护统计，结束后一次重算
+    if result["inserted"]:
+        rebuild_user_stats(db, username)
+        rebuild_recipe_counts(db, username)
+    return result
@@ -0,0 +1,324 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+
+# Jaccard 相似度达到该值（且其余生成选项完全一致）时复用已缓存的食谱
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+# 索引只指向食谱缓存中的条目，容量与 SQLiteCache 默认的 max_entries 保持一致
+DEFAULT_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 5000))
+DEFAULT_INDEX_PATH = os.getenv(
+    "SEMANTIC_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "semantic_index.sqlite3")
+)
+
+# MinHash 签名长度 = BANDS × ROWS；16×4 时 Jaccard≥0.8 的集合成为候选的概率约 99.98%
+LSH_BANDS = 16
+LSH_ROWS = 4
+# 单次查询最多核对的候选数，保证查询耗时有上限
+MAX_CANDIDATES = 64
+
+_SIGNATURE_SIZE = LSH_BANDS * LSH_ROWS
+_SIGNATURE_STRUCT = struct.Struct(f'<{_SIGNATURE_SIZE}I')
+
+# 同义词、中日文别名 → 规范英文名
+INGREDIENT_ALIASES = {
+    'chicken breast': 'chicken', 'chicken thigh': 'chicken', 'chicken leg': 'chicken',
+    '鸡肉': 'chicken', '鸡胸肉': 'chicken', '鸡腿': 'chicken', '鸡腿肉': 'chicken', '鸡': 'chicken', '鶏肉': 'chicken', 'とり肉': 'chicken',
+    '牛肉': 'beef', '牛': 'beef', '猪肉': 'pork', '豚肉': 'pork', '羊肉': 'lamb', 'mutton': 'lamb',
+    'prawn': 'shrimp', '虾': 'shrimp', '虾仁': 'shrimp', 'エビ': 'shrimp', 'えび': 'shrimp',
+    '三文鱼': 'salmon', '鲑鱼': 'salmon', 'サーモン': 'salmon', '鮭': 'salmon', '鱼': 'fish', '魚': 'fish',
+    '鸡蛋': 'egg', '蛋': 'egg', '卵': 'egg', 'たまご': 'egg', '玉子': 'egg',
+    '豆腐': 'tofu', 'bean curd': 'tofu',
+    '番茄': 'tomato', '西红柿': 'tomato', 'トマト': 'tomato',
+    '西兰花': 'broccoli', '西蓝花': 'broccoli', 'ブロッコリー': 'broccoli',
+    '大蒜': 'garlic', '蒜': 'garlic', '蒜头': 'garlic', 'にんにく': 'garlic',
+    '姜': 'ginger', '生姜': 'ginger', 'しょうが': 'ginger',
+    'scallion': 'green onion', 'spring onion': 'green onion', '葱': 'green onion', '小葱': 'green onion', 'ねぎ': 'green onion',
+    '洋葱': 'onion', '玉ねぎ': 'onion', 'たまねぎ': 'onion',
+    '土豆': 'potato', '马铃薯': 'potato', 'じゃがいも': 'potato',
+    '胡萝卜': 'carrot', 'にんじん': 'carrot', '人参': 'carrot',
+    '蘑菇': 'mushroom', 'きのこ': 'mushroom', '香菇': 'shiitake', 'しいたけ': 'shiitake',
+    'capsicum': 'bell pepper', '青椒': 'bell pepper', '彩椒': 'bell pepper', 'ピーマン': 'bell pepper',
+    'aubergine': 'eggplant', '茄子': 'eggplant', 'なす': 'eggplant',
+    'courgette': 'zucchini', '西葫芦': 'zucchini',
+    'cilantro': 'coriander', '香菜': 'coriander',
+    '菠菜': 'spinach', 'ほうれん草': 'spinach', '白菜': 'napa cabbage', '卷心菜': 'cabbage', 'キャベツ': 'cabbage',
+    'garbanzo': 'chickpea', 'garbanzo bean': 'chickpea', '鹰嘴豆': 'chickpea',
+    '米饭': 'rice', '大米': 'rice', '米': 'rice', 'ご飯': 'rice', 'ごはん': 'rice',
+    '面条': 'noodle', '面': 'noodle', '麺': 'noodle', 'spaghetti': 'pasta', '意面': 'pasta', 'パスタ': 'pasta',
+    '牛奶': 'milk', '牛乳': 'milk', '奶酪': 'cheese', 'チーズ': 'cheese', '黄油': 'butter', 'バター': 'butter',
+    '柠檬': 'lemon', 'レモン': 'lemon', '苹果': 'apple', 'りんご': 'apple', '香蕉': 'banana', 'バナナ': 'banana',
+    '牛油果': 'avocado', 'アボカド': 'avocado', '燕麦': 'oat', 'oatmeal': 'oat', 'オートミール': 'oat',
+}
+
+# 不影响菜品本身的修饰词
+_DESCRIPTORS = {
+    'fresh', 'chopped', 'minced', 'sliced', 'diced', 'large', 'small', 'medium', 'whole', 'boneless',
+    'skinless', 'organic', 'raw', 'cooked', 'frozen', 'ripe', 'clove', 'cloves', 'of', 'a', 'some',
+    'breast', 'breasts', 'fillet', 'fillets', 'g', 'kg', 'ml', 'lb', 'lbs', 'oz', 'cup', 'cups',
+    'tbsp', 'tsp', 'piece', 'pieces', 'floret', 'florets',
+}
+_PLURAL_EXCEPTIONS = {'leaves': 'leaf', 'asparagus': 'asparagus', 'hummus': 'hummus', 'couscous': 'couscous',
+                      'molasses': 'molasses', 'swiss': 'swiss', 'grass': 'grass'}
+_QUANTITY_RE = re.compile(r'[\d.,/½¼¾]+\s*(?:(?:g|kg|ml|l)\b|克|千克|毫升|个|颗|根|片|块|瓣|勺|杯|只|条|本|枚|個)?')
+_SPLIT_RE = re.compile(r'[,，、;；\n]+')
+
+
+def singularize(word):
+    """英文名词的简单单数化（tomatoes → tomato，berries → berry）"""
+    if word in _PLURAL_EXCEPTIONS:
+        return _PLURAL_EXCEPTIONS[word]
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(item):
+    """把单个食材规范为可比较的名称：去数量和修饰词、单数化、映射同义词与中日文别名"""
+    text = _QUANTITY_RE.sub(' ', str(item).casefold()).strip()
+    if text in INGREDIENT_ALIASES:
+        return INGREDIENT_ALIASES[text]
+    words = [singularize(word) for word in re.findall(r'\w+', text) if word not in _DESCRIPTORS]
+    text = ' '.join(words)
+    return INGREDIENT_ALIASES.get(text, text)
+
+
+def normalize_ingredients(ingredients):
+    """把食材字符串或列表规范为集合"""
+    items = _SPLIT_RE.split(ingredients) if isinstance(ingredients, str) else list(ingredients or [])
+    normalized = (normalize_ingredient(item) for item in items)
+    return frozenset(item for item in normalized if item)
+
+
+def make_scope(diet, goal, language, cuisine=None, cooking_time=None, difficulty=None, servings=None):
+    """必须完全一致才能复用的生成选项"""
+    options = (diet, goal, language, cuisine, cooking_time, difficulty, servings)
+    return '|'.join(str(value or '').strip().casefold() for value in options)
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def minhash(items):
+    """计算集合的 MinHash 签名
+
+    每个元素用 SHAKE-128 一次产出 _SIGNATURE_SIZE 个独立的 32 位哈希值，
+    签名为各位置上的最小值（逐位取最小在 C 层完成，避免 Python 中的大整数运算）。
+    """
+    rows = [_SIGNATURE_STRUCT.unpack(hashlib.shake_128(item.encode('utf-8')).digest(_SIGNATURE_STRUCT.size))
+            for item in items]
+    return list(map(min, zip(*rows)))
+
+
+def lsh_buckets(scope, signature):
+    """把签名按段折叠成桶键；scope 参与计算，不同选项的条目不会落入同一个桶
+
+    整数元组的 hash 不受 PYTHONHASHSEED 影响，桶键在不同进程间一致。
+    """
+    scope_hash = _hash64(scope)
+    return tuple(hash((scope_hash, band) + tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]))
+                 for band in range(LSH_BANDS))
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SemanticIndex:
+    """食材集合的 MinHash + LSH 近似索引
+
+    签名按 LSH_BANDS 段分桶，桶键包含 scope，因此只会在饮食/目标/语言等选项相同的
+    条目中查找；候选再用精确 Jaccard 相似度核对。条目按 LRU 淘汰，可选持久化到 SQLite，
+    启动时在后台线程中重建内存索引。被淘汰的条目同时从 SQLite 删除，
+    加载时按 added_at 把表裁剪到 max_entries。
+    """
+
+    def __init__(self, threshold=DEFAULT_SIMILARITY_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # cache_key -> (scope, items, bucket_keys)
+        self._buckets = {}              # bucket_key -> set(cache_key)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.loading = False
+        self._conn = None
+        if path:
+            self._open(path)
+
+    def _open(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_index ("
+            "cache_key TEXT PRIMARY KEY, scope TEXT NOT NULL, items TEXT NOT NULL, added_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.loading = True
+        threading.Thread(target=self._load, daemon=True, name="semantic-index-load").start()
+
+    def _load(self):
+        """从 SQLite 重建内存索引（较早的条目先插入，保持 LRU 顺序）"""
+        try:
+            with self._lock:
+                self._prune()
+                rows = self._conn.execute(
+                    "SELECT cache_key, scope, items FROM semantic_index ORDER BY added_at DESC LIMIT ?", (self.max_entries,)
+                ).fetchall()
+            for cache_key, scope, items in reversed(rows):
+                items = frozenset(json.loads(items))
+                bucket_keys = lsh_buckets(scope, minhash(items))
+                with self._lock:
+                    if cache_key not in self._entries:
+                        self._insert(cache_key, scope, items, bucket_keys)
+                        self._entries.move_to_end(cache_key, last=False)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Semantic index load error: {e}")
+        finally:
+            self.loading = False
+
+    def _prune(self):
+        """按 added_at 删除超出 max_entries 的持久化条目（包括以更大容量运行时留下的行）"""
+        self._conn.execute(
+            "DELETE FROM semantic_index WHERE cache_key IN ("
+            "SELECT cache_key FROM semantic_index ORDER BY added_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._conn.commit()
+
+    def _insert(self, cache_key, scope, items, bucket_keys):
+        """插入条目，返回因超出 max_entries 被淘汰的 cache_key 列表"""
+        self._remove(cache_key)
+        self._entries[cache_key] = (scope, items, bucket_keys)
+        for bucket_key in bucket_keys:
+            self._buckets.setdefault(bucket_key, set()).add(cache_key)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            evicted.append(oldest)
+        return evicted
+
+    def _remove(self, cache_key):
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return
+        for bucket_key in entry[2]:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(cache_key)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def add(self, cache_key, ingredients, diet, goal, language, *options):
+        """记录 cache_key 对应的食材和生成选项；options 依次为 cuisine、cooking_time、difficulty、servings"""
+        items = normalize_ingredients(ingredients)
+        if not items:
+            return
+        scope = make_scope(diet, goal, language, *options)
+        bucket_keys = lsh_buckets(scope, minhash(items))
+        with self._lock:
+            evicted = self._insert(cache_key, scope, items, bucket_keys)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO semantic_index (cache_key, scope, items, added_at) VALUES (?, ?, ?, ?)",
+                        (cache_key, scope, json.dumps(sorted(items), ensure_ascii=False), time.time())
+                    )
+                    self._conn.executemany("DELETE FROM semantic_index WHERE cache_key = ?",
+                                           [(key,) for key in evicted])
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Semantic index write error: {e}")
+
+    def lookup(self, ingredients, diet, goal, language, *options):
+        """返回最相似条目的 (cache_key, 相似度)；没有达到阈值时 cache_key 为 None"""
+        items = normalize_ingredients(ingredients)
+        if not items:
+            return None, 0.0
+        scope = make_scope(diet, goal, language, *options)
+        bucket_keys = lsh_buckets(scope, minhash(items))
+
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for bucket_key in bucket_keys:
+                candidates.update(self._buckets.get(bucket_key, ()))
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+
+            best_key, best_score = None, 0.0
+            for cache_key in candidates:
+                entry_scope, entry_items, _ = self._entries[cache_key]
+                if entry_scope != scope:
+                    continue
+                score = jaccard(items, entry_items)
+                if score > best_score:
+                    best_key, best_score = cache_key, score
+            if best_score < self.threshold:
+                return None, best_score
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            return best_key, best_score
+
+    def discard(self, cache_key):
+        """缓存中的食谱已失效时移除对应条目"""
+        with self._lock:
+            self._remove(cache_key)
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM semantic_index WHERE cache_key = ?", (cache_key,))
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Semantic index delete error: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "buckets": len(self._buckets),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "threshold": self.threshold,
+                "loading": self.loading,
+            }
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_semantic_index():
+    """获取进程共享的语义缓存索引（持久化到 SEMANTIC_CACHE_PATH）"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            try:
+                _default_index = SemanticIndex(path=DEFAULT_INDEX_PATH)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Semantic index unavailable, using memory only: {e}")
+                _default_index = SemanticIndex()
+        return _default_index
+
+
+def get_semantic_cache_stats():
+    return _default_index.stats() if _default_index is not None else {}
@@ -0,0 +1,423 @@
+import json
+import re
+
+# orjson 可选（pip install orjson），缺失时使用标准库 json
+try:
+    import orjson  # type: ignore
+    _fast_loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _fast_loads = json.loads
+    ORJSON_AVAILABLE = False
+
+# strict=False 允许字符串中出现未转义的换行等控制字符（模型常见输出）
+_decoder = json.JSONDecoder(strict=False)
+_LITERAL_RE = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?|true|false|null')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class StructuredOutputError(ValueError):
+    """模型输出无法解析或不符合预期结构"""
+
+
+def strip_fences(text):
+    """单次扫描去掉 ```json ... ``` 围栏；没有闭合围栏（输出被截断）时保留其后的全部内容"""
+    start = text.find('```')
+    if start == -1:
+        return text.strip()
+    body_start = start + 3
+    while body_start < len(text) and text[body_start].isalnum():
+        body_start += 1
+    end = text.find('```', body_start)
+    return (text[body_start:end] if end != -1 else text[body_start:]).strip()
+
+
+def extract_json_text(text):
+    """去掉围栏和 JSON 之前的说明文字，返回从第一个 { 或 [ 开始的内容"""
+    body = strip_fences(text or '')
+    positions = [pos for pos in (body.find('{'), body.find('[')) if pos != -1]
+    if not positions:
+        raise StructuredOutputError("No JSON object found in model output")
+    return body[min(positions):]
+
+
+def repair_json(text):
+    """修复常见的模型输出问题：截断（补全字符串和括号、丢弃不完整的键值）和多余的逗号
+
+    单次扫描；每层容器记录当前成员的起始位置，截断在键、冒号或不完整字面量处时回退到该位置。
+    """
+    out = []
+    stack = []          # 每层为 [括号, 当前成员在 out 中的起始位置]
+    state = 'value'     # key / in_key / colon / value / in_string / in_literal / done
+    escape = False
+    literal_start = None
+
+    for char in text:
+        if state in ('in_key', 'in_string'):
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                state = 'colon' if state == 'in_key' else 'done'
+            continue
+
+        if state == 'in_literal':
+            if char.isalnum() or char in '.+-':
+                out.append(char)
+                continue
+            state = 'done'
+
+        if char == '"' and state == 'done' and stack:
+            # 缺少分隔两个成员的逗号
+            out.append(',')
+            state = 'key' if stack[-1][0] == '{' else 'value'
+
+        if char.isspace():
+            out.append(char)
+        elif char == '"':
+            if state == 'key' and stack:
+                stack[-1][1] = len(out)
+                state = 'in_key'
+            else:
+                state = 'in_string'
+            out.append(char)
+        elif char in '{[':
+            if state == 'key':
+                # 对象里缺少键的容器无法修复，直接结束
+                break
+            stack.append([char, len(out)])
+            out.append(char)
+            state = 'key' if char == '{' else 'value'
+        elif char in '}]':
+            if not stack:
+                break
+            _strip_trailing_comma(out)
+            # 括号不匹配时按实际打开的容器闭合
+            out.append('}' if stack.pop()[0] == '{' else ']')
+            state = 'done'
+            if not stack:
+                return ''.join(out)
+        elif char == ',':
+            if state in ('key', 'value'):
+                # 连续的逗号
+                continue
+            out.append(char)
+            if stack:
+                state = 'key' if stack[-1][0] == '{' else 'value'
+                if stack[-1][0] == '[':
+                    stack[-1][1] = len(out)
+        elif char == ':':
+            out.append(char)
+            state = 'value'
+        elif state == 'value':
+            literal_start = len(out)
+            out.append(char)
+            state = 'in_literal'
+        else:
+            out.append(char)
+
+    # 到达文本末尾：补全被截断的部分
+    if state == 'in_literal' and not _LITERAL_RE.fullmatch(''.join(out[literal_start:]).strip()):
+        del out[literal_start:]
+        state = 'value'
+    if state == 'in_string':
+        if escape:
+            out.pop()
+        # 去掉被截断的 \uXXXX 转义
+        tail = ''.join(out[-6:])
+        unicode_escape = tail.rfind('\\u')
+        if unicode_escape != -1:
+            del out[len(out) - len(tail) + unicode_escape:]
+        out.append('"')
+    elif stack and (state in ('in_key', 'colon') or (state == 'value' and stack[-1][0] == '{')):
+        del out[stack[-1][1]:]
+    _strip_trailing_comma(out)
+
+    for bracket, _ in reversed(stack):
+        _strip_trailing_comma(out)
+        out.append('}' if bracket == '{' else ']')
+    return ''.join(out)
+
+
+def _strip_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+
+def loads(text, repair=True):
+    """解析模型输出中的 JSON
+
+    依次尝试：orjson（或 json）直接解析、忽略 JSON 之后的多余文本、截断修复。
+    """
+    body = extract_json_text(text)
+    try:
+        return _fast_loads(body)
+    except ValueError:
+        pass
+    try:
+        return _decoder.raw_decode(body)[0]
+    except ValueError:
+        if not repair:
+            raise StructuredOutputError("Model output is not valid JSON")
+    try:
+        return _decoder.decode(repair_json(body))
+    except ValueError as e:
+        raise StructuredOutputError(f"Model output is not valid JSON: {e}")
+
+
+def parse_partial(text):
+    """解析尚未输出完整的 JSON，返回目前为止可得的对象；还没有内容时返回 None"""
+    try:
+        return loads(text)
+    except StructuredOutputError:
+        return None
+
+
+def _clean_text(value):
+    return _WHITESPACE_RE.sub(' ', str(value)).strip()
+
+
+def _text_list(value, dedupe=False):
+    """把模型给出的列表字段规范为非空字符串列表；单个字符串按行拆分"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.splitlines()
+    elif not isinstance(value, (list, tuple)):
+        value = [value]
+    items = []
+    seen = set()
+    for item in value:
+        if isinstance(item, dict):
+            item = ' '.join(str(part) for part in item.values())
+        cleaned = _clean_text(item)
+        if not cleaned or (dedupe and cleaned in seen):
+            continue
+        seen.add(cleaned)
+        items.append(cleaned)
+    return items
+
+
+class Recipe:
+    """食谱生成结果；to_dict 与原有的食谱字典结构相同，未知字段原样保留"""
+
+    FIELDS = ('title', 'description', 'ingredients', 'instructions', 'nutrition',
+              'serves', 'prep_time', 'cook_time', 'difficulty')
+
+    def __init__(self, title, ingredients, instructions, description="", nutrition=None, serves=None,
+                 prep_time="", cook_time="", difficulty="", extra=None):
+        self.title = title
+        self.description = description
+        self.ingredients = ingredients
+        self.instructions = instructions
+        self.nutrition = nutrition or {}
+        self.serves = serves
+        self.prep_time = prep_time
+        self.cook_time = cook_time
+        self.difficulty = difficulty
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise StructuredOutputError("Recipe must be a JSON object")
+        title = _clean_text(data.get('title') or '')
+        ingredients = _text_list(data.get('ingredients'))
+        instructions = _text_list(data.get('instructions'))
+        if not title or not ingredients or not instructions:
+            raise StructuredOutputError("Recipe is missing title, ingredients or instructions")
+
+        nutrition = data.get('nutrition')
+        if not isinstance(nutrition, dict):
+            nutrition = {}
+        serves = data.get('serves')
+        try:
+            serves = int(serves) if serves is not None else None
+        except (TypeError, ValueError):
+            pass
+
+        return cls(
+            title=title,
+            description=_clean_text(data.get('description') or ''),
+            ingredients=ingredients,
+            instructions=instructions,
+            nutrition={str(key): _clean_text(value) for key, value in nutrition.items()},
+            serves=serves,
+            prep_time=_clean_text(data.get('prep_time') or ''),
+            cook_time=_clean_text(data.get('cook_time') or ''),
+            difficulty=_clean_text(data.get('difficulty') or ''),
+            extra={key: value for key, value in data.items() if key not in cls.FIELDS},
+        )
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) not in (None, '')}
+        data.update(self.extra)
+        return data
+
+
+class IngredientList:
+    """图片识别出的食材列表（去重、去空白）"""
+
+    def __init__(self, ingredients):
+        self.ingredients = ingredients
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, list):
+            return cls(_text_list(data, dedupe=True))
+        if not isinstance(data, dict):
+            raise StructuredOutputError("Ingredients must be a JSON object or array")
+        return cls(_text_list(data.get('ingredients'), dedupe=True))
+
+
+class CuisineInfo:
+    """菜品分析结果（菜系、餐厅类型、搜索关键词等）"""
+
+    LIST_FIELDS = ('restaurant_types', 'search_keywords', 'similar_dishes', 'recommended_restaurant_names')
+    CHARACTERISTICS = ('spicy_level', 'price_range', 'cooking_method')
+
+    def __init__(self, cuisine_type, restaurant_types, search_keywords, dish_characteristics,
+                 similar_dishes, recommended_restaurant_names):
+        self.cuisine_type = cuisine_type
+        self.restaurant_types = restaurant_types
+        self.search_keywords = search_keywords
+        self.dish_characteristics = dish_characteristics
+        self.similar_dishes = similar_dishes
+        self.recommended_restaurant_names = recommended_restaurant_names
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise StructuredOutputError("Cuisine info must be a JSON object")
+        cuisine_type = _clean_text(data.get('cuisine_type') or '')
+        if not cuisine_type:
+            raise StructuredOutputError("Cuisine info is missing cuisine_type")
+        characteristics = data.get('dish_characteristics')
+        if not isinstance(characteristics, dict):
+            characteristics = {}
+        lists = {field: _text_list(data.get(field), dedupe=True) for field in cls.LIST_FIELDS}
+        return cls(
+            cuisine_type=cuisine_type,
+            dish_characteristics={key: _clean_text(characteristics.get(key, '')) for key in cls.CHARACTERISTICS},
+            **lists
+        )
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.LIST_FIELDS}
+        data['cuisine_type'] = self.cuisine_type
+        data['dish_characteristics'] = self.dish_characteristics
+        return data
+
+
+def parse_recipe(text):
+    """解析食谱生成结果，返回 Recipe"""
+    return Recipe.from_dict(loads(text))
+
+
+def parse_ingredients(text):
+    """解析图片识别结果，返回去重后的食材名列表
+
+    JSON 无法修复时退回提取引号内的文本。
+    """
+    try:
+        return IngredientList.from_dict(loads(text)).ingredients
+    except StructuredOutputError:
+        matches = re.findall(r'"([^"]+)"', text or '')
+        return _text_list([m for m in matches if m.lower() not in ('ingredients', 'ingredient') and len(m) > 1], dedupe=True)
+
+
+def parse_cuisine_info(text):
+    """解析菜品分析结果，返回 CuisineInfo"""
+    return CuisineInfo.from_dict(loads(text))
+
+
+class IncrementalRecipeParser:
+    """增量解析流式输出的食谱 JSON
+
+    每次 feed 一段文本，返回在这段文本中闭合的字段事件：
+    ('title', str)、('description', str)、('ingredient', str)、('instruction', str)。
+    前置的 ```json 围栏和其他非 JSON 文本会被忽略。
+    """
+
+    STRING_FIELDS = ('title', 'description')
+    LIST_FIELDS = {'ingredients': 'ingredient', 'instructions': 'instruction'}
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer = []
+        self._key = None
+        self._expect_key = True
+        self._list_key = None
+
+    def feed(self, text):
+        events = []
+        for char in text:
+            if self.finished:
+                break
+            if not self.started:
+                if char == '{':
+                    self.started = True
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._buffer.append(char)
+                    self._escape = False
+                elif char == '\\':
+                    self._buffer.append(char)
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    event = self._close_string()
+                    if event:
+                        events.append(event)
+                else:
+                    self._buffer.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._buffer = []
+            elif char in '{[':
+                self._depth += 1
+                if char == '[' and self._depth == 2 and self._key in self.LIST_FIELDS:
+                    self._list_key = self._key
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth <= 1:
+                    self._list_key = None
+                if self._depth == 0:
+                    self.finished = True
+            elif self._depth == 1:
+                if char == ':':
+                    self._expect_key = False
+                elif char == ',':
+                    self._expect_key = True
+        return events
+
+    def _close_string(self):
+        """字符串闭合时根据所处位置生成事件"""
+        raw = ''.join(self._buffer)
+        try:
+            value = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            value = raw
+
+        if self._depth == 1:
+            if self._expect_key:
+                self._key = value
+            elif self._key in self.STRING_FIELDS:
+                return (self._key, _clean_text(value))
+        elif self._depth == 2 and self._list_key:
+            return (self.LIST_FIELDS[self._list_key], _clean_text(value))
+        return None
@@ -0,0 +1,364 @@
+"""本地 OpenAI 兼容 stub 服务器，用于离线压测和延迟测试
+
+实现 POST /v1/chat/completions（流式 / 非流式，文本和 image_url 内容）以及高德
+GET /v3/place/around，按请求内容返回食谱、食材识别或菜系分析 JSON，延迟、错误率
+和截断比例均可配置：
+
+    python stub_llm_server.py --port 8001 --latency-median 1.5 --latency-sigma 0.5 --error-rate 0.02
+
+应用指向 stub 的配置：
+    LLM_PROVIDERS=[{"name": "local", "base_url": "http://127.0.0.1:8001/v1", "model": "stub"}]
+    SILICONFLOW_API_URL=http://127.0.0.1:8001/v1/chat/completions
+    AMAP_API_URL=http://127.0.0.1:8001
+（SILICONFLOW_API_KEY / AMAP_API_KEY 需设置为任意非空值）
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from recipe_prompt import estimate_tokens
+
+DEFAULT_PORT = 8001
+ERROR_STATUSES = (429, 500, 503)
+
+_TEXT = {
+    "zh": {"title": "{main}家常做法", "description": "以{items}为主料的快手菜，营养均衡",
+           "step": ["准备{item}，洗净切好。", "热锅加少许油，放入{item}翻炒。", "加入调味料，中火烹制{minutes}分钟。",
+                    "放入剩余食材翻炒均匀。", "尝味调整咸淡。", "出锅装盘即可。"],
+           "difficulty": "简单", "amount": "{n}克"},
+    "ja": {"title": "{main}の家庭風炒め", "description": "{items}を使った栄養バランスの良い一品",
+           "step": ["{item}を洗って切る。", "フライパンに油をひき、{item}を炒める。", "調味料を加え、中火で{minutes}分煮る。",
+                    "残りの材料を加えて混ぜる。", "味を見て調える。", "器に盛り付ける。"],
+           "difficulty": "簡単", "amount": "{n}g"},
+    "en": {"title": "Home-style {main} Skillet", "description": "A quick balanced dish built around {items}",
+           "step": ["Wash and cut the {item}.", "Heat oil in a pan and sear the {item}.", "Season and cook over medium heat for {minutes} minutes.",
+                    "Add the remaining ingredients and toss.", "Taste and adjust seasoning.", "Plate and serve."],
+           "difficulty": "Easy", "amount": "{n} g"},
+}
+_LANGUAGE_MARKERS = (("Simplified Chinese", "zh"), ("Japanese", "ja"), ("English", "en"))
+_VISION_INGREDIENTS = {
+    "zh": ["番茄", "鸡蛋", "洋葱", "青椒", "土豆", "胡萝卜", "西兰花", "豆腐", "鸡胸肉", "香菇"],
+    "ja": ["トマト", "卵", "玉ねぎ", "ピーマン", "じゃがいも", "にんじん", "ブロッコリー", "豆腐", "鶏むね肉", "しいたけ"],
+    "en": ["tomato", "egg", "onion", "bell pepper", "potato", "carrot", "broccoli", "tofu", "chicken breast", "shiitake"],
+}
+_CUISINES = [
+    ("川菜", ["川菜馆", "火锅店", "麻辣烫"], ["麻婆豆腐", "水煮鱼"]),
+    ("日料", ["日本料理", "拉面馆", "寿司店"], ["寿司", "拉面"]),
+    ("西餐", ["西餐厅", "牛排馆", "披萨店"], ["意面", "牛排"]),
+    ("粤菜", ["粤菜馆", "茶餐厅", "早茶"], ["白切鸡", "烧鹅"]),
+]
+
+
+class StubConfig:
+    """延迟、错误和截断设置
+
+    非流式请求的总耗时服从对数正态分布（中位数 latency_median，形状参数 latency_sigma）；
+    流式请求先等待首 token 时间（同样为对数正态），其余时间平均分配到各个数据块。
+    """
+
+    def __init__(self, latency_median=1.0, latency_sigma=0.4, ttft_median=0.3, ttft_sigma=0.3,
+                 error_rate=0.0, truncate_rate=0.0, hang_rate=0.0, hang_seconds=60.0, chunk_chars=24, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.chunk_chars = chunk_chars
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, median, sigma):
+        if median <= 0:
+            return 0.0
+        with self._lock:
+            return median * math.exp(self.random.gauss(0, sigma))
+
+    def roll(self, rate):
+        with self._lock:
+            return self.random.random() < rate
+
+    def choice(self, values):
+        with self._lock:
+            return self.random.choice(values)
+
+
+class StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def _message_text(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return content or ""
+
+
+def _has_image(messages):
+    return any(isinstance(message.get("content"), list)
+               and any(part.get("type") == "image_url" for part in message["content"])
+               for message in messages)
+
+
+def _detect_language(text):
+    for marker, language in _LANGUAGE_MARKERS:
+        if marker in text:
+            return language
+    match = re.search(r"Respond in (\w+) language", text)
+    if match:
+        return {"zh": "zh", "ja": "ja"}.get(match.group(1), "en")
+    if re.search(r"[぀-ヿ]", text):
+        return "ja"
+    if re.search(r"[一-鿿]", text):
+        return "zh"
+    return "en"
+
+
+def build_recipe(user_text, language, rng):
+    """按用户消息中的 Ingredients / Servings / Steps 构造食谱"""
+    text = _TEXT[language]
+    match = re.search(r"Ingredients:\s*(.+)", user_text)
+    items = [item.strip() for item in re.split(r"[,，、;；]+", match.group(1)) if item.strip()] if match else ["tofu"]
+    servings_match = re.search(r"Servings:\s*(\d+)", user_text)
+    steps_match = re.search(r"Steps: about (\d+)", user_text)
+    steps = int(steps_match.group(1)) if steps_match else 6
+    instructions = [text["step"][i % len(text["step"])].format(item=items[i % len(items)], minutes=rng.randint(3, 15))
+                    for i in range(steps)]
+    return {
+        "title": text["title"].format(main=items[0]),
+        "description": text["description"].format(items=", ".join(items)),
+        "ingredients": [f"{item} {text['amount'].format(n=rng.randint(1, 30) * 10)}" for item in items],
+        "instructions": instructions,
+        "nutrition": {
+            "Calories": f"{rng.randint(250, 650)} kcal", "Protein": f"{rng.randint(10, 45)} g",
+            "Carbohydrates": f"{rng.randint(10, 70)} g", "Fat": f"{rng.randint(5, 30)} g",
+            "Fiber": f"{rng.randint(2, 12)} g", "Sugar": f"{rng.randint(2, 15)} g",
+            "Sodium": f"{rng.randint(200, 900)} mg", "Vitamin A": f"{rng.randint(100, 3000)} IU",
+            "Calcium": f"{rng.randint(30, 300)} mg", "Iron": f"{rng.randint(1, 8)} mg",
+        },
+        "serves": int(servings_match.group(1)) if servings_match else 2,
+        "prep_time": f"{rng.randint(5, 20)} min",
+        "cook_time": f"{rng.randint(10, 40)} min",
+        "difficulty": text["difficulty"],
+    }
+
+
+def build_content(messages, rng):
+    """按请求类型生成回复内容：图片 → 食材列表，菜品分析 → 菜系信息，其余 → 食谱"""
+    prompt = "\n".join(_message_text(message) for message in messages)
+    language = _detect_language(prompt)
+    if _has_image(messages):
+        body = {"ingredients": rng.sample(_VISION_INGREDIENTS[language], rng.randint(2, 6))}
+    elif "cuisine_type" in prompt:
+        cuisine, restaurant_types, dishes = rng.choice(_CUISINES)
+        body = {
+            "cuisine_type": cuisine,
+            "restaurant_types": restaurant_types,
+            "search_keywords": dishes + [cuisine],
+            "dish_characteristics": {"spicy_level": str(rng.randint(0, 5)), "price_range": rng.choice(["低", "中", "高"]),
+                                     "cooking_method": rng.choice(["炒", "煮", "烤", "蒸"])},
+            "similar_dishes": dishes,
+            "recommended_restaurant_names": [f"{cuisine}{suffix}" for suffix in ("坊", "馆", "小厨")],
+        }
+    else:
+        user_text = next((_message_text(message) for message in reversed(messages) if message.get("role") == "user"), "")
+        body = build_recipe(user_text, language, rng)
+    return "```json\n" + json.dumps(body, ensure_ascii=False, indent=2) + "\n```"
+
+
+def _truncate(content, max_tokens, force):
+    """按 max_tokens 截断；force 时随机截断在中间位置，模拟输出被截断"""
+    if force:
+        return content[:len(content) // 2], "length"
+    if max_tokens and estimate_tokens(content) > max_tokens:
+        ratio = max_tokens / estimate_tokens(content)
+        return content[:int(len(content) * ratio)], "length"
+    return content, "stop"
+
+
+def _place_around(keyword, location, rng):
+    lng, lat = (float(value) for value in (location or "116.397,39.908").split(","))
+    pois = []
+    for index in range(rng.randint(5, 20)):
+        pois.append({
+            "id": f"STUB{index:04d}",
+            "name": f"{keyword}{rng.choice(['小馆', '食府', '餐厅', '坊'])}{index + 1}",
+            "address": f"Stub Road {rng.randint(1, 300)}",
+            "location": f"{lng + rng.uniform(-0.02, 0.02):.6f},{lat + rng.uniform(-0.02, 0.02):.6f}",
+            "tel": "",
+            "distance": str(rng.randint(50, 3000)),
+            "biz_ext": {"rating": f"{rng.uniform(3.0, 5.0):.1f}", "cost": str(rng.randint(20, 300))},
+        })
+    return {"status": "1", "info": "OK", "infocode": "10000", "count": str(len(pois)), "pois": pois}
+
+
+def make_handler(config, stats):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/v3/place/around":
+                stats.incr("place_around")
+                time.sleep(config.sample(config.latency_median / 10, config.latency_sigma))
+                query = parse_qs(url.query)
+                self._send_json(200, _place_around(query.get("keywords", ["餐厅"])[0], query.get("location", [None])[0], config.random))
+            elif url.path == "/stats":
+                self._send_json(200, stats.snapshot())
+            elif url.path.rstrip("/") in ("/v1/models", "/models"):
+                self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                return
+            stats.incr("requests")
+
+            if config.roll(config.hang_rate):
+                # 模拟上游无响应，触发客户端超时
+                stats.incr("hangs")
+                time.sleep(config.hang_seconds)
+            if config.roll(config.error_rate):
+                status = config.choice(ERROR_STATUSES)
+                stats.incr(f"error_{status}")
+                time.sleep(config.sample(config.ttft_median, config.ttft_sigma))
+                self._send_json(status, {"error": {"message": f"stub error {status}", "type": "stub_error"}})
+                return
+
+            messages = request.get("messages", [])
+            content, finish_reason = _truncate(build_content(messages, config.random), request.get("max_tokens"),
+                                               config.roll(config.truncate_rate))
+            if finish_reason == "length":
+                stats.incr("truncated")
+            usage = {
+                "prompt_tokens": sum(estimate_tokens(_message_text(message)) for message in messages),
+                "completion_tokens": estimate_tokens(content),
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            model = request.get("model", "stub")
+
+            if request.get("stream"):
+                self._stream(completion_id, model, content, finish_reason, usage,
+                             (request.get("stream_options") or {}).get("include_usage"))
+                return
+
+            time.sleep(config.sample(config.latency_median, config.latency_sigma))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        def _stream(self, completion_id, model, content, finish_reason, usage, include_usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            ttft = config.sample(config.ttft_median, config.ttft_sigma)
+            total = max(ttft, config.sample(config.latency_median, config.latency_sigma))
+            chunks = [content[i:i + config.chunk_chars] for i in range(0, len(content), config.chunk_chars)] or [""]
+            interval = (total - ttft) / len(chunks)
+
+            def send(choices, extra=None):
+                body = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": choices, **(extra or {})}
+                self.wfile.write(f"data: {json.dumps(body, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                time.sleep(ttft)
+                send([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+                for chunk in chunks:
+                    send([{"index": 0, "delta": {"content": chunk}, "finish_reason": None}])
+                    time.sleep(interval)
+                send([{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+                if include_usage:
+                    send([], {"usage": usage})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端提前断开
+                stats.incr("client_disconnects")
+
+    return StubHandler
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, config=None):
+    """创建 stub 服务器（调用方负责 serve_forever / shutdown），返回 (server, stats)"""
+    stats = StubStats()
+    server = ThreadingHTTPServer((host, port), make_handler(config or StubConfig(), stats))
+    server.daemon_threads = True
+    return server, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-median", type=float, default=1.0, help="非流式总耗时 / 流式总耗时的中位数（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="对数正态分布的形状参数，越大长尾越重")
+    parser.add_argument("--ttft-median", type=float, default=0.3, help="流式首 token 时间中位数（秒）")
+    parser.add_argument("--ttft-sigma", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 429/500/503 的比例")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="输出被截断（finish_reason=length）的比例")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="长时间不响应的比例")
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_median, args.latency_sigma, args.ttft_median, args.ttft_sigma,
+                        args.error_rate, args.truncate_rate, args.hang_rate, args.hang_seconds, seed=args.seed)
+    server, _ = serve(args.host, args.port, config)
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """mongomock 内存数据库（未安装 mongomock 时跳过依赖数据库的测试）"""
+    mongomock = pytest.importorskip("mongomock")
+    import mongodb_manager
+    client = mongomock.MongoClient()
+    # 每个测试使用新的客户端，迁移记录不能沿用上一个测试的进程级缓存
+    monkeypatch.setattr(mongodb_manager, "_migrated", set())
+    monkeypatch.setattr(mongodb_manager, "get_mongo_client", lambda connection_string: client)
+    return client[mongodb_manager.DATABASE_NAME]
+
+
+@pytest.fixture
+def manager(db):
+    import mongodb_manager
+    return mongodb_manager.MongoDBManager("mongodb://test")
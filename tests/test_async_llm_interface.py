@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("openai")
+
+from async_llm_interface import AsyncLLMInterface, BackgroundLoop, _cancel_on_disconnect
+from llm_interface import MemoryCache
+
+
+def _interface(monkeypatch, delay=0.0, fail=False):
+    llm = AsyncLLMInterface("test-key", cache=MemoryCache(), single_flight=False, semantic_cache=False)
+    calls = []
+
+    async def generate(ingredients, *args):
+        calls.append(ingredients)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("upstream down")
+        return {"title": f"Recipe with {ingredients}", "ingredients": [ingredients], "instructions": ["Cook."]}
+
+    monkeypatch.setattr(llm, "_generate_recipe", generate)
+    return llm, calls
+
+
+def test_generate_uses_cache_on_second_call(monkeypatch):
+    llm, calls = _interface(monkeypatch)
+
+    async def scenario():
+        first = await llm.generate_recipe_and_nutrition("tofu", "", "", "en")
+        second = await llm.generate_recipe_and_nutrition("Tofu", "", "", "en")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second and len(calls) == 1
+
+
+def test_failure_returns_template_recipe(monkeypatch):
+    llm, _ = _interface(monkeypatch, fail=True)
+    recipe = asyncio.run(llm.generate_recipe_and_nutrition("tofu, rice", "", "", "en"))
+    assert recipe["fallback"] is True
+    assert "tofu" in recipe["ingredients"]
+
+
+def test_generate_batch_yields_every_item(monkeypatch):
+    llm, calls = _interface(monkeypatch, delay=0.01)
+
+    async def scenario():
+        specs = [{"ingredients": name, "diet": "", "goal": ""} for name in ("a", "b", "c", "d")]
+        return [item async for item in llm.generate_batch(specs, max_parallel=2)]
+
+    results = asyncio.run(scenario())
+    assert sorted(index for index, _, _ in results) == [0, 1, 2, 3]
+    assert all(error is None for _, _, error in results)
+    assert sorted(calls) == ["a", "b", "c", "d"]
+
+
+def test_disconnect_cancels_generation():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        with pytest.raises(asyncio.CancelledError):
+            await _cancel_on_disconnect(slow(), lambda: True, poll_interval=0.01)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == [True]
+
+
+def test_background_loop_runs_and_iterates():
+    loop = BackgroundLoop()
+
+    async def double(value):
+        await asyncio.sleep(0)
+        return value * 2
+
+    async def numbers():
+        for value in range(3):
+            yield value
+
+    try:
+        assert loop.run(double(21), timeout=5) == 42
+        assert list(loop.iterate(numbers())) == [0, 1, 2]
+        # iterate 结束时异步关闭生成器，等它执行完再停止循环
+        loop.run(asyncio.sleep(0.01), timeout=5)
+    finally:
+        loop.shutdown()
+
+
+def test_cache_io_runs_off_the_event_loop(monkeypatch):
+    llm, _ = _interface(monkeypatch)
+    threads = {}
+    cache = llm.cache
+
+    class RecordingCache:
+        def get(self, key):
+            threads.setdefault("get", threading.get_ident())
+            return cache.get(key)
+
+        def set(self, key, value, ttl=None):
+            threads.setdefault("set", threading.get_ident())
+            cache.set(key, value, ttl)
+
+    llm.cache = RecordingCache()
+
+    async def scenario():
+        await llm.generate_recipe_and_nutrition("tofu", "", "", "en")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert set(threads) == {"get", "set"}
+    assert loop_thread not in threads.values()
+
+
+def test_shares_setup_with_sync_interface():
+    llm = AsyncLLMInterface("test-key", cache=False, single_flight=False, max_concurrency=7)
+    assert llm.cache is None and llm.semantic_cache is None and llm.single_flight is None
+    assert llm.client is llm.router.primary.async_client
+    assert llm.max_concurrency == 7
+    assert llm.prompt_builder is not None and llm.retry_policy is not None
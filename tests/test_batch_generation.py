@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+
+from llm_interface import LLMInterface, RateLimiter
+
+
+def _interface(monkeypatch, fail_on=()):
+    llm = LLMInterface("test-key", cache=False, single_flight=False, fallback=False)
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def generate(ingredients, *args):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        if ingredients in fail_on:
+            raise RuntimeError(f"failed {ingredients}")
+        return {"title": ingredients}
+
+    monkeypatch.setattr(llm, "_generate_recipe", generate)
+    return llm, active
+
+
+def test_batch_yields_results_and_errors_by_index(monkeypatch):
+    llm, active = _interface(monkeypatch, fail_on={"b"})
+    specs = [{"ingredients": name, "diet": "", "goal": ""} for name in "abcdef"]
+    results = {index: (recipe, error) for index, recipe, error in llm.generate_batch(specs, max_parallel=2)}
+
+    assert sorted(results) == list(range(6))
+    assert results[0][0] == {"title": "a"} and results[0][1] is None
+    assert results[1][0] is None and "failed b" in str(results[1][1])
+    assert active["peak"] <= 2
+
+
+def test_batch_rate_limit_spaces_requests(monkeypatch):
+    llm, _ = _interface(monkeypatch)
+    specs = [{"ingredients": str(index), "diet": "", "goal": ""} for index in range(4)]
+    started = time.monotonic()
+    list(llm.generate_batch(specs, max_parallel=4, rate_limit=20))
+    # 令牌桶容量为 20，4 个请求不需要等待；速率 2/s 时第 3、4 个请求要等待
+    assert time.monotonic() - started < 0.5
+
+    started = time.monotonic()
+    list(llm.generate_batch(specs, max_parallel=4, rate_limit=2))
+    assert time.monotonic() - started >= 0.9
+
+
+def test_rate_limiter_reserve():
+    limiter = RateLimiter(rate=10, burst=2)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    wait = limiter.reserve()
+    assert 0.05 < wait <= 0.1
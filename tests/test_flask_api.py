@@ -0,0 +1,237 @@
+import importlib.util
+import io
+import json
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("openai")
+mongomock = pytest.importorskip("mongomock")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def app_module():
+    import mongodb_manager
+    client = mongomock.MongoClient()
+    with pytest.MonkeyPatch.context() as patch:
+        # 导入时 initialize_services 会连接数据库，改用内存数据库
+        patch.setattr(mongodb_manager, "get_mongo_client", lambda connection_string: client)
+        spec = importlib.util.spec_from_file_location(
+            "integrated_app", os.path.join(ROOT, "flask_version", "integrated_app.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    module.app.config["TESTING"] = True
+    return module
+
+
+@pytest.fixture
+def client(app_module):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+        session["username"] = "alice"
+    return client
+
+
+class FakeBatchLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_batch(self, specs, max_parallel=4, rate_limit=None):
+        self.calls.append((len(specs), max_parallel, rate_limit))
+        for index, spec in enumerate(specs):
+            yield index, {"title": spec["ingredients"]}, None
+
+
+@pytest.mark.parametrize("payload", [
+    {"max_parallel": "many"},
+    {"max_parallel": [3]},
+    {"rate_limit": "fast"},
+    {"rate_limit": 0},
+    {"rate_limit": -2},
+])
+def test_meal_plan_rejects_bad_parameters(app_module, client, monkeypatch, payload):
+    llm = FakeBatchLLM()
+    monkeypatch.setitem(app_module.services, "llm", llm)
+    response = client.post("/api/generate-meal-plan", json={"specs": [{"ingredients": "tofu"}], **payload})
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+    assert llm.calls == []
+
+
+def test_meal_plan_clamps_parallelism(app_module, client, monkeypatch):
+    llm = FakeBatchLLM()
+    monkeypatch.setitem(app_module.services, "llm", llm)
+    specs = [{"ingredients": "tofu"}, {"ingredients": "rice"}]
+    response = client.post("/api/generate-meal-plan", json={"specs": specs, "max_parallel": 0, "rate_limit": "2.5"})
+    body = response.get_json()
+    assert body["success"] is True and [item["recipe"]["title"] for item in body["results"]] == ["tofu", "rice"]
+    assert llm.calls == [(2, 1, 2.5)]
+
+    client.post("/api/generate-meal-plan", json={"specs": specs, "max_parallel": 500})
+    assert llm.calls[-1] == (2, app_module.MEAL_PLAN_MAX_ITEMS, None)
+
+
+class FakeRecipeLLM:
+    def __init__(self, recipe):
+        self.recipe = recipe
+
+    async def generate_recipe_and_nutrition(self, **params):
+        return dict(self.recipe)
+
+    async def stream_recipe_and_nutrition(self, **params):
+        yield "title", self.recipe["title"]
+        yield "recipe", dict(self.recipe)
+
+
+def _saved_count(app_module):
+    return app_module.services["db"].recipes_collection.count_documents({"username": "alice"})
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_fallback_recipe_is_flagged_and_not_saved(app_module, client, monkeypatch, stream):
+    from llm_interface import build_template_recipe
+    monkeypatch.setitem(app_module.services, "llm", FakeRecipeLLM(build_template_recipe("tofu, rice", "en")))
+    before = _saved_count(app_module)
+
+    response = client.post("/api/generate-recipe", json={"input": "tofu, rice", "stream": stream})
+    if stream:
+        done = response.get_data(as_text=True).split("event: done\ndata: ")[1]
+        body = json.loads(done.strip())
+    else:
+        body = response.get_json()
+    assert body["success"] is True and body["fallback"] is True and body["message"]
+    assert _saved_count(app_module) == before
+
+
+def test_generated_recipe_is_saved(app_module, client, monkeypatch):
+    recipe = {"title": "Tofu bowl", "ingredients": ["tofu"], "instructions": ["Cook."]}
+    monkeypatch.setitem(app_module.services, "llm", FakeRecipeLLM(recipe))
+    before = _saved_count(app_module)
+    body = client.post("/api/generate-recipe", json={"input": "tofu"}).get_json()
+    assert body["success"] is True and body["fallback"] is False
+    assert _saved_count(app_module) == before + 1
+
+
+class RecordingDB:
+    def __init__(self):
+        self.calls = []
+
+    def list_recipe_page(self, username, limit, cursor, diet=None, sort="newest"):
+        self.calls.append(("page", limit))
+        return [], None
+
+    def search_recipes(self, username, query, projection=None, limit=50, skip=0, diet=None):
+        self.calls.append(("search", limit, skip))
+        return []
+
+    def list_trash(self, username, limit):
+        self.calls.append(("trash", limit))
+        return []
+
+    def count_trash(self, username):
+        return 0
+
+
+@pytest.mark.parametrize("url", [
+    "/api/my-recipes?limit=ten",
+    "/api/recipes/search?q=tofu&limit=1.5",
+    "/api/recipes/search?q=tofu&skip=abc",
+    "/api/recipes/trash?limit=x",
+])
+def test_list_routes_reject_non_integer_paging(app_module, client, monkeypatch, url):
+    db = RecordingDB()
+    monkeypatch.setitem(app_module.services, "db", db)
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+    assert db.calls == []
+
+
+def test_list_routes_clamp_paging(app_module, client, monkeypatch):
+    db = RecordingDB()
+    monkeypatch.setitem(app_module.services, "db", db)
+    client.get("/api/my-recipes?limit=100000")
+    client.get("/api/recipes/search?q=tofu&limit=0&skip=-5")
+    client.get("/api/recipes/search?q=tofu&skip=99999999999999999999")
+    client.get("/api/recipes/trash?limit=-1")
+    assert db.calls == [
+        ("page", 100),
+        ("search", 2, 0),
+        ("search", 21, app_module.SEARCH_MAX_SKIP),
+        ("trash", 1),
+    ]
+
+
+def test_search_reports_more_results_at_max_page_size(app_module, client, monkeypatch, manager):
+    for n in range(150):
+        manager.save_recipe("alice", {"title": f"Tofu bowl {n}", "ingredients": ["tofu"]})
+    monkeypatch.setitem(app_module.services, "db", manager)
+
+    body = client.get(f"/api/recipes/search?q=tofu&limit={app_module.MAX_PAGE_SIZE}").get_json()
+    assert len(body["recipes"]) == app_module.MAX_PAGE_SIZE
+    assert body["has_more"] is True and body["next_skip"] == app_module.MAX_PAGE_SIZE
+
+    body = client.get(f"/api/recipes/search?q=tofu&limit=100&skip={body['next_skip']}").get_json()
+    assert len(body["recipes"]) == 50
+    assert body["has_more"] is False and body["next_skip"] is None
+
+
+def test_import_rejects_non_integer_batch_size(app_module, client):
+    response = client.post("/api/recipes/import", data={"batch_size": "lots", "file": (io.BytesIO(b"{}\n"), "r.jsonl")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+def test_export_route_streams_gzip(app_module, client, monkeypatch, manager):
+    import gzip
+
+    for n in range(3):
+        manager.save_recipe("alice", {"title": f"Soup {n}"})
+    monkeypatch.setitem(app_module.services, "db", manager)
+
+    response = client.get("/api/recipes/export?format=gz")
+    assert response.is_streamed
+    assert ".jsonl.gz" in response.headers["Content-Disposition"]
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert sorted(json.loads(line)["title"] for line in lines) == ["Soup 0", "Soup 1", "Soup 2"]
+
+
+class DeletingDB:
+    def __init__(self):
+        self.calls = []
+
+    def delete_recipes(self, username, ids, soft=False):
+        self.calls.append(("delete", ids, soft))
+        return len(ids)
+
+    def clear_recipes(self, username, soft=False):
+        self.calls.append(("clear", soft))
+        return 0
+
+
+@pytest.mark.parametrize("payload", [
+    {"ids": ["a"], "soft": "false"},
+    {"ids": ["a"], "soft": 0},
+    {"ids": ["a"], "soft": "true"},
+    {"all": "false"},
+    {"all": 1},
+])
+def test_delete_rejects_non_boolean_flags(app_module, client, monkeypatch, payload):
+    db = DeletingDB()
+    monkeypatch.setitem(app_module.services, "db", db)
+    response = client.post("/api/recipes/delete", json=payload)
+    assert response.status_code == 400
+    assert db.calls == []
+
+
+def test_delete_soft_defaults_to_true(app_module, client, monkeypatch):
+    db = DeletingDB()
+    monkeypatch.setitem(app_module.services, "db", db)
+    assert client.post("/api/recipes/delete", json={"ids": ["a"]}).get_json()["soft"] is True
+    assert client.post("/api/recipes/delete", json={"ids": ["b"], "soft": False}).get_json()["soft"] is False
+    client.post("/api/recipes/delete", json={"all": True})
+    assert db.calls == [("delete", ["a"], True), ("delete", ["b"], False), ("clear", True)]
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_resilience import Hedger, LatencyTracker
+
+
+class Response:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _slow_then_fast(first_delay, second_delay):
+    """第一次调用耗时 first_delay，之后的调用耗时 second_delay"""
+    calls = []
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            index = len(calls)
+            response = Response(f"call{index}")
+            calls.append(response)
+        time.sleep(first_delay if index == 0 else second_delay)
+        return response
+
+    return fn, calls
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = Hedger(delay=0.5, budget=1.0)
+    fn, calls = _slow_then_fast(0.0, 0.0)
+    assert hedger.run(fn).name == "call0"
+    assert len(calls) == 1 and hedger.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged_and_loser_closed():
+    hedger = Hedger(delay=0.05, budget=1.0)
+    fn, calls = _slow_then_fast(0.5, 0.0)
+    result = hedger.run(fn)
+    assert result.name == "call1"
+    stats = hedger.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    # 落败的主请求完成后结果被关闭
+    deadline = time.monotonic() + 2
+    while not calls[0].closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls[0].closed and not result.closed
+
+
+def test_budget_limits_hedges():
+    hedger = Hedger(delay=0.01, budget=0.0)
+    fn, calls = _slow_then_fast(0.05, 0.0)
+    assert hedger.run(fn).name == "call0"
+    assert len(calls) == 1
+    assert hedger.stats()["budget_denied"] == 1
+
+
+def test_hedge_error_falls_back_to_primary():
+    hedger = Hedger(delay=0.02, budget=1.0)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("hedge failed")
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.run(fn) == "primary"
+
+
+def test_delay_uses_observed_percentile():
+    hedger = Hedger(delay=None, percentile=0.9, default_delay=7, min_delay=0.2, min_samples=10)
+    assert hedger.hedge_delay() == 7
+    for value in range(1, 11):
+        hedger.latency.record(value / 10)
+    assert hedger.hedge_delay() == 1.0
+    tracker = LatencyTracker(window=3)
+    for value in (0.01, 5, 6, 7):
+        tracker.record(value)
+    assert len(tracker) == 3 and tracker.percentile(0) == 5
+
+
+def test_async_hedge_cancels_loser():
+    cancelled = []
+
+    async def scenario():
+        hedger = Hedger(delay=0.02, budget=1.0)
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+                return "primary"
+            return "hedge"
+
+        result = await hedger.async_run(fn)
+        await asyncio.sleep(0)
+        return result, hedger.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "hedge" and stats["hedge_wins"] == 1
+    assert cancelled == [True]
+
+
+def test_hedge_gets_remaining_timeout():
+    hedger = Hedger(delay=0.1, budget=1.0)
+    timeouts = []
+
+    def fn(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) == 1:
+            time.sleep(0.5)
+            return "primary"
+        return "hedge"
+
+    assert hedger.run(fn, 2.0) == "hedge"
+    assert timeouts[0] == 2.0
+    assert 1.5 < timeouts[1] <= 1.9
+
+
+def test_no_hedge_once_timeout_is_spent():
+    hedger = Hedger(delay=0.05, budget=1.0)
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.run(fn, 0.05) == "primary"
+    assert len(calls) == 1 and hedger.stats()["hedged"] == 0
+
+
+def test_primary_does_not_queue_behind_busy_hedge_pool():
+    hedger = Hedger(delay=5, budget=1.0, max_workers=1)
+    release = threading.Event()
+    hedger._get_executor().submit(release.wait, 2)
+    try:
+        started = time.monotonic()
+        assert hedger.run(lambda: "primary") == "primary"
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+
+
+def test_invalid_env_values_fall_back(monkeypatch):
+    from llm_resilience import _env_float
+
+    monkeypatch.setenv("LLM_HEDGE_DELAY", "fast")
+    assert _env_float("LLM_HEDGE_DELAY", 0.0) == 0.0
+    monkeypatch.setenv("LLM_HEDGE_DELAY", "-1")
+    assert _env_float("LLM_HEDGE_DELAY", 0.0) == 0.0
+    monkeypatch.setenv("LLM_HEDGE_DELAY", "nan")
+    assert _env_float("LLM_HEDGE_DELAY", 0.0) == 0.0
+    monkeypatch.setenv("LLM_HEDGE_DELAY", "1.5")
+    assert _env_float("LLM_HEDGE_DELAY", 0.0) == 1.5
@@ -0,0 +1,77 @@
+import pytest
+
+from instrumentation import LatencyHistogram, Metrics, HISTOGRAM_SUB_BUCKETS
+
+
+@pytest.mark.parametrize("value", [0, 1, 63, 64, 65, 127, 128, 1000, 123_456, 10**9])
+def test_histogram_bucket_contains_value_within_relative_error(value):
+    index = LatencyHistogram._index(value)
+    upper = LatencyHistogram._upper_bound(index)
+    assert upper >= value
+    if value < HISTOGRAM_SUB_BUCKETS:
+        assert upper == value
+    else:
+        assert (upper - value) / value < 1 / (HISTOGRAM_SUB_BUCKETS // 2)
+        # 上界之后的值落入下一个桶
+        assert LatencyHistogram._index(upper + 1) == index + 1
+
+
+def test_histogram_buckets_are_monotonic():
+    indexes = [LatencyHistogram._index(value) for value in range(0, 5000)]
+    assert indexes == sorted(indexes)
+
+
+def test_percentiles_and_summary():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) is None
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) == pytest.approx(0.050, rel=0.035)
+    assert histogram.percentile(0.99) == pytest.approx(0.099, rel=0.035)
+    assert histogram.percentile(1.0) == 0.1
+    summary = histogram.summary()
+    assert summary["min"] == 0.001 and summary["max"] == 0.1
+    assert summary["mean"] == pytest.approx(0.0505)
+    assert set(summary) >= {"p50", "p90", "p99", "p99.9"}
+
+
+def test_call_records_tokens_cost_retries_and_errors():
+    metrics = Metrics(token_prices={"deepseek": {"input": 1.0, "output": 2.0}})
+    call = metrics.start_call("llm", "recipe", provider="deepseek")
+    call.attempt()
+    call.attempt()
+    call.first_token()
+    call.add_tokens(1000, 500)
+    call.finish()
+    call.finish()   # 重复 finish 不重复计数
+
+    with pytest.raises(TimeoutError):
+        with metrics.start_call("llm", "recipe", provider="local"):
+            raise TimeoutError()
+    metrics.start_call("maps", "geocode").finish("HTTP 429")
+
+    snapshot = metrics.snapshot()
+    assert {(c["service"], c["status"], c["count"]) for c in snapshot["calls"]} == {
+        ("llm", "ok", 1), ("llm", "error", 1), ("maps", "error", 1)}
+    assert {(e["error"], e["count"]) for e in snapshot["errors"]} == {("TimeoutError", 1), ("HTTP 429", 1)}
+    assert snapshot["retries"] == [{"service": "llm", "operation": "recipe", "count": 1}]
+    assert snapshot["cost_usd"] == [{"service": "llm", "provider": "deepseek", "total": 0.002}]
+    assert len(snapshot["ttft"]) == 1 and snapshot["ttft"][0]["count"] == 1
+    assert {(t["direction"], t["count"]) for t in snapshot["tokens"]} == {("input", 1000), ("output", 500)}
+
+
+def test_render_prometheus_escapes_labels_and_reset_clears():
+    metrics = Metrics(token_prices={})
+    metrics.start_call('llm"x', "recipe").finish('bad\nerror')
+    text = metrics.render_prometheus()
+
+    assert '# TYPE smart_recipe_call_duration_seconds summary' in text
+    assert 'smart_recipe_calls_total{service="llm\\"x",operation="recipe",status="error"} 1' in text
+    assert 'error="bad\\nerror"' in text
+    assert 'smart_recipe_call_duration_seconds_count{service="llm\\"x",operation="recipe"} 1' in text
+    assert text.endswith('\n')
+
+    metrics.reset()
+    assert all(not values for values in metrics.snapshot().values())
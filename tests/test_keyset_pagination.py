@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+from mongodb_manager import SUMMARY_SORTS, _keyset_filter, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip_preserves_datetimes_and_object_ids():
+    from bson import ObjectId
+    values = [datetime(2024, 5, 3, 12, 30), ObjectId()]
+    token = encode_cursor("newest", values)
+    assert "=" not in token
+    assert decode_cursor(token, "newest") == values
+
+
+@pytest.mark.parametrize("token", [
+    "not base64 !!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(json.dumps({"s": "newest"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"s": "newest", "v": 1}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"s": "newest", "v": "ab"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"s": "newest", "v": [1]}).encode()).decode(),
+])
+def test_invalid_cursors_raise_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, "newest")
+
+
+def test_cursor_for_another_sort_is_rejected():
+    token = encode_cursor("rating", [5, datetime(2024, 1, 1), "id"])
+    with pytest.raises(ValueError):
+        decode_cursor(token, "newest")
+
+
+def test_keyset_filter_skips_null_descending_key():
+    sort_keys = SUMMARY_SORTS["rating"]
+    # 降序时 null 排在最后，rating 为 null 的记录之后只能比较后续的键
+    clauses = _keyset_filter(sort_keys, [None, datetime(2024, 1, 1), "id"])["$or"]
+    assert len(clauses) == 2 and all(clause["rating"] is None for clause in clauses)
+    assert clauses[0] == {"rating": None, "created": {"$not": {"$gte": datetime(2024, 1, 1)}}}
+    assert _keyset_filter([("a", -1)], [None]) == {"_id": {"$exists": False}}
+    assert _keyset_filter([("a", 1)], [None]) == {"$or": [{"a": {"$ne": None}}]}
+
+
+def _seed(manager, db):
+    base = datetime(2024, 1, 1)
+    ratings = [5, None, 3, 5, None, 0, 4, 3, None, 5, 1]
+    for index, rating in enumerate(ratings):
+        doc = {"username": "alice", "title": f"r{index}", "ingredients": ["x"],
+               # 部分记录时间相同，排序依赖 _id 决胜
+               "created": base + timedelta(hours=index // 2)}
+        if rating is not None:
+            doc["rating"] = rating
+        elif index == 4:
+            doc["rating"] = None
+        db["recipes"].insert_one(doc)
+    db["recipes"].insert_one({"username": "bob", "title": "other", "created": base, "rating": 5})
+
+
+@pytest.mark.parametrize("sort", sorted(SUMMARY_SORTS))
+@pytest.mark.parametrize("limit", [1, 3, 4])
+def test_pages_cover_every_recipe_once_in_order(manager, db, sort, limit):
+    _seed(manager, db)
+    expected = [summary.id for summary in manager.list_recipe_summaries("alice", limit=100, sort=sort)]
+    seen, cursor = [], None
+    for _ in range(20):
+        page, cursor = manager.list_recipe_page("alice", limit, cursor, sort=sort)
+        seen.extend(summary.id for summary in page)
+        assert len(page) <= limit
+        if cursor is None:
+            break
+    assert seen == expected
+    assert len(seen) == 11
+
+
+def test_unknown_sort_falls_back_to_newest(manager, db):
+    _seed(manager, db)
+    page, cursor = manager.list_recipe_page("alice", 2, sort="bogus")
+    assert [summary.title for summary in page] == ["r10", "r9"]
+    with pytest.raises(ValueError):
+        manager.list_recipe_page("alice", 2, cursor=encode_cursor("rating", [1, None, None]), sort="bogus")
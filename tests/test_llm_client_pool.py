@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+from llm_client_pool import UNHEALTHY_AFTER_FAILURES, LLMClientRegistry, _client_id
+
+
+@pytest.fixture
+def registry():
+    registry = LLMClientRegistry()
+    yield registry
+    registry.shutdown()
+
+
+def test_clients_are_shared_per_key_and_base_url(registry):
+    client = registry.get_client("key-a", "https://a.example/v1")
+    assert registry.get_client("key-a", "https://a.example/v1") is client
+    assert registry.get_client("key-b", "https://a.example/v1") is not client
+    assert registry.get_client("key-a", "https://b.example/v1") is not client
+    assert registry.get_http_session() is registry.get_http_session()
+
+
+def test_health_tracks_consecutive_failures(registry):
+    for _ in range(UNHEALTHY_AFTER_FAILURES - 1):
+        registry.record_failure("key", "https://a.example/v1", TimeoutError())
+    assert registry.is_healthy("key", "https://a.example/v1")
+    registry.record_failure("key", "https://a.example/v1", TimeoutError())
+    assert not registry.is_healthy("key", "https://a.example/v1")
+
+    registry.record_success("key", "https://a.example/v1")
+    assert registry.is_healthy("key", "https://a.example/v1")
+    health = registry.health()[_client_id("key", "https://a.example/v1")]
+    assert health["failures"] == UNHEALTHY_AFTER_FAILURES and health["successes"] == 1
+    assert health["last_error"] == "TimeoutError"
+
+
+def test_health_report_does_not_expose_keys(registry):
+    registry.record_success("sk-secret-value", "https://a.example/v1")
+    assert all("sk-secret-value" not in client_id for client_id in registry.health())
+
+
+def test_shutdown_drops_clients(registry):
+    client = registry.get_client("key", "https://a.example/v1")
+    registry.shutdown()
+    assert registry.get_client("key", "https://a.example/v1") is not client
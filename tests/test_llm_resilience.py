@@ -0,0 +1,122 @@
+import pytest
+
+from llm_resilience import (CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy, call_with_retry,
+                            is_retryable)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+def _flaky(errors, result="ok"):
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, deadline=5)
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (StatusError(409), False),
+    (TimeoutError(), True),
+    (APITimeoutError(), True),
+    (ValueError("bad json"), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_retries_transient_errors_until_success():
+    fn, calls = _flaky([StatusError(503), TimeoutError()])
+    assert call_with_retry(fn, FAST) == "ok"
+    assert len(calls) == 3
+    # 每次尝试拿到的是剩余时间
+    assert calls[0] >= calls[1] >= calls[2] > 0
+
+
+def test_gives_up_after_max_attempts_and_on_permanent_errors():
+    fn, calls = _flaky([StatusError(503)] * 5)
+    with pytest.raises(StatusError):
+        call_with_retry(fn, FAST)
+    assert len(calls) == 3
+
+    fn, calls = _flaky([StatusError(400)])
+    with pytest.raises(StatusError):
+        call_with_retry(fn, FAST)
+    assert len(calls) == 1
+
+
+def test_deadline_stops_retries():
+    policy = RetryPolicy(max_attempts=10, base_delay=10, max_delay=10, deadline=0.5)
+    fn, calls = _flaky([StatusError(503)] * 10)
+    policy.backoff = lambda attempt: 1.0
+    with pytest.raises(DeadlineExceeded):
+        call_with_retry(fn, policy)
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("llm_resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    fn, calls = _flaky([])
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(fn, FAST, breaker)
+    assert calls == []
+
+    now[0] += 30
+    # 半开状态只放行一个探测请求
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    assert breaker.stats()["rejected"] == 3
+
+
+def test_failed_probe_reopens_circuit(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("llm_resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    now[0] = 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_permanent_errors_do_not_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1)
+    fn, _ = _flaky([StatusError(400)])
+    with pytest.raises(StatusError):
+        call_with_retry(fn, FAST, breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_template_recipe_is_flagged():
+    pytest.importorskip("openai")
+    from llm_interface import build_template_recipe
+    recipe = build_template_recipe("鸡蛋、番茄", "zh", servings=3)
+    assert recipe["fallback"] is True and recipe["serves"] == 3
+    assert recipe["ingredients"][:2] == ["鸡蛋", "番茄"]
+    assert "鸡蛋" in recipe["title"]
@@ -0,0 +1,115 @@
+import uuid
+
+import pytest
+
+pytest.importorskip("openai")
+
+from llm_resilience import CircuitOpenError
+from llm_router import (DEFAULT_MODEL, PLACEHOLDER_API_KEY, ROUTER_MIN_SAMPLES, LLMRouter, Provider,
+                        parse_providers)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _providers(*names):
+    # 熔断器和客户端健康状态是进程共享的，每个测试使用唯一的名称和地址
+    suffix = uuid.uuid4().hex[:8]
+    return [Provider(f"{name}-{suffix}", f"http://{name}-{suffix}.test/v1") for name in names]
+
+
+def _warm_up(router, provider, latency, failures=0):
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router._stats[provider.name].in_flight += 1
+        router.record_success(provider, latency)
+    for _ in range(failures):
+        router._stats[provider.name].in_flight += 1
+        router.record_failure(provider, ValueError("bad output"))
+
+
+def test_unsampled_providers_are_probed_first():
+    fast, slow = _providers("fast", "slow")
+    router = LLMRouter([fast, slow])
+    _warm_up(router, fast, 0.1)
+    assert router.select() is slow
+    # 正在探测的请求也计入样本数，并发探测会分散到不同服务商
+    assert router._stats[slow.name].in_flight == 1
+
+
+def test_lowest_latency_wins_and_errors_penalise():
+    fast, slow = _providers("fast", "slow")
+    router = LLMRouter([slow, fast])
+    _warm_up(router, fast, 0.1)
+    _warm_up(router, slow, 0.3)
+    assert router.select() is fast
+    router.release(fast)
+
+    # 错误率超过 ROUTER_MAX_ERROR_RATE 后视为不健康，即使延迟更低也排在后面
+    _warm_up(router, fast, 0.1, failures=ROUTER_MIN_SAMPLES + 1)
+    assert router.select() is slow
+
+
+def test_avoid_and_open_circuit():
+    first, second = _providers("first", "second")
+    router = LLMRouter([first, second])
+    _warm_up(router, first, 0.1)
+    _warm_up(router, second, 0.2)
+    assert router.select(avoid=[first.name]) is second
+
+    for _ in range(first.breaker.failure_threshold):
+        router._stats[first.name].in_flight += 1
+        router.record_failure(first, StatusError(503))
+    assert router.select() is second
+
+    for _ in range(second.breaker.failure_threshold):
+        router._stats[second.name].in_flight += 1
+        router.record_failure(second, StatusError(503))
+    with pytest.raises(CircuitOpenError):
+        router.select()
+
+
+def test_client_errors_do_not_hurt_provider_health():
+    (provider,) = _providers("only")
+    router = LLMRouter([provider])
+    for status in (400, 401, 404, 409):
+        for _ in range(provider.breaker.failure_threshold):
+            assert router.select() is provider
+            router.record_failure(provider, StatusError(status))
+    stats = router.stats()[provider.name]
+    assert stats["failures"] == 0 and stats["in_flight"] == 0
+    assert router._healthy(provider)
+
+    router.select()
+    router.record_failure(provider, StatusError(503))
+    assert router.stats()[provider.name]["failures"] == 1
+
+
+def test_stats_report():
+    (provider,) = _providers("only")
+    router = LLMRouter([provider])
+    selected = router.select()
+    router.record_success(selected, 0.25)
+    stats = router.stats()[provider.name]
+    assert stats["successes"] == 1 and stats["in_flight"] == 0 and stats["p50"] == 0.25
+
+
+def test_parse_providers():
+    default = parse_providers(None, default_api_key="sk-default")
+    assert [p.name for p in default] == ["deepseek"] and default[0].api_key == "sk-default"
+
+    providers = parse_providers(
+        '[{"name": "a", "base_url": "https://api.deepseek.com"},'
+        ' {"name": "b", "base_url": "http://b.test/v1", "api_key_env": "B_KEY", "model": "m"},'
+        ' {"name": "c", "base_url": "http://c.test/v1"}]',
+        default_api_key="sk-default",
+        get_config={"B_KEY": "sk-b"}.get,
+    )
+    assert [(p.name, p.api_key, p.model) for p in providers] == [
+        ("a", "sk-default", DEFAULT_MODEL), ("b", "sk-b", "m"), ("c", PLACEHOLDER_API_KEY, DEFAULT_MODEL)]
+    with pytest.raises(ValueError):
+        parse_providers("[]")
+    with pytest.raises(ValueError):
+        LLMRouter([])
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from lucky_pool import LuckyPool, lucky_ingredient_choices
+
+
+class FakeLLM:
+    def __init__(self, fallback=False):
+        self.calls = []
+        self.fallback = fallback
+        self._lock = threading.Lock()
+
+    def generate_recipe_and_nutrition(self, ingredients, diet, goal, language="en", regenerate=False):
+        with self._lock:
+            self.calls.append((ingredients, diet, goal, language, regenerate))
+            number = len(self.calls)
+        return {"recipe": f"recipe {number}", "ingredients": ingredients, "fallback": self.fallback}
+
+
+def _wait_idle(pool):
+    deadline = time.time() + 5
+    while pool.stats()["pending"] and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def _drain(pool):
+    pool._executor.shutdown(wait=True)
+
+
+def test_lucky_ingredient_choices_respects_diet_and_language():
+    vegan = lucky_ingredient_choices("zh", "vegan")
+    assert vegan and all("鸡" not in choice and "牛肉" not in choice for choice in vegan)
+    assert lucky_ingredient_choices("fr") == lucky_ingredient_choices("en")
+    assert lucky_ingredient_choices("en", "unknown-diet") == lucky_ingredient_choices("en", "")
+
+
+def test_refills_bypass_cache_and_use_distinct_ingredients():
+    llm = FakeLLM()
+    pool = LuckyPool(llm, size=3, low_watermark=2, max_workers=2)
+    pool.ensure("en", "vegan", "balanced")
+    _drain(pool)
+
+    assert len(llm.calls) == 3
+    assert all(call[4] is True for call in llm.calls)
+    assert len({call[0] for call in llm.calls}) == 3
+    assert pool.stats()["pools"] == {"en|vegan|balanced": 3}
+
+
+def test_take_serves_pool_and_counts_misses():
+    llm = FakeLLM()
+    pool = LuckyPool(llm, size=2, low_watermark=1, max_workers=1)
+    assert pool.take("en") is None
+    _drain(pool)
+
+    ingredients, recipe = pool.take("en")
+    assert recipe["ingredients"] == ingredients
+    stats = pool.stats()
+    assert stats["served"] == 1 and stats["misses"] == 1
+
+
+def test_ensure_is_throttled_per_key_unless_forced():
+    llm = FakeLLM(fallback=True)
+    pool = LuckyPool(llm, size=1, low_watermark=1, max_workers=1, ensure_interval=60)
+    pool.ensure("en")
+    _wait_idle(pool)
+    pool.ensure("en")
+    pool.ensure("en")
+    _wait_idle(pool)
+
+    # 降级食谱不入池，但重绘时的重复 ensure 不会再次提交生成
+    assert len(llm.calls) == 1
+    assert pool.stats()["failures"] == 1
+    pool.ensure("ja")
+    pool.ensure("en", force=True)
+    _drain(pool)
+    assert sorted(call[3] for call in llm.calls) == ["en", "en", "ja"]
+
+
+def test_max_keys_evicts_least_recently_used_combination():
+    pool = LuckyPool(FakeLLM(), size=1, low_watermark=1, max_workers=1, max_keys=2, ensure_interval=0)
+    pool.ensure("en", "a")
+    pool.ensure("en", "b")
+    pool.ensure("en", "a")
+    pool.ensure("en", "c")
+    _drain(pool)
+    assert set(pool.stats()["pools"]) == {"en|a|", "en|c|"}
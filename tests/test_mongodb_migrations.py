@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+import mongodb_manager
+from mongodb_manager import BACKFILLS, MIGRATIONS, run_migrations
+
+
+def _legacy_recipe(db, username="alice"):
+    """迁移前格式的食谱：没有搜索词元、内容哈希、计数和统计"""
+    return db["recipes"].insert_one({
+        "username": username, "title": "Tofu Stir Fry", "ingredients": ["tofu", "spinach"],
+        "diet": "vegan", "goal": "balanced", "created": datetime(2024, 5, 3),
+    }).inserted_id
+
+
+def _applied(db):
+    return {doc["_id"] for doc in db["migrations"].find()}
+
+
+def test_get_mongo_client_is_shared_per_connection_string():
+    uri = "mongodb://127.0.0.1:1/?connect=false"
+    try:
+        first = mongodb_manager.get_mongo_client(uri)
+        assert mongodb_manager.get_mongo_client(uri) is first
+    finally:
+        mongodb_manager._clients.pop(uri).close()
+
+
+def test_manager_init_only_creates_indexes(db, capsys):
+    recipe_id = _legacy_recipe(db)
+    mongodb_manager.MongoDBManager("mongodb://test")
+
+    assert _applied(db) == {name for name, _ in MIGRATIONS}
+    doc = db["recipes"].find_one({"_id": recipe_id})
+    assert "search_tokens" not in doc and "content_hash" not in doc
+    assert db["recipe_counts"].count_documents({}) == 0
+    assert any("search_tokens" in str(index["key"]) for index in db["recipes"].list_indexes())
+    assert "manage_db.py migrate" in capsys.readouterr().out
+
+
+def test_backfill_runs_remaining_data_migrations_once(db):
+    recipe_id = _legacy_recipe(db)
+    run_migrations(db)
+    executed = run_migrations(db, backfill=True)
+
+    assert executed == [name for name, _ in BACKFILLS]
+    doc = db["recipes"].find_one({"_id": recipe_id})
+    assert "tofu" in doc["search_tokens"] and doc["content_hash"]
+    assert db["recipe_counts"].find_one({"_id": "alice|2024-05"})["count"] == 1
+    assert db["user_stats"].find_one({"_id": "alice"})["total_recipes"] == 1
+
+    mongodb_manager._migrated.clear()
+    assert run_migrations(db, backfill=True) == []
+
+
+def test_manage_db_migrate_applies_backfills(db, monkeypatch, capsys):
+    import manage_db
+    monkeypatch.setattr(manage_db, "get_mongo_client", lambda uri: db.client)
+    _legacy_recipe(db)
+    manage_db.cmd_migrate(type("Args", (), {"uri": "mongodb://test", "force": False})())
+
+    assert _applied(db) == {name for name, _ in MIGRATIONS + BACKFILLS}
+    assert "Applied migrations" in capsys.readouterr().out
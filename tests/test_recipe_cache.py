@@ -0,0 +1,95 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+
+from llm_interface import LLMInterface, MemoryCache, SQLiteCache, TieredCache, make_cache_key
+
+RECIPE = {"title": "Broccoli chicken", "ingredients": ["chicken", "broccoli"], "instructions": ["Cook."]}
+
+
+def test_cache_key_ignores_order_case_separators_and_duplicates():
+    base = make_cache_key("Chicken, broccoli", "keto", "", "en")
+    assert make_cache_key("broccoli,chicken", "KETO ", "", "en") == base
+    assert make_cache_key("broccoli；Chicken、chicken", "keto", None, "en") == base
+    assert make_cache_key(["broccoli", "chicken"], "keto", "", "en") == base
+
+
+def test_cache_key_distinguishes_options():
+    base = make_cache_key("chicken", "", "", "en")
+    assert make_cache_key("chicken", "", "", "zh") != base
+    assert make_cache_key("chicken", "", "", "en", servings=4) != base
+    assert make_cache_key("chicken", "vegan", "", "en") != base
+    # servings 为空时按默认的 2 人份处理
+    assert make_cache_key("chicken", "", "", "en", servings=None) == base
+
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a 变为最近使用
+    cache.set("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1" and cache.get("c") == "3"
+
+    cache.set("old", "x", ttl=-1)
+    assert cache.get("old") is None
+
+
+def test_sqlite_cache_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, max_entries=3, ttl=60)
+    cache.EVICT_EVERY = 1
+    for index in range(5):
+        cache.set(f"k{index}", str(index))
+        time.sleep(0.001)
+    assert [cache.get(f"k{index}") for index in range(5)] == [None, None, "2", "3", "4"]
+
+    cache.set("expired", "x", ttl=-1)
+    assert cache.get("expired") is None
+    # 进程重启后仍然有效
+    assert SQLiteCache(path).get("k4") == "4"
+
+
+def test_tiered_cache_backfills_memory(tmp_path):
+    memory = MemoryCache()
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    disk.set("key", "value")
+    cache = TieredCache(memory, disk)
+    assert memory.get("key") is None
+    assert cache.get("key") == "value"
+    assert memory.get("key") == "value"
+    cache.delete("key")
+    assert cache.get("key") is None
+
+
+def _interface(monkeypatch, cache):
+    llm = LLMInterface("test-key", cache=cache, single_flight=False, semantic_cache=False, fallback=False)
+    calls = []
+
+    def generate(*args):
+        calls.append(args)
+        return dict(RECIPE)
+
+    monkeypatch.setattr(llm, "_generate_recipe", generate)
+    return llm, calls
+
+
+def test_generation_is_served_from_cache(monkeypatch):
+    llm, calls = _interface(monkeypatch, MemoryCache())
+    first = llm.generate_recipe_and_nutrition("chicken, broccoli", "", "", "en")
+    second = llm.generate_recipe_and_nutrition("Broccoli,Chicken", "", "", "en")
+    assert first == second == RECIPE
+    assert len(calls) == 1
+
+    llm.generate_recipe_and_nutrition("chicken, broccoli", "", "", "en", regenerate=True)
+    assert len(calls) == 2
+
+
+def test_cached_value_is_json(monkeypatch):
+    cache = MemoryCache()
+    llm, _ = _interface(monkeypatch, cache)
+    llm.generate_recipe_and_nutrition("chicken", "", "", "en")
+    assert json.loads(cache.get(make_cache_key("chicken", "", "", "en"))) == RECIPE
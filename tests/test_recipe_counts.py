@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+from mongodb_manager import month_key, rebuild_recipe_counts, recent_months
+
+
+def test_month_key_and_recent_months_cross_year_boundary():
+    assert month_key(datetime(2024, 3, 31, 23, 59)) == "2024-03"
+    assert recent_months(datetime(2024, 2, 10), 4) == ["2023-11", "2023-12", "2024-01", "2024-02"]
+    assert recent_months(datetime(2024, 2, 10), 0) == []
+
+
+def _insert(db, username, *moments):
+    db["recipes"].insert_many([{"username": username, "title": "r", "created": moment} for moment in moments])
+
+
+def test_rebuild_recipe_counts_groups_by_user_and_month(db):
+    _insert(db, "alice", datetime(2023, 12, 31), datetime(2024, 1, 1), datetime(2024, 1, 20))
+    _insert(db, "bob", datetime(2024, 1, 5))
+    db["recipes"].insert_one({"username": "alice", "title": "no date", "created": "2024-01-02"})
+    db["recipe_counts"].insert_one({"_id": "ghost|2020-01", "username": "ghost", "month": "2020-01", "count": 3})
+
+    assert rebuild_recipe_counts(db) == 3
+    counts = {doc["_id"]: doc["count"] for doc in db["recipe_counts"].find()}
+    assert counts == {"alice|2023-12": 1, "alice|2024-01": 2, "bob|2024-01": 1}
+
+    _insert(db, "bob", datetime(2024, 2, 1))
+    assert rebuild_recipe_counts(db, "bob") == 2
+    assert db["recipe_counts"].count_documents({"username": "alice"}) == 2
+
+
+def test_counters_follow_saves_and_deletes(manager):
+    first = manager.save_recipe("alice", {"title": "a"})
+    manager.save_recipe("alice", {"title": "b"})
+    now = datetime.utcnow()
+    assert manager.count_recipes_in_month("alice", now.year, now.month) == 2
+    assert [summary.title for summary in manager.get_user_recipes_by_month("alice", now.year, now.month)] == ["b", "a"]
+
+    manager.delete_recipe(first)
+    assert manager.count_recipes_in_month("alice", now.year, now.month) == 1
+    assert manager.count_recipes_in_month("alice", 1999, 1) == 0
+
+
+def test_count_recipes_by_period(manager, db):
+    _insert(db, "alice", datetime(2024, 1, 29, 8), datetime(2024, 1, 30), datetime(2024, 2, 4, 23), datetime(2024, 2, 5))
+    rebuild_recipe_counts(db, "alice")
+    until = datetime(2024, 2, 5, 12)
+
+    assert manager.count_recipes_by_period("alice", "month", 3, until) == [
+        {"period": "2023-12", "count": 0}, {"period": "2024-01", "count": 2}, {"period": "2024-02", "count": 2}]
+    # 周从周一开始：2024-01-29 和 2024-02-05 都是周一
+    assert manager.count_recipes_by_period("alice", "week", 2, until) == [
+        {"period": "2024-01-29", "count": 3}, {"period": "2024-02-05", "count": 1}]
+    assert manager.count_recipes_by_period("alice", "day", 2, until) == [
+        {"period": "2024-02-04", "count": 1}, {"period": "2024-02-05", "count": 1}]
+    assert manager.count_recipes("alice", start=datetime(2024, 1, 30)) == 3
+    with pytest.raises(ValueError):
+        manager.count_recipes_by_period("alice", "year")
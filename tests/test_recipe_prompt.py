@@ -0,0 +1,59 @@
+import pytest
+
+from recipe_prompt import (MAX_OUTPUT_TOKENS, MIN_OUTPUT_TOKENS, PromptBuilder, TokenUsageTracker, estimate_tokens,
+                           instruction_steps, parse_servings)
+
+
+@pytest.mark.parametrize("servings, expected", [
+    (4, 4), ("4", 4), ("4 people", 4), ("2-3", 2), ("约 6 人份", 6), (None, 2), ("", 2), ("a few", 2), (0, 2),
+    (True, 2),
+])
+def test_parse_servings(servings, expected):
+    assert parse_servings(servings) == expected
+
+
+@pytest.mark.parametrize("servings", ["4 people", "2-3", "a few", None, 12])
+def test_max_tokens_accepts_free_text_servings(servings):
+    tokens = PromptBuilder().max_tokens("chicken, rice", "en", "easy", servings)
+    assert MIN_OUTPUT_TOKENS <= tokens <= MAX_OUTPUT_TOKENS
+
+
+def test_max_tokens_grows_with_recipe_size_and_language():
+    builder = PromptBuilder()
+    small = builder.max_tokens("egg", "en", "easy")
+    large = builder.max_tokens(", ".join(f"item{i}" for i in range(15)), "en", "hard")
+    assert small < large
+    assert builder.max_tokens("egg, rice, tofu", "ja", "medium") > builder.max_tokens("egg, rice, tofu", "en", "medium")
+    # 观测到的实际输出更长时以观测值为准，但不超过上限
+    assert builder.max_tokens("egg", "en", "easy", observed=2000) > small
+    assert builder.max_tokens("egg", "en", "easy", observed=10_000) == MAX_OUTPUT_TOKENS
+
+
+def test_messages_share_a_cached_system_prompt():
+    builder = PromptBuilder()
+    first = builder.build_messages("egg", "vegan", "", "zh", difficulty="困难", servings="2-3")
+    second = builder.build_messages("tofu", "", "energy", "zh")
+    assert first[0]["content"] is second[0]["content"]
+    assert "Simplified Chinese" in first[0]["content"]
+    assert "Steps: about 10" in first[1]["content"] and "Diet: vegan" in first[1]["content"]
+    assert instruction_steps("Easy") == 5 and instruction_steps("unknown") == 7
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("番茄炒蛋") == 4
+
+
+def test_token_usage_tracker():
+    tracker = TokenUsageTracker()
+    for value in range(1, 21):
+        tracker.record("p", "en", 100, value * 10, 800)
+    tracker.record("p", "en", 100, 5000, 800, estimated=True)
+    tracker.record("p", "en", 100, 800, 800, finish_reason="length")
+    assert tracker.completion_percentile("zh") is None
+    # 估算的用量不参与分位数
+    assert tracker.completion_percentile("en", q=0.95) == 200
+    assert tracker.completion_percentile("en", q=1.0) == 800
+    stats = tracker.stats()
+    assert stats["calls"] == 22 and stats["truncated"] == 1 and len(stats["recent"]) == 20
@@ -0,0 +1,125 @@
+import pytest
+
+from recipe_schema import (SCHEMA_VERSION, compact_recipe, content_hash, diet_condition, difficulty_label,
+                           parse_minutes, parse_nutrient, recipe_from_document)
+
+GENERATED = {
+    "title": "Tofu Stir Fry",
+    "description": "Quick",
+    "ingredients": ["tofu 200g", "spinach"],
+    "instructions": ["Fry", "Serve"],
+    "nutrition": {"Calories": "320 kcal", "Protein": "2.55 g", "Sodium": "1.2 g", "Iron": "800 µg",
+                  "Fiber": "Not available", "Sugar": "a little"},
+    "serves": "2 people",
+    "prep_time": "1 hour 30 min",
+    "cook_time": "a while",
+    "diet": "Vegan",
+    "goal": "energy",
+    "difficulty": "简单",
+    "tags": ["quick"],
+}
+
+
+@pytest.mark.parametrize("text, unit, expected", [
+    ("320 kcal", "kcal", 320),
+    ("2.55 g", "g", 2.55),
+    ("1.2 g", "mg", 1200),
+    ("800 μg", "mg", 0.8),
+    ("800 µg", "mg", 0.8),          # 微符号 U+00B5
+    ("１２ｇ", "g", 12),             # 全角
+    ("1000 kJ", "kcal", 1000 / 4.184),
+    ("15克", "g", 15),
+    ("1,200 mg", "mg", 1200),
+    ("1,050 kcal", "kcal", 1050),
+    ("１，２００ mg", "mg", 1200),      # 全角千位分隔符
+    ("2.55 grams", "g", 2.55),
+    ("none", "g", None),
+    ("200-300 kcal", "kcal", None),
+    ("about 5 g", "g", None),
+    ("1,5 g", "g", None),
+    ("3 cups", "g", None),
+])
+def test_parse_nutrient_converts_units_without_rounding(text, unit, expected):
+    assert parse_nutrient(text, unit) == (pytest.approx(expected) if expected is not None else None)
+
+
+def test_parse_minutes():
+    assert parse_minutes("1 hour 30 min") == 90
+    assert parse_minutes("45分钟") == 45
+    assert parse_minutes("1.5 h") == 90
+    assert parse_minutes("20") == 20
+    assert parse_minutes("12.25 min") == 12.25
+    assert parse_minutes("soon") is None
+    assert parse_minutes("1 hour and 30 minutes") == 90
+    assert parse_minutes("1小时20分钟") == 80
+    # 范围或带说明的时长不取其中一个数，交给调用方保留原文本
+    assert parse_minutes("15-20 min") is None
+    assert parse_minutes("about 30 min") is None
+    assert parse_minutes("30 mg") is None
+
+
+def test_grouped_and_range_values_are_not_truncated():
+    doc = compact_recipe({"title": "Soup", "nutrition": {"Sodium": "1,200 mg", "Calories": "1,050 kcal", "Protein": "10-12 g"},
+                          "prep_time": "15-20 min", "cook_time": "1,000 min"})
+    assert doc["nutrients"] == {"sodium_mg": 1200, "kcal": 1050, "protein_g": "10-12 g"}
+    assert doc["prep_time"] == "15-20 min" and "prep_min" not in doc
+    assert doc["cook_min"] == 1000
+    shown = recipe_from_document(doc)
+    assert shown["nutrition"]["Protein"] == "10-12 g" and shown["prep_time"] == "15-20 min"
+
+
+def test_compact_recipe_encodes_codes_numbers_and_keeps_unparsed_text():
+    doc = compact_recipe(GENERATED)
+    assert doc["v"] == SCHEMA_VERSION
+    assert (doc["diet"], doc["goal"], doc["difficulty"]) == (2, 3, 1)
+    assert doc["nutrients"] == {"kcal": 320, "protein_g": 2.55, "sodium_mg": 1200, "iron_mg": 0.8, "sugar_g": "a little"}
+    assert doc["serves"] == 2 and doc["prep_min"] == 90
+    assert doc["cook_time"] == "a while" and "cook_min" not in doc
+
+
+def test_adapter_round_trip_is_stable():
+    stored = compact_recipe(GENERATED)
+    shown = recipe_from_document(stored)
+    assert shown["nutrition"]["Protein"] == "2.55 g"
+    assert shown["nutrition"]["Iron"] == "0.8 mg"
+    assert shown["prep_time"] == "90 min" and shown["cook_time"] == "a while"
+    assert (shown["diet"], shown["goal"], shown["difficulty"]) == ("vegan", "energy", "Easy")
+    assert compact_recipe(shown) == stored
+    # 导出时去掉 v，显示格式按生成结果重新规范
+    shown.pop("v")
+    assert content_hash(stored) == content_hash(GENERATED) == content_hash(shown)
+
+
+def test_difficulty_is_translated_for_the_requested_language():
+    stored = compact_recipe({**GENERATED, "difficulty": "Hard"})
+    assert recipe_from_document(stored, "zh")["difficulty"] == "困难"
+    assert recipe_from_document(stored, "ja")["difficulty"] == "難しい"
+    assert recipe_from_document(stored, "fr")["difficulty"] == "Hard"
+    assert recipe_from_document({"title": "legacy", "difficulty": "中等"}, "en")["difficulty"] == "Medium"
+    assert difficulty_label("extreme", "zh") == "extreme"
+    assert difficulty_label("", "zh") == ""
+    # 翻译后的名称仍映射到同一编码，内容哈希不受语言影响
+    translated = recipe_from_document(stored, "ja")
+    translated.pop("v")
+    assert content_hash(translated) == content_hash(stored)
+
+
+def test_legacy_documents_only_fill_missing_fields():
+    legacy = {"title": "old", "nutrition_info": "- Calories: 300 kcal", "diet": "vegan"}
+    shown = recipe_from_document(legacy)
+    assert shown["nutrition"] == "- Calories: 300 kcal"
+    assert compact_recipe(shown)["nutrients"] == {"kcal": 300}
+    assert recipe_from_document(None) is None
+
+
+def test_diet_condition_matches_codes_and_legacy_strings():
+    assert diet_condition("vegan") == {"$in": [2, "vegan"]}
+    assert diet_condition("paleo") == "paleo"
+
+
+def test_get_recipe_localizes_difficulty(manager):
+    recipe_id = manager.save_recipe("alice", GENERATED)
+    assert manager.get_recipe(recipe_id, "alice")["difficulty"] == "Easy"
+    assert manager.get_recipe(recipe_id, "alice", "zh")["difficulty"] == "简单"
+    assert manager.get_recipe(recipe_id, "bob") is None
+    assert manager.get_user_recipes("alice", language="ja")[0]["difficulty"] == "簡単"
@@ -0,0 +1,48 @@
+from recipe_search import MAX_QUERY_TOKENS, build_search_fields, query_tokens, search_pipeline, tokenize
+
+
+def test_tokenize_singularizes_words_and_splits_cjk_into_unigrams_and_bigrams():
+    assert tokenize("Roasted Tomatoes & Eggs") == ["roasted", "tomato", "egg"]
+    assert tokenize("番茄炒蛋") == ["番", "茄", "炒", "蛋", "番茄", "茄炒", "炒蛋"]
+    # 全角字母和半角片假名经 NFKC 统一
+    assert tokenize("ＴＯＦＵ ｶﾚｰ") == ["tofu", "カ", "レ", "ー", "カレ", "レー"]
+
+
+def test_query_tokens_use_bigrams_dedupe_and_cap():
+    assert query_tokens("番茄 蛋") == ["番茄", "蛋"]
+    assert query_tokens("Eggs egg EGG") == ["egg"]
+    assert query_tokens("  !!  ") == []
+    assert len(query_tokens(" ".join(f"w{n}" for n in range(40)))) == MAX_QUERY_TOKENS
+
+
+def test_build_search_fields_separates_title_and_keywords():
+    fields = build_search_fields({"title": "Tofu Soup", "ingredients": ["tofu", "scallions"], "tags": "quick",
+                                  "notes": "family favourite"})
+    assert fields["search_title"] == ["tofu", "soup"]
+    assert fields["search_keywords"] == ["tofu", "scallion", "quick"]
+    assert fields["search_tokens"] == ["tofu", "soup", "scallion", "quick", "family", "favourite"]
+
+
+def test_search_pipeline_converts_slice_projection():
+    assert search_pipeline("alice", "???") is None
+    pipeline = search_pipeline("alice", "tofu", projection={"title": 1, "ingredients": {"$slice": 4}}, skip=-3, limit=0)
+    assert pipeline[0]["$match"] == {"username": "alice", "search_tokens": {"$all": ["tofu"]}}
+    assert pipeline[-1]["$project"] == {"title": 1, "ingredients": {"$slice": ["$ingredients", 4]}, "score": 1}
+    assert pipeline[-3] == {"$skip": 0} and pipeline[-2] == {"$limit": 1}
+
+
+def test_search_recipes_requires_all_tokens_and_ranks_title_hits_first(manager):
+    manager.save_recipe("alice", {"title": "Spinach salad", "ingredients": ["tofu", "spinach"]})
+    manager.save_recipe("alice", {"title": "Tofu spinach stir fry", "ingredients": ["tofu", "spinach"]})
+    manager.save_recipe("alice", {"title": "Tofu soup", "ingredients": ["tofu"], "notes": "add spinach"})
+    manager.save_recipe("alice", {"title": "Beef stew", "ingredients": ["beef"]})
+    manager.save_recipe("bob", {"title": "Tofu spinach", "ingredients": ["tofu", "spinach"]})
+
+    results = manager.search_recipes("alice", "tofu spinach")
+    assert [doc["title"] for doc in results] == ["Tofu spinach stir fry", "Spinach salad", "Tofu soup"]
+    assert [doc["score"] for doc in results] == [10, 7, 5]
+    assert "search_tokens" not in results[0]
+    assert manager.search_recipes("alice", "番茄") == []
+    # 得分相同时较新的食谱在前
+    assert [doc["title"] for doc in manager.search_recipes("alice", "tofu", limit=2)] == ["Tofu soup", "Tofu spinach stir fry"]
+    assert [doc["title"] for doc in manager.search_recipes("alice", "tofu", limit=1, skip=2)] == ["Spinach salad"]
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+from mongodb_manager import month_key, recent_months
+
+
+def _save(manager, **recipe):
+    return manager.save_recipe("alice", {"title": "r", "ingredients": ["x"], **recipe})
+
+
+def test_statistics_are_empty_without_recipes(manager):
+    assert manager.get_recipe_statistics("alice") == {}
+
+
+def test_statistics_rank_values_and_fill_monthly_counts(manager):
+    _save(manager, diet="vegan", goal="energy", cuisine="Thai", tags=["quick", "spicy"], rating=5)
+    _save(manager, diet="vegan", goal="", cuisine="Thai", tags=["quick"], rating=3)
+    _save(manager, diet="keto", goal="energy", cuisine="", tags=[], rating=0)
+    _save(manager, diet="", cuisine="Italian", tags=["v1.2"])
+    manager.save_recipe("bob", {"title": "other", "diet": "keto", "cuisine": "Thai"})
+
+    stats = manager.get_recipe_statistics("alice", top=2, months=3)
+    assert stats["total_recipes"] == 4
+    assert stats["avg_rating"] == pytest.approx(2.0)
+    # 次数相同时按值排序，空菜系和空标签不计入
+    assert stats["top_diets"] == [{"value": "vegan", "count": 2}, {"value": "", "count": 1}]
+    assert stats["top_goals"] == [{"value": "", "count": 2}, {"value": "energy", "count": 2}]
+    assert stats["top_cuisines"] == [{"value": "Thai", "count": 2}, {"value": "Italian", "count": 1}]
+    assert stats["top_tags"] == [{"value": "quick", "count": 2}, {"value": "spicy", "count": 1}]
+
+    now = datetime.utcnow()
+    assert [row["month"] for row in stats["monthly"]] == recent_months(now, 3)
+    assert [row["count"] for row in stats["monthly"]] == [0, 0, 4]
+    assert month_key(now) == stats["monthly"][-1]["month"]
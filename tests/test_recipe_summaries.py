@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+from mongodb_manager import SUMMARY_PROJECTION, RecipeSummary
+
+
+def _recipe(title, diet="", rating=0, ingredients=("tofu",), **extra):
+    return {"title": title, "diet": diet, "rating": rating, "ingredients": list(ingredients),
+            "instructions": ["step"] * 20, "nutrition": {"Calories": "300 kcal"}, **extra}
+
+
+def test_summary_from_document_previews_ingredients_and_decodes_codes():
+    doc = {"_id": "abc", "title": "Soup", "created": datetime(2024, 1, 2), "diet": 2, "goal": 1,
+           "ingredients": ["a", "b", "c", "d"], "rating": None}
+    summary = RecipeSummary.from_document(doc)
+    assert summary.diet == "vegan" and summary.goal == "weight-loss"
+    assert summary.ingredients_preview == ["a", "b", "c"] and summary.more_ingredients
+    assert summary.ingredients_text == "a, b, c..."
+    assert summary.rating == 0
+    assert summary.to_dict()["created"] == "2024-01-02T00:00:00"
+
+    legacy = RecipeSummary.from_document({"_id": 1, "ingredients": "x" * 150})
+    assert legacy.ingredients_preview == ["x" * 100] and legacy.more_ingredients
+
+
+def test_list_recipe_summaries_projects_sorts_and_filters(manager, db):
+    manager.save_recipe("alice", _recipe("old vegan", "vegan", 3, ingredients="abcde"))
+    manager.save_recipe("alice", _recipe("keto", "keto", 5))
+    manager.save_recipe("alice", _recipe("new vegan", "vegan", 4))
+    manager.save_recipe("bob", _recipe("other user", "vegan"))
+    # 迁移前以字符串存储饮食的旧文档
+    db["recipes"].insert_one({"username": "alice", "title": "legacy vegan", "diet": "vegan",
+                              "created": datetime(2000, 1, 1), "ingredients": ["x"]})
+
+    newest = manager.list_recipe_summaries("alice")
+    assert [s.title for s in newest] == ["new vegan", "keto", "old vegan", "legacy vegan"]
+    assert not hasattr(newest[0], "instructions")
+
+    assert [s.title for s in manager.list_recipe_summaries("alice", sort="rating")][:3] == ["keto", "new vegan", "old vegan"]
+    assert [s.title for s in manager.list_recipe_summaries("alice", sort="oldest", limit=2)] == ["legacy vegan", "old vegan"]
+    assert [s.title for s in manager.list_recipe_summaries("alice", diet="vegan")] == ["new vegan", "old vegan", "legacy vegan"]
+    assert [s.title for s in manager.list_recipe_summaries("alice", skip=3)] == ["legacy vegan"]
+    assert manager.list_recipe_summaries("nobody") == []
+
+
+def test_summary_projection_excludes_large_fields(manager, db):
+    manager.save_recipe("alice", _recipe("soup", ingredients=[f"item {n}" for n in range(10)]))
+    doc = db["recipes"].find_one({}, SUMMARY_PROJECTION)
+    assert "instructions" not in doc and "nutrition" not in doc
+    assert len(doc["ingredients"]) == 4
@@ -0,0 +1,72 @@
+import gzip
+import io
+import json
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+import recipe_transfer
+from recipe_transfer import _open_lines, export_recipes, import_recipes
+
+
+def _jsonl(*recipes):
+    return b"".join(json.dumps(recipe, ensure_ascii=False).encode("utf-8") + b"\n" for recipe in recipes)
+
+
+def _recipe(title, **extra):
+    return {"title": title, "ingredients": ["tofu"], "instructions": ["cook"], "nutrition": {"Calories": "300 kcal"},
+            "difficulty": "Easy", **extra}
+
+
+def test_open_lines_counts_an_over_long_line_once(monkeypatch):
+    monkeypatch.setattr(recipe_transfer, "MAX_LINE_BYTES", 10)
+    data = b'{"a": 1}\n' + b"x" * 35 + b'{"title": "tail"}\n' + b"short\n" + b"y" * 25
+    lines = list(_open_lines(io.BytesIO(data)))
+    assert len(lines) == 4
+    assert lines[0] == b'{"a": 1}\n'
+    assert len(lines[1]) == 11 and lines[1].startswith(b"x")
+    assert lines[2] == b"short\n"
+    assert len(lines[3]) == 11
+
+
+def test_import_rejects_over_long_line_without_importing_its_tail(db, monkeypatch):
+    monkeypatch.setattr(recipe_transfer, "MAX_LINE_BYTES", 256)
+    tail = json.dumps(_recipe("tail")).encode()
+    data = _jsonl(_recipe("ok")) + b'{"title": "' + b"x" * 1000 + b'", "pad": ' + tail + b"}\n"
+    result = import_recipes(db, "alice", io.BytesIO(data))
+    assert result == {"read": 2, "inserted": 1, "duplicates": 0, "errors": 1}
+    assert [doc["title"] for doc in db["recipes"].find()] == ["ok"]
+
+
+def test_import_dedupes_within_file_and_against_existing(manager, db):
+    manager.save_recipe("alice", _recipe("existing"))
+    data = _jsonl(_recipe("new"), _recipe("existing", rating=5, tags=["x"]), _recipe("new"), _recipe("other")) \
+        + b"not json\n[1, 2]\n\n"
+    result = import_recipes(db, "alice", io.BytesIO(gzip.compress(data)), batch_size=2)
+    assert result == {"read": 6, "inserted": 2, "duplicates": 2, "errors": 2}
+    assert sorted(doc["title"] for doc in db["recipes"].find({"username": "alice"})) == ["existing", "new", "other"]
+    # 批量导入后统计按食谱重算
+    assert manager.get_user_stats("alice")["total_recipes"] == 3
+
+    again = import_recipes(db, "alice", io.BytesIO(data))
+    assert again["inserted"] == 0 and again["duplicates"] == 4
+
+
+def test_export_import_round_trip_preserves_content(manager, db):
+    manager.save_recipe("alice", _recipe("a", nutrition={"Protein": "2.55 g"}, prep_time="1 hour", tags=["t"]))
+    manager.save_recipe("alice", _recipe("b", difficulty="困难"))
+    manager.save_recipe("bob", _recipe("bob's"))
+
+    plain = b"".join(export_recipes(db, "alice"))
+    lines = [json.loads(line) for line in plain.splitlines()]
+    assert [line["title"] for line in lines] == ["a", "b"]
+    assert all("_id" not in line and "username" not in line and "v" not in line for line in lines)
+    assert lines[0]["nutrition"] == {"Protein": "2.55 g"} and lines[1]["difficulty"] == "Hard"
+
+    compressed = b"".join(export_recipes(db, "alice", compress=True, chunk_size=16))
+    assert gzip.decompress(compressed) == plain
+    result = import_recipes(db, "carol", io.BytesIO(compressed))
+    assert result["inserted"] == 2
+    assert {doc["content_hash"] for doc in db["recipes"].find({"username": "carol"})} == \
+        {doc["content_hash"] for doc in db["recipes"].find({"username": "alice"})}
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+from mongodb_manager import compute_user_stats, rebuild_recipe_counts, rebuild_user_stats
+
+
+def _save(manager, username, title, **extra):
+    return manager.save_recipe(username, {"title": title, "ingredients": ["x"], "diet": "vegan",
+                                          "tags": ["quick"], "rating": 4, **extra})
+
+
+def _assert_stats_consistent(db, username):
+    stored = db["user_stats"].find_one({"_id": username}) or {}
+    rebuilt = compute_user_stats(db, username)
+    assert stored.get("total_recipes", 0) == rebuilt["total_recipes"]
+    assert stored.get("rating_sum", 0) == rebuilt["rating_sum"]
+    for name in ("diets", "tags"):
+        assert {k: v for k, v in (stored.get(name) or {}).items() if v} == rebuilt[name]
+    counts = {doc["month"]: doc["count"] for doc in db["recipe_counts"].find({"username": username}) if doc["count"]}
+    months = {}
+    for doc in db["recipes"].find({"username": username}):
+        key = f"{doc['created'].year:04d}-{doc['created'].month:02d}"
+        months[key] = months.get(key, 0) + 1
+    assert counts == months
+
+
+def test_bulk_delete_only_touches_own_valid_ids(manager, db):
+    ids = [_save(manager, "alice", f"a{n}") for n in range(5)]
+    bob = _save(manager, "bob", "b")
+
+    deleted = manager.delete_recipes("alice", ids[:2] + [bob, "bogus", ids[0]], batch_size=1)
+    assert deleted == 2
+    assert db["recipes"].count_documents({"username": "alice"}) == 3
+    assert db["recipes"].count_documents({"username": "bob"}) == 1
+    _assert_stats_consistent(db, "alice")
+    _assert_stats_consistent(db, "bob")
+
+
+def test_soft_delete_and_restore_round_trip(manager, db):
+    ids = [_save(manager, "alice", f"a{n}", rating=n) for n in range(4)]
+    _save(manager, "bob", "b")
+    before = {doc["_id"]: doc for doc in db["recipes"].find({"username": "alice"})}
+
+    assert manager.delete_recipes("alice", ids[:3], soft=True) == 3
+    assert manager.count_trash("alice") == 3 and manager.count_trash("bob") == 0
+    assert {summary.title for summary in manager.list_trash("alice")} == {"a0", "a1", "a2"}
+    _assert_stats_consistent(db, "alice")
+
+    # bob 不能恢复 alice 的食谱
+    assert manager.restore_recipes("bob", ids[:1]) == 0
+    assert manager.restore_recipes("alice", ids[:1]) == 1
+    assert manager.restore_recipes("alice") == 2
+    assert manager.count_trash("alice") == 0
+    after = {doc["_id"]: doc for doc in db["recipes"].find({"username": "alice"})}
+    assert after == before
+    _assert_stats_consistent(db, "alice")
+
+
+def test_restore_skips_recipes_that_already_exist(manager, db):
+    recipe_id = _save(manager, "alice", "a")
+    manager.delete_recipes("alice", [recipe_id], soft=True)
+    doc = db["recipes_trash"].find_one()
+    doc.pop("deleted_at")
+    db["recipes"].insert_one(doc)
+    db["user_stats"].delete_many({})
+
+    assert manager.restore_recipes("alice") == 0
+    assert db["recipes"].count_documents({}) == 1 and manager.count_trash("alice") == 0
+
+
+def test_clear_recipes_hard_and_soft(manager, db):
+    for n in range(5):
+        _save(manager, "alice", f"a{n}")
+    _save(manager, "bob", "b")
+
+    assert manager.clear_recipes("alice", soft=True, batch_size=2) == 5
+    assert manager.count_trash("alice") == 5
+    assert manager.get_user_stats("alice")["total_recipes"] == 0
+    manager.restore_recipes("alice")
+    assert manager.clear_recipes("alice", batch_size=2) == 5
+    assert manager.count_trash("alice") == 0
+    assert manager.get_user_stats("alice")["total_recipes"] == 0
+    assert db["recipe_counts"].count_documents({"username": "alice"}) == 0
+    assert manager.get_user_stats("bob")["total_recipes"] == 1
+    _assert_stats_consistent(db, "bob")
+
+
+def test_delete_matching_and_empty_trash(manager, db):
+    old = _save(manager, "alice", "old")
+    db["recipes"].update_one({"title": "old"}, {"$set": {"created": datetime(2020, 1, 1)}})
+    rebuild_recipe_counts(db, "alice")
+    rebuild_user_stats(db, "alice")
+    _save(manager, "alice", "new")
+
+    assert manager.delete_recipes_matching("alice", {"created": {"$lt": datetime(2021, 1, 1)}}, soft=True) == 1
+    assert [summary.id for summary in manager.list_trash("alice")] == [old]
+    _assert_stats_consistent(db, "alice")
+    assert manager.empty_trash("alice") == 1
+    assert manager.restore_recipes("alice") == 0
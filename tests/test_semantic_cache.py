@@ -0,0 +1,74 @@
+import sqlite3
+import time
+
+from semantic_cache import SemanticIndex, normalize_ingredients, jaccard
+
+
+def _wait_loaded(index):
+    deadline = time.time() + 5
+    while index.loading and time.time() < deadline:
+        time.sleep(0.01)
+    assert not index.loading
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT cache_key FROM semantic_index")}
+
+
+def test_normalize_ingredients_maps_aliases_plurals_and_quantities():
+    assert normalize_ingredients("200g 鸡胸肉, Tomatoes、2 cloves garlic") == {"chicken", "tomato", "garlic"}
+    assert normalize_ingredients(["Scallion", "", "spring onion"]) == {"green onion"}
+
+
+def test_lookup_returns_similar_entry_within_same_scope_only():
+    index = SemanticIndex(threshold=0.6)
+    index.add("k1", "chicken, broccoli, garlic", "none", "balanced", "en")
+
+    key, score = index.lookup("鸡肉, 西兰花, 蒜", "none", "balanced", "en")
+    assert key == "k1" and score == 1.0
+    key, score = index.lookup("chicken, broccoli, garlic", "vegan", "balanced", "en")
+    assert key is None
+    key, score = index.lookup("chicken, broccoli, garlic, lemon", "none", "balanced", "en")
+    assert key == "k1" and score == jaccard({"chicken", "broccoli", "garlic", "lemon"}, {"chicken", "broccoli", "garlic"})
+    key, _ = index.lookup("beef, potato", "none", "balanced", "en")
+    assert key is None
+
+
+def test_lru_eviction_keeps_max_entries_in_memory():
+    index = SemanticIndex(max_entries=2)
+    index.add("k1", "chicken", "none", "balanced", "en")
+    index.add("k2", "beef", "none", "balanced", "en")
+    index.lookup("chicken", "none", "balanced", "en")   # k1 变为最近使用
+    index.add("k3", "pork", "none", "balanced", "en")
+
+    assert index.stats()["entries"] == 2
+    assert index.lookup("beef", "none", "balanced", "en")[0] is None
+    assert index.lookup("chicken", "none", "balanced", "en")[0] == "k1"
+
+
+def test_evicted_entries_are_deleted_from_sqlite(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = SemanticIndex(max_entries=2, path=path)
+    _wait_loaded(index)
+    for key, food in (("k1", "chicken"), ("k2", "beef"), ("k3", "pork")):
+        index.add(key, food, "none", "balanced", "en")
+
+    assert _rows(path) == {"k2", "k3"}
+    index.discard("k2")
+    assert _rows(path) == {"k3"}
+
+
+def test_load_prunes_rows_beyond_max_entries_by_age(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = SemanticIndex(max_entries=10, path=path)
+    _wait_loaded(index)
+    for number, food in enumerate(("chicken", "beef", "pork", "tofu")):
+        index.add(f"k{number}", food, "none", "balanced", "en")
+        time.sleep(0.002)
+
+    reopened = SemanticIndex(max_entries=2, path=path)
+    _wait_loaded(reopened)
+    assert _rows(path) == {"k2", "k3"}
+    assert reopened.stats()["entries"] == 2
+    assert reopened.lookup("tofu", "none", "balanced", "en")[0] == "k3"
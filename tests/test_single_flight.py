@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("openai")
+
+from async_llm_interface import AsyncSingleFlight
+from llm_interface import SingleFlight
+
+
+def _run_concurrently(flight, count, fn):
+    results = [None] * count
+    started = threading.Barrier(count)
+
+    def call(index):
+        started.wait()
+        results[index] = flight.do("key", fn)
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_execute_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def generate():
+        executions.append(1)
+        release.wait(5)
+        return {"title": "soup"}
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results = _run_concurrently(flight, 5, generate)
+    timer.join()
+
+    assert len(executions) == 1
+    assert all(result == {"title": "soup"} for result in results)
+    stats = flight.stats()
+    assert stats["calls"] == 5 and stats["executions"] == 1 and stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_every_caller_gets_an_independent_copy():
+    flight = SingleFlight()
+    release = threading.Event()
+    shared = {"title": "soup", "tags": []}
+
+    def generate():
+        release.wait(5)
+        return shared
+
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    results = _run_concurrently(flight, 4, generate)
+    timer.join()
+
+    # 任一调用方（包括执行者）修改结果，都不影响其他调用方和原对象
+    results[0]["tags"].append("rated")
+    assert all(result["tags"] == [] for result in results[1:])
+    assert shared["tags"] == []
+    assert len({id(result) for result in results}) == 4
+
+
+def test_exception_is_shared_and_key_released():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 42) == 42
+    assert flight.stats()["executions"] == 2
+
+
+def test_async_single_flight_copies_for_every_caller():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        shared = {"tags": []}
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return shared
+
+        results = await asyncio.gather(*(flight.do("key", generate) for _ in range(3)))
+        return calls, shared, results, flight.stats()
+
+    calls, shared, results, stats = asyncio.run(scenario())
+    assert len(calls) == 1 and stats["coalesced"] == 2
+    results[0]["tags"].append("x")
+    assert shared["tags"] == [] and results[1]["tags"] == [] and results[2]["tags"] == []
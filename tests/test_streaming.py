@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from structured_output import IncrementalRecipeParser
+
+RECIPE = {
+    "title": "Tomato \"egg\" stir-fry",
+    "description": "Quick, home style",
+    "ingredients": ["2 eggs", "3 tomatoes, chopped"],
+    "instructions": ["Beat the eggs.", "Stir-fry with tomatoes."],
+    "nutrition": {"Calories": "210 kcal"},
+    "serves": 2,
+}
+EXPECTED_EVENTS = [
+    ("title", RECIPE["title"]),
+    ("description", RECIPE["description"]),
+    ("ingredient", "2 eggs"),
+    ("ingredient", "3 tomatoes, chopped"),
+    ("instruction", "Beat the eggs."),
+    ("instruction", "Stir-fry with tomatoes."),
+]
+
+
+def _feed(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+def test_parser_emits_fields_as_they_close_regardless_of_chunking():
+    text = "```json\n" + json.dumps(RECIPE, ensure_ascii=False) + "\n```"
+    for size in (1, 3, 17, len(text)):
+        parser = IncrementalRecipeParser()
+        events = _feed(parser, [text[i:i + size] for i in range(0, len(text), size)])
+        assert events == EXPECTED_EVENTS
+        assert parser.finished
+
+
+def test_parser_ignores_nested_strings_and_trailing_text():
+    text = json.dumps({"nutrition": {"title": "not a title"}, "title": "Real"}) + " trailing {\"title\": \"x\"}"
+    parser = IncrementalRecipeParser()
+    assert parser.feed(text) == [("title", "Real")]
+
+
+def test_partial_input_only_reports_closed_items():
+    parser = IncrementalRecipeParser()
+    assert parser.feed('{"title": "Soup", "ingredients": ["wat') == [("title", "Soup")]
+    assert parser.feed('er", "salt"') == [("ingredient", "water"), ("ingredient", "salt")]
+    assert not parser.finished
+
+
+class TestStreamRecipe:
+    @pytest.fixture
+    def llm(self):
+        pytest.importorskip("openai")
+        from llm_interface import LLMInterface, MemoryCache
+        return LLMInterface("test-key", cache=MemoryCache(), single_flight=False, semantic_cache=False)
+
+    def test_stream_then_cached_replay(self, llm, monkeypatch):
+        text = json.dumps(RECIPE)
+        calls = []
+
+        def tokens(*args):
+            calls.append(args)
+            for i in range(0, len(text), 5):
+                yield text[i:i + 5]
+
+        monkeypatch.setattr(llm, "stream_recipe_tokens", tokens)
+        streamed = list(llm.stream_recipe_and_nutrition("eggs, tomatoes", "", "", "en"))
+        assert streamed[:-1] == EXPECTED_EVENTS
+        assert streamed[-1][0] == "recipe" and streamed[-1][1]["title"] == RECIPE["title"]
+
+        # 第二次直接从缓存重放相同的事件序列，不调用模型
+        replayed = list(llm.stream_recipe_and_nutrition("tomatoes, eggs", "", "", "en"))
+        assert [event for event in replayed if event[0] != "recipe"] == EXPECTED_EVENTS
+        assert len(calls) == 1
+
+    def test_failure_before_first_token_falls_back(self, llm, monkeypatch):
+        def tokens(*args):
+            raise RuntimeError("connection refused")
+            yield  # 使函数成为生成器
+
+        monkeypatch.setattr(llm, "stream_recipe_tokens", tokens)
+        events = list(llm.stream_recipe_and_nutrition("eggs", "", "", "en"))
+        assert events[-1][0] == "recipe" and events[-1][1]["fallback"] is True
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from structured_output import (StructuredOutputError, extract_json_text, loads, parse_cuisine_info,
+                               parse_ingredients, parse_partial, parse_recipe, repair_json, strip_fences)
+
+RECIPE = {
+    "title": "番茄炒蛋",
+    "description": "家常菜",
+    "ingredients": ["鸡蛋 3 个", "番茄 2 个"],
+    "instructions": ["打散鸡蛋。", "炒番茄后加入鸡蛋。"],
+    "nutrition": {"Calories": "210 kcal"},
+    "serves": "2",
+    "prep_time": "5 min",
+    "difficulty": "Easy",
+}
+
+
+def test_strip_fences_and_leading_text():
+    assert strip_fences("```json\n{\"a\": 1}\n```") == '{"a": 1}'
+    assert strip_fences("```json\n{\"a\": 1") == '{"a": 1'
+    assert extract_json_text("Here you go:\n{\"a\": 1}") == '{"a": 1}'
+    with pytest.raises(StructuredOutputError):
+        extract_json_text("no json at all")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": [1, 2]}\n``` hope this helps', {"a": [1, 2]}),
+    ('{"a": 1} trailing {"b": 2}', {"a": 1}),
+    ('{"a": "line\nbreak"}', {"a": "line\nbreak"}),
+    ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+    ('{"a": "x" "b": "y"}', {"a": "x", "b": "y"}),
+])
+def test_loads_tolerates_common_model_output(text, expected):
+    assert loads(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"title": "Soup", "ingredients": ["wat', {"title": "Soup", "ingredients": ["wat"]}),
+    ('{"title": "Soup", "serves": 2', {"title": "Soup", "serves": 2}),
+    ('{"title": "Soup", "serv', {"title": "Soup"}),
+    ('{"title": "Soup", "serves":', {"title": "Soup"}),
+    ('{"title": "Soup", "cal": 12.', {"title": "Soup"}),
+    ('{"a": "\\u4e', {"a": ""}),
+    ('{"a": {"b": [1, {"c": tr', {"a": {"b": [1, {}]}}),
+])
+def test_repair_truncated_output(text, expected):
+    assert json.loads(repair_json(text), strict=False) == expected
+    assert loads(text) == expected
+
+
+def test_truncated_recipe_still_parses():
+    text = "```json\n" + json.dumps(RECIPE, ensure_ascii=False)
+    truncated = text[:text.index('"prep_time"') + 8]
+    recipe = parse_recipe(truncated).to_dict()
+    assert recipe["title"] == "番茄炒蛋" and recipe["serves"] == 2
+    assert "prep_time" not in recipe
+
+
+def test_parse_recipe_normalises_and_validates():
+    recipe = parse_recipe(json.dumps({**RECIPE, "instructions": "Step one\n\nStep two", "extra": 1})).to_dict()
+    assert recipe["instructions"] == ["Step one", "Step two"]
+    assert recipe["extra"] == 1
+    with pytest.raises(StructuredOutputError):
+        parse_recipe('{"title": "No steps", "ingredients": ["x"]}')
+    assert parse_partial("not json yet") is None
+
+
+def test_parse_ingredients_dedupes_and_falls_back():
+    assert parse_ingredients('{"ingredients": ["egg", " egg ", "rice"]}') == ["egg", "rice"]
+    assert parse_ingredients('["tofu", "tofu"]') == ["tofu"]
+    assert parse_ingredients('ingredients: "egg", "rice" (unparseable') == ["egg", "rice"]
+
+
+def test_parse_cuisine_info():
+    info = parse_cuisine_info('{"cuisine_type": "川菜", "search_keywords": ["麻婆豆腐", "麻婆豆腐"], '
+                              '"dish_characteristics": {"spicy_level": "high"}}').to_dict()
+    assert info["cuisine_type"] == "川菜" and info["search_keywords"] == ["麻婆豆腐"]
+    assert info["dish_characteristics"] == {"spicy_level": "high", "price_range": "", "cooking_method": ""}
+    with pytest.raises(StructuredOutputError):
+        parse_cuisine_info('{"search_keywords": []}')
@@ -0,0 +1,129 @@
+import json
+import random
+import threading
+import urllib.error
+import urllib.request
+import uuid
+
+import pytest
+
+from stub_llm_server import StubConfig, build_content, build_recipe, serve
+
+
+@pytest.fixture
+def stub():
+    def start(**options):
+        options.setdefault("latency_median", 0)
+        options.setdefault("ttft_median", 0)
+        server, stats = serve("127.0.0.1", 0, StubConfig(seed=1, **options))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", stats
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.read().decode()
+
+
+def test_build_recipe_follows_prompt_fields():
+    recipe = build_recipe("Ingredients: tofu, spinach\nServings: 4\nSteps: about 3", "en", random.Random(0))
+    assert recipe["serves"] == 4
+    assert len(recipe["instructions"]) == 3
+    assert len(recipe["ingredients"]) == 2 and recipe["ingredients"][0].startswith("tofu")
+
+
+def test_build_content_detects_language_and_request_type():
+    rng = random.Random(0)
+    recipe = json.loads(build_content([{"role": "user", "content": "Respond in Japanese. Ingredients: 豆腐"}], rng)[7:-3])
+    assert "豆腐" in recipe["title"]
+    vision = [{"role": "user", "content": [{"type": "text", "text": "List ingredients"},
+                                           {"type": "image_url", "image_url": {"url": "data:"}}]}]
+    assert "ingredients" in json.loads(build_content(vision, rng)[7:-3])
+    assert "cuisine_type" in json.loads(build_content([{"role": "user", "content": "return cuisine_type"}], rng)[7:-3])
+
+
+def test_chat_completion_returns_openai_shaped_body(stub):
+    base, stats = stub()
+    status, text = _post(f"{base}/v1/chat/completions",
+                         {"model": "m", "messages": [{"role": "user", "content": "Ingredients: egg"}]})
+    body = json.loads(text)
+    assert status == 200
+    assert body["model"] == "m" and body["choices"][0]["finish_reason"] == "stop"
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+    assert stats.snapshot()["requests"] == 1
+
+
+def test_streaming_sends_chunks_usage_and_done(stub):
+    base, _ = stub(chunk_chars=50)
+    _, text = _post(f"{base}/v1/chat/completions", {"messages": [{"role": "user", "content": "Ingredients: egg"}],
+                                                    "stream": True, "stream_options": {"include_usage": True}})
+    events = [line[6:] for line in text.split("\n\n") if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    content = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks if chunk["choices"])
+    assert json.loads(content[7:-3])["ingredients"]
+    assert "usage" in chunks[-1] and chunks[-2]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_error_and_truncation_rates(stub):
+    base, stats = stub(error_rate=1.0)
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        _post(f"{base}/chat/completions", {"messages": []})
+    assert excinfo.value.code in (429, 500, 503)
+    assert sum(count for name, count in stats.snapshot().items() if name.startswith("error_")) == 1
+
+    base, stats = stub(truncate_rate=1.0)
+    _, text = _post(f"{base}/v1/chat/completions", {"messages": [{"role": "user", "content": "Ingredients: egg"}]})
+    assert json.loads(text)["choices"][0]["finish_reason"] == "length"
+    assert stats.snapshot()["truncated"] == 1
+
+
+def test_llm_interface_generates_recipe_against_stub(stub):
+    pytest.importorskip("openai")
+    from llm_interface import LLMInterface
+    from llm_router import parse_providers
+
+    base, stats = stub()
+    providers = parse_providers([{"name": f"stub-{uuid.uuid4().hex}", "base_url": f"{base}/v1", "api_key": "k", "model": "stub"}])
+    llm = LLMInterface("k", cache=False, single_flight=False, fallback=False, hedge=False, providers=providers)
+    recipe = llm.generate_recipe_and_nutrition("tofu, spinach", "vegan", "balanced", language="en", servings=3)
+
+    assert not recipe.get("fallback")
+    assert "tofu" in recipe["title"].lower()
+    assert recipe["instructions"]
+    assert stats.snapshot()["requests"] == 1
+
+
+def test_complete_routes_to_provider_model_and_fails_over(stub):
+    pytest.importorskip("openai")
+    from instrumentation import start_call
+    from llm_interface import LLMInterface
+    from llm_resilience import RetryPolicy
+    from llm_router import parse_providers
+
+    broken, broken_stats = stub(error_rate=1.0)
+    healthy, healthy_stats = stub()
+    suffix = uuid.uuid4().hex
+    providers = parse_providers([
+        {"name": f"broken-{suffix}", "base_url": f"{broken}/v1", "api_key": "k", "model": "broken-model"},
+        {"name": f"healthy-{suffix}", "base_url": f"{healthy}/v1", "api_key": "k", "model": "healthy-model"},
+    ])
+    llm = LLMInterface("k", cache=False, single_flight=False, fallback=False, hedge=False, providers=providers,
+                       retry_policy=RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, deadline=10))
+    llm.router.primary.client.max_retries = 0
+    llm.router.providers[1].client.max_retries = 0
+    with start_call("llm", "cuisine_info") as call:
+        response = llm.complete([{"role": "user", "content": "return cuisine_type"}], temperature=0.3, max_tokens=200, call=call)
+
+    assert response.model == "healthy-model"
+    assert "cuisine_type" in response.choices[0].message.content
+    assert broken_stats.snapshot()["requests"] == 1 and healthy_stats.snapshot()["requests"] == 1
+    assert call.attempts == 2 and call.provider == f"healthy-{suffix}"
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock")
+
+from mongodb_manager import _stats_key, _stats_value, compute_user_stats, rebuild_user_stats, recipe_stats_increments
+
+RECIPES = [
+    {"title": "a", "diet": "vegan", "goal": "energy", "cuisine": "Thai", "tags": ["quick", "v1.2"], "rating": 4},
+    {"title": "b", "diet": "vegan", "goal": "", "cuisine": "", "tags": ["$money", "quick"], "rating": 0},
+    {"title": "c", "diet": "keto", "cuisine": "a.b.c", "tags": [], "rating": 2.5},
+    {"title": "d", "tags": ["", "quick"]},
+]
+
+
+def _stored(db, username):
+    doc = db["user_stats"].find_one({"_id": username})
+    doc.pop("updated")
+    # 删除后计数为 0 的键在读取时过滤，比较前同样去掉
+    for name in ("diets", "goals", "cuisines", "tags"):
+        doc[name] = {key: count for key, count in (doc.get(name) or {}).items() if count}
+    return doc
+
+
+def _rebuilt(db, username):
+    doc = compute_user_stats(db, username)
+    doc.pop("updated")
+    return doc
+
+
+def test_stats_keys_escape_dots_and_dollars_reversibly():
+    for value in ("v1.2", "$money", "", "a.b.c", "普通"):
+        key = _stats_key(value)
+        assert "." not in key and not key.startswith("$")
+        assert _stats_value(key) == value
+
+
+def test_increments_skip_empty_cuisines_and_tags_and_ignore_bool_ratings():
+    inc = recipe_stats_increments({"diet": "", "cuisine": "", "tags": ["", "x"], "rating": True})
+    assert inc == {"total_recipes": 1, "diets._": 1, "goals._": 1, "tags._x": 1}
+    assert recipe_stats_increments({"rating": 3}, -1)["rating_sum"] == -3
+
+
+def test_incremental_stats_match_rebuild_after_saves_and_deletes(manager, db):
+    ids = [manager.save_recipe("alice", recipe) for recipe in RECIPES]
+    manager.save_recipe("bob", RECIPES[0])
+    assert _stored(db, "alice") == _rebuilt(db, "alice")
+
+    manager.delete_recipe(ids[1])
+    manager.delete_recipes("alice", [ids[2], "not-an-id"])
+    assert _stored(db, "alice") == _rebuilt(db, "alice")
+    assert _stored(db, "bob")["total_recipes"] == 1
+
+    stats = manager.get_user_stats("alice")
+    assert stats["total_recipes"] == 2
+    assert stats["avg_rating"] == pytest.approx(2.0)
+    assert stats["tags"] == {"quick": 2, "v1.2": 1}
+    assert stats["cuisines"] == {"Thai": 1}
+
+
+def test_missing_stats_are_rebuilt_on_read(manager, db):
+    for recipe in RECIPES:
+        manager.save_recipe("alice", recipe)
+    db["user_stats"].delete_many({})
+    stats = manager.get_user_stats("alice")
+    assert stats["total_recipes"] == 4
+    assert stats["tags"] == {"quick": 3, "v1.2": 1, "$money": 1}
+    assert stats["cuisines"] == {"Thai": 1, "a.b.c": 1}
+    assert stats["diets"] == {"vegan": 2, "keto": 1, "": 1}
+    assert stats["avg_rating"] == pytest.approx(6.5 / 4)
+
+
+def test_rebuild_all_users_drops_stats_without_recipes(manager, db):
+    manager.save_recipe("alice", RECIPES[0])
+    db["user_stats"].insert_one({"_id": "ghost", "total_recipes": 3})
+    assert rebuild_user_stats(db) == 1
+    assert db["user_stats"].find_one({"_id": "ghost"}) is None
+
+
+def test_legacy_user_saving_before_backfill_gets_full_counters(manager, db):
+    # 升级前写入的食谱：没有 user_stats 和按月计数
+    db["recipes"].insert_many([
+        {"username": "alice", "title": "old1", "diet": "vegan", "tags": ["quick"], "rating": 4,
+         "created": datetime(2024, 1, 5)},
+        {"username": "alice", "title": "old2", "diet": "keto", "tags": [], "created": datetime(2024, 1, 20)},
+        {"username": "alice", "title": "old3", "created": datetime(2024, 2, 1)},
+    ])
+    manager.save_recipe("alice", RECIPES[0])
+
+    assert _stored(db, "alice") == _rebuilt(db, "alice")
+    assert manager.get_user_stats("alice")["total_recipes"] == 4
+    assert manager.count_recipes_in_month("alice", 2024, 1) == 2
+    now = datetime.utcnow()
+    assert manager.count_recipes_in_month("alice", now.year, now.month) == 1
+
+    manager.save_recipe("alice", RECIPES[1])
+    assert manager.get_user_stats("alice")["total_recipes"] == 5
+
+
+def test_legacy_month_counts_are_rebuilt_on_read(manager, db):
+    db["recipes"].insert_many([{"username": "bob", "title": "old", "created": datetime(2024, 3, 3)}])
+    assert manager.count_recipes_in_month("bob", 2024, 3) == 1
+    assert manager.count_recipes_by_period("bob", "month", 1, datetime(2024, 3, 9)) == [{"period": "2024-03", "count": 1}]
+    assert manager.get_user_stats("bob")["total_recipes"] == 1
@@ -48,6 +48,16 @@ class ConfigManager:
         """检查配置是否存在"""
         return ConfigManager.get_config(key) is not None
 
+    @staticmethod
+    def get_llm_providers(default_api_key: Optional[str] = None):
+        """获取 LLM 服务商列表（LLM_PROVIDERS，JSON 列表；未配置时只使用 DeepSeek）"""
+        from llm_router import parse_providers
+        return parse_providers(
+            ConfigManager.get_config('LLM_PROVIDERS'),
+            default_api_key or ConfigManager.get_config('DEEPSEEK_API_KEY'),
+            ConfigManager.get_config
+        )
+
     @staticmethod
     def get_all_required_keys():
         """获取所有必需的配置键"""
@@ -4,6 +4,13 @@ from pathlib import Path
 from mongodb_manager import MongoDBManager
 import sys
 
+
+@st.cache_resource(show_spinner=False)
+def get_db(mongo_uri):
+    """所有浏览器会话共享的 MongoDBManager（共享连接池，索引迁移只执行一次）"""
+    return MongoDBManager(mongo_uri)
+
+
 def initialize_session():
     # Add project path
     sys.path.append(str(Path(__file__).parent.parent))
@@ -14,7 +21,7 @@ def initialize_session():
         if not mongo_uri:
             st.error("⚠️ MongoDB connection string not found. Please configure it in secrets.")
             st.stop()
-        st.session_state.db = MongoDBManager(mongo_uri)
+        st.session_state.db = get_db(mongo_uri)
 
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
@@ -64,6 +64,23 @@ LANGUAGES = {
             'immune_boost': '增强免疫',
             'heart_health': '心脏健康',
             'advanced_options': '高级选项',
+            'regenerate_recipe': '重新生成',
+            'regenerate_help': '忽略缓存，重新调用AI生成新的食谱',
+            'fallback_recipe_notice': 'AI服务暂时不可用，已为您提供一份基础食谱，请稍后重试',
+            'diagnostics': '诊断信息',
+            'diagnostics_empty': '暂无外部调用记录',
+            'single_recipe': '单个食谱',
+            'plan_my_week': '规划一周',
+            'meal_plan_ingredients': '本周可用食材',
+            'meal_plan_ingredients_help': '每餐会从这些食材中挑选组合，用逗号分隔',
+            'meal_plan_days': '天数',
+            'meals_per_day': '每天餐数',
+            'generate_meal_plan': '生成膳食计划',
+            'meal_plan_progress': '正在并行生成膳食计划...',
+            'day_label': '第{day}天',
+            'breakfast': '早餐',
+            'lunch': '午餐',
+            'dinner': '晚餐',
             'cuisine_type': '菜系',
             'any_cuisine': '不限',
             'chinese': '中式',
@@ -113,13 +130,14 @@ LANGUAGES = {
             'recipe_saved': '食谱已保存到你的收藏！',
             'share_coming_soon': '分享功能即将推出',
             'generated_on': '生成时间',
-            'search_recipes': '搜索食材、标签或内容...',
+            'search_recipes': '搜索标题、食材、标签或备注...',
             'newest_first': '最新优先',
             'oldest_first': '最早优先',
             'highest_rated': '评分最高',
             'most_used': '最常使用',
             'all_diets': '所有饮食类型',
             'found_recipes': '找到的食谱',
+            'load_more': '加载更多',
             'delete': '删除',
             'share': '分享',
             'recipe_content': '食谱内容',
@@ -133,6 +151,13 @@ LANGUAGES = {
             'recent_recipes': '最近的食谱',
             'popular_tags': '热门标签',
             'most_used_tags': '最常用的标签',
+            'recipe_activity': '食谱创建趋势',
+            'by_day': '按日',
+            'by_week': '按周',
+            'by_month': '按月',
+            'top_diets': '常用饮食类型',
+            'top_goals': '常用健康目标',
+            'top_cuisines': '常做菜系',
             'more_analytics_coming_soon': '更多分析功能即将推出',
             'no_statistics_yet': '暂无统计数据',
             'start_cooking': '开始烹饪',
@@ -152,9 +177,19 @@ LANGUAGES = {
             'settings_saved': '设置已保存',
             'danger_zone': '危险区域',
             'export_data': '导出数据',
+            'import_data': '导入食谱',
+            'import_data_help': '支持导出的 .jsonl 或 .jsonl.gz 文件，内容相同的食谱会跳过',
+            'import_recipes': '开始导入',
+            'importing': '正在导入...',
+            'import_result': '已读取 {read} 条，导入 {inserted} 条，跳过重复 {duplicates} 条，错误 {errors} 条',
             'download_data': '下载数据',
             'clear_recipes': '清空食谱',
-            'clear_recipes_warning': '此操作将删除所有食谱，不可恢复！',
+            'clear_recipes_warning': '所有食谱将移入回收站，{days} 天后永久删除',
+            'clear_recipes_confirm': '我确认要清空所有食谱',
+            'clearing_recipes': '正在清空食谱...',
+            'recipes_cleared': '已将 {count} 个食谱移入回收站，{days} 天内可以恢复',
+            'restore_recipes': '恢复回收站中的 {count} 个食谱',
+            'recipes_restored': '已恢复 {count} 个食谱',
             'delete_account': '删除账户',
             'delete_account_warning': '此操作将永久删除你的账户和所有数据！',
             'total_recipes_help': '你保存的所有食谱数量',
@@ -399,6 +434,23 @@ LANGUAGES = {
             'immune_boost': 'Immune Boost',
             'heart_health': 'Heart Health',
             'advanced_options': 'Advanced Options',
+            'regenerate_recipe': 'Regenerate',
+            'regenerate_help': 'Ignore the cached result and ask the AI for a new recipe',
+            'fallback_recipe_notice': 'The AI service is temporarily unavailable, so a basic recipe is shown instead. Please try again later',
+            'diagnostics': 'Diagnostics',
+            'diagnostics_empty': 'No external calls recorded yet',
+            'single_recipe': 'Single Recipe',
+            'plan_my_week': 'Plan My Week',
+            'meal_plan_ingredients': 'Ingredients for the week',
+            'meal_plan_ingredients_help': 'Each meal picks a combination from these ingredients, separated by commas',
+            'meal_plan_days': 'Days',
+            'meals_per_day': 'Meals per day',
+            'generate_meal_plan': 'Generate Meal Plan',
+            'meal_plan_progress': 'Generating meal plan in parallel...',
+            'day_label': 'Day {day}',
+            'breakfast': 'Breakfast',
+            'lunch': 'Lunch',
+            'dinner': 'Dinner',
             'cuisine_type': 'Cuisine Type',
             'any_cuisine': 'Any',
             'chinese': 'Chinese',
@@ -448,13 +500,14 @@ LANGUAGES = {
             'recipe_saved': 'Recipe saved to your collection!',
             'share_coming_soon': 'Share feature coming soon',
             'generated_on': 'Generated on',
-            'search_recipes': 'Search ingredients, tags, or content...',
+            'search_recipes': 'Search titles, ingredients, tags, or notes...',
             'newest_first': 'Newest First',
             'oldest_first': 'Oldest First',
             'highest_rated': 'Highest Rated',
             'most_used': 'Most Used',
             'all_diets': 'All Diet Types',
             'found_recipes': 'Found Recipes',
+            'load_more': 'Load more',
             'delete': 'Delete',
             'share': 'Share',
             'recipe_content': 'Recipe Content',
@@ -468,6 +521,13 @@ LANGUAGES = {
             'recent_recipes': 'Recent Recipes',
             'popular_tags': 'Popular Tags',
             'most_used_tags': 'Most Used Tags',
+            'recipe_activity': 'Recipes Created',
+            'by_day': 'Daily',
+            'by_week': 'Weekly',
+            'by_month': 'Monthly',
+            'top_diets': 'Top Diets',
+            'top_goals': 'Top Health Goals',
+            'top_cuisines': 'Top Cuisines',
             'more_analytics_coming_soon': 'More analytics features coming soon',
             'no_statistics_yet': 'No statistics yet',
             'start_cooking': 'Start Cooking',
@@ -487,9 +547,19 @@ LANGUAGES = {
             'settings_saved': 'Settings saved',
             'danger_zone': 'Danger Zone',
             'export_data': 'Export Data',
+            'import_data': 'Import Recipes',
+            'import_data_help': 'Accepts exported .jsonl or .jsonl.gz files; recipes with identical content are skipped',
+            'import_recipes': 'Start Import',
+            'importing': 'Importing...',
+            'import_result': 'Read {read}, imported {inserted}, skipped {duplicates} duplicates, {errors} errors',
             'download_data': 'Download Data',
             'clear_recipes': 'Clear Recipes',
-            'clear_recipes_warning': 'This will delete all recipes and cannot be undone!',
+            'clear_recipes_warning': 'All recipes will be moved to the trash and permanently deleted after {days} days',
+            'clear_recipes_confirm': 'I want to clear all my recipes',
+            'clearing_recipes': 'Clearing recipes...',
+            'recipes_cleared': 'Moved {count} recipes to the trash; they can be restored within {days} days',
+            'restore_recipes': 'Restore {count} recipes from the trash',
+            'recipes_restored': 'Restored {count} recipes',
             'delete_account': 'Delete Account',
             'delete_account_warning': 'This will permanently delete your account and all data!',
             'total_recipes_help': 'Total number of recipes you have saved',
@@ -703,6 +773,23 @@ LANGUAGES = {
             'immune_boost': '免疫力向上',
             'heart_health': '心臓健康',
             'advanced_options': '詳細オプション',
+            'regenerate_recipe': '再生成',
+            'regenerate_help': 'キャッシュを無視してAIに新しいレシピを生成させます',
+            'fallback_recipe_notice': 'AIサービスが一時的に利用できないため、基本のレシピを表示しています。しばらくしてから再試行してください',
+            'diagnostics': '診断情報',
+            'diagnostics_empty': '外部呼び出しの記録はまだありません',
+            'single_recipe': '単品レシピ',
+            'plan_my_week': '1週間の献立',
+            'meal_plan_ingredients': '今週使える食材',
+            'meal_plan_ingredients_help': '各食事はこれらの食材から組み合わせを選びます（カンマ区切り）',
+            'meal_plan_days': '日数',
+            'meals_per_day': '1日の食事数',
+            'generate_meal_plan': '献立を生成',
+            'meal_plan_progress': '献立を並行して生成中...',
+            'day_label': '{day}日目',
+            'breakfast': '朝食',
+            'lunch': '昼食',
+            'dinner': '夕食',
             'cuisine_type': '料理の種類',
             'any_cuisine': '任意',
             'chinese': '中華',
@@ -752,13 +839,14 @@ LANGUAGES = {
             'recipe_saved': 'レシピがあなたのコレクションに保存されました！',
             'share_coming_soon': '共有機能は近日公開予定',
             'generated_on': '生成日',
-            'search_recipes': '材料、タグ、内容で検索...',
+            'search_recipes': 'タイトル、材料、タグ、メモで検索...',
             'newest_first': '最新順',
             'oldest_first': '古い順',
             'highest_rated': '評価が高い順',
             'most_used': '最も使用されている',
             'all_diets': 'すべての食事タイプ',
             'found_recipes': '見つかったレシピ',
+            'load_more': 'もっと見る',
             'delete': '削除',
             'share': '共有',
             'recipe_content': 'レシピ内容',
@@ -772,6 +860,13 @@ LANGUAGES = {
             'recent_recipes': '最近のレシピ',
             'popular_tags': '人気のタグ',
             'most_used_tags': '最も使用されているタグ',
+            'recipe_activity': 'レシピ作成の推移',
+            'by_day': '日別',
+            'by_week': '週別',
+            'by_month': '月別',
+            'top_diets': 'よく使う食事タイプ',
+            'top_goals': 'よく使う健康目標',
+            'top_cuisines': 'よく作る料理ジャンル',
             'more_analytics_coming_soon': 'さらに多くの分析機能が近日公開予定',
             'no_statistics_yet': 'まだ統計データはありません',
             'start_cooking': '料理を始める',
@@ -791,9 +886,19 @@ LANGUAGES = {
             'settings_saved': '設定が保存されました',
             'danger_zone': '危険区域',
             'export_data': 'データをエクスポート',
+            'import_data': 'レシピをインポート',
+            'import_data_help': 'エクスポートした .jsonl または .jsonl.gz ファイルに対応、同じ内容のレシピはスキップされます',
+            'import_recipes': 'インポート開始',
+            'importing': 'インポート中...',
+            'import_result': '{read} 件を読み込み、{inserted} 件をインポート、重複 {duplicates} 件をスキップ、エラー {errors} 件',
             'download_data': 'データをダウンロード',
             'clear_recipes': 'レシピをクリア',
-            'clear_recipes_warning': 'この操作はすべてのレシピを削除し、元に戻せません！',
+            'clear_recipes_warning': 'すべてのレシピはゴミ箱に移動され、{days} 日後に完全に削除されます',
+            'clear_recipes_confirm': 'すべてのレシピをクリアすることを確認します',
+            'clearing_recipes': 'レシピをクリアしています...',
+            'recipes_cleared': '{count} 件のレシピをゴミ箱に移動しました（{days} 日以内なら復元できます）',
+            'restore_recipes': 'ゴミ箱の {count} 件のレシピを復元',
+            'recipes_restored': '{count} 件のレシピを復元しました',
             'delete_account': 'アカウントを削除',
             'delete_account_warning': 'この操作はアカウントとすべてのデータを永久に削除します！',
             'total_recipes_help': '保存したレシピの総数',